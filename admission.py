@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+请求准入控制
+冷请求（缓存未命中、需要访问上游的分析）单独排队、数量有界：突发的大量不同股票只会占满冷队列，
+缓存命中的请求走另一条通道不受影响；队列满或排队超时立即返回 503 + Retry-After，
+单个客户端的并发请求数超过上限返回 429，过载时服务降级而不是所有请求一起超时
+
+- 通道（lane）: 同时执行数 + 排队数有界，Retry-After 按当前排队长度和平均处理时间估算
+- 客户端按连接地址区分；部署在反向代理后时用 STOCK_TRUSTED_PROXIES 设置代理层数，
+  改为取 X-Forwarded-For 中由这些代理追加的地址（请求自带的部分可以伪造，不采用）
+- 上限可用环境变量调整，如 STOCK_ADMISSION_ANALYZE_COLD=8,32 表示同时 8 个、排队 32 个；
+  STOCK_CLIENT_CONCURRENCY（单客户端并发，默认 8）、STOCK_ADMISSION_WAIT（最长排队秒数，默认 5）
+
+用法:
+    try:
+        with admission.admit('analyze', client_key(request), cold=not is_cached(analyzer, symbol, period)):
+            ...
+    except Overloaded as e:
+        return e.response()
+"""
+
+import math
+import os
+import threading
+import time
+from metrics import Counter, Gauge, REGISTRY
+
+# 通道名 -> (同时执行数, 排队数)
+DEFAULT_LANES = {
+    'analyze_cold': (8, 32),
+    'analyze_warm': (32, 128),
+    'chart_cold': (4, 16),
+    'chart_warm': (16, 64),
+    'batch_cold': (2, 4),
+    'batch_warm': (8, 16),
+    'compare_cold': (2, 8),
+    'compare_warm': (8, 32),
+}
+CLIENT_CONCURRENCY = int(os.environ.get('STOCK_CLIENT_CONCURRENCY', 8))
+MAX_WAIT = float(os.environ.get('STOCK_ADMISSION_WAIT', 5))
+MAX_RETRY_AFTER = 60
+# 可信反向代理层数（与 werkzeug ProxyFix 的 x_for 相同），0 表示直接使用连接地址
+TRUSTED_PROXIES = int(os.environ.get('STOCK_TRUSTED_PROXIES', 0))
+
+ADMISSIONS = REGISTRY.register(Counter(
+    'stock_admission_total', '准入结果（admitted / queue_full / timeout / client_limit）', ['lane', 'outcome']))
+QUEUED = REGISTRY.register(Gauge(
+    'stock_admission_queued', '各通道排队中的请求数', ['lane']))
+ACTIVE = REGISTRY.register(Gauge(
+    'stock_admission_active', '各通道执行中的请求数', ['lane']))
+
+
+def lane_limits(name):
+    """通道上限：环境变量 STOCK_ADMISSION_<NAME>=执行数,排队数 覆盖默认值"""
+    value = os.environ.get(f"STOCK_ADMISSION_{name.upper()}")
+    if value:
+        try:
+            limit, queue = (int(v) for v in value.split(','))
+            return max(1, limit), max(0, queue)
+        except ValueError:
+            print(f"⚠️  忽略无效的准入配置 {name}: {value}")
+    return DEFAULT_LANES.get(name, (8, 32))
+
+
+def client_key(request, trusted_proxies=None):
+    """客户端标识
+
+    默认为连接地址；trusted_proxies（默认 TRUSTED_PROXIES）> 0 时取 X-Forwarded-For 从右数第 N 个地址，
+    即最外层可信代理看到的连接地址，客户端伪造的 X-Forwarded-For 不会影响单客户端限额
+    """
+    hops = TRUSTED_PROXIES if trusted_proxies is None else trusted_proxies
+    if hops > 0:
+        forwarded = [addr.strip() for addr in request.headers.get('X-Forwarded-For', '').split(',') if addr.strip()]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.remote_addr or 'unknown'
+
+
+def is_cached(analyzer, symbol, period='1mo'):
+    """该股票该周期的行情是否已在缓存中（不计入缓存命中统计）"""
+    return f"{symbol.strip().upper()}_{period}" in analyzer.cache
+
+
+class Overloaded(Exception):
+    """请求被拒绝（429 客户端超限 / 503 服务过载）"""
+
+    def __init__(self, status, retry_after, reason, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def response(self, response_class=None):
+        """JSON 错误响应；异步应用传入 Quart 的 Response 类"""
+        payload = {'error': str(self), 'reason': self.reason, 'retry_after': self.retry_after}
+        if response_class is None:
+            from flask import jsonify
+            response = jsonify(payload)
+            response.status_code = self.status
+        else:
+            from fast_json import dumps
+            response = response_class(dumps(payload), status=self.status, mimetype='application/json')
+        response.headers['Retry-After'] = str(self.retry_after)
+        return response
+
+
+class Lane:
+    """有界通道：最多 limit 个同时执行、queue 个排队（先到先得），其余立即拒绝"""
+
+    def __init__(self, name, limit, queue, max_wait=MAX_WAIT):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        # 平均处理时间（指数滑动平均），用于估算 Retry-After
+        self.service_time = 0.5
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+
+    def retry_after(self):
+        """排在队尾的请求大约多久后能执行（秒）"""
+        seconds = (self.waiting + 1) * self.service_time / self.limit
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+    def enter(self):
+        with self._cond:
+            if self.active < self.limit and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.queue:
+                raise Overloaded(503, self.retry_after(), 'queue_full', '服务繁忙，请稍后重试')
+            # 按到达顺序排队：只有轮到自己且有空位时才进入
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self.waiting += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while not (ticket == self._serving and self.active < self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded(503, self.retry_after(), 'timeout', '排队超时，请稍后重试')
+                    self._cond.wait(remaining)
+            except Overloaded:
+                self._abandon(ticket)
+                raise
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self._advance()
+
+    def _abandon(self, ticket):
+        """超时离开队列（已持有锁）"""
+        self._abandoned.add(ticket)
+        if ticket == self._serving:
+            self._advance()
+
+    def _advance(self):
+        """轮到下一个排队的请求，跳过已超时离开的（已持有锁）"""
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.discard(self._serving)
+            self._serving += 1
+        self._cond.notify_all()
+
+    def leave(self, seconds):
+        with self._cond:
+            self.active -= 1
+            self.service_time = self.service_time * 0.9 + seconds * 0.1
+            self._cond.notify_all()
+
+
+class Admission:
+    """按通道和客户端的准入控制"""
+
+    def __init__(self, client_limit=CLIENT_CONCURRENCY):
+        self.client_limit = client_limit
+        self.lanes = {}
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def lane(self, name):
+        with self._lock:
+            lane = self.lanes.get(name)
+            if lane is None:
+                lane = self.lanes[name] = Lane(name, *lane_limits(name))
+            return lane
+
+    def _client_enter(self, client, lane_name):
+        with self._lock:
+            count = self.clients.get(client, 0)
+            if count >= self.client_limit:
+                ADMISSIONS.labels(lane_name, 'client_limit').inc()
+                raise Overloaded(429, 1, 'client_limit',
+                                 f'并发请求过多（每个客户端最多 {self.client_limit} 个），请稍后重试')
+            self.clients[client] = count + 1
+
+    def _client_leave(self, client):
+        with self._lock:
+            count = self.clients.get(client, 0) - 1
+            if count > 0:
+                self.clients[client] = count
+            else:
+                self.clients.pop(client, None)
+
+    def admit(self, endpoint, client, cold=False):
+        """申请执行名额，被拒绝时抛出 Overloaded；返回的 Ticket 需要 release()（或用作上下文管理器）"""
+        lane = self.lane(f"{endpoint}_{'cold' if cold else 'warm'}")
+        self._client_enter(client, lane.name)
+        QUEUED.labels(lane.name).inc()
+        try:
+            lane.enter()
+        except Overloaded as e:
+            ADMISSIONS.labels(lane.name, e.reason).inc()
+            self._client_leave(client)
+            raise
+        finally:
+            QUEUED.labels(lane.name).dec()
+        ADMISSIONS.labels(lane.name, 'admitted').inc()
+        ACTIVE.labels(lane.name).inc()
+        return Ticket(self, lane, client)
+
+
+class Ticket:
+    """一个执行名额，release() 可重复调用"""
+
+    def __init__(self, admission, lane, client):
+        self.admission = admission
+        self.lane = lane
+        self.client = client
+        self.started = time.perf_counter()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        ACTIVE.labels(self.lane.name).dec()
+        self.lane.leave(time.perf_counter() - self.started)
+        self.admission._client_leave(self.client)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# 进程内共享（app_factory 中各应用的路由共用同一组队列）
+admission = Admission()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+统一应用入口
+把 stock_web_app / progressive_stock_app / simple_stock_test / test_app 的全部路由挂到同一个 Flask 应用上，
+所有接口共用一个分析器（以及同一个实时推送中心、热门快照），行情缓存为跨进程共享的 SQLite 缓存
+
+- 各应用的路由都挂在自己的前缀下（stock_web_app 为根路径），与其他应用不冲突的路径同时挂在根路径，
+  原有页面中的绝对地址（/api/test、/analyze、/api/simple_analyze 等）不需要修改
+- 多进程部署时各工作进程共用缓存：一个进程获取过的股票，其他进程直接读取
+
+    gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:9988 'app_factory:create_app()'
+"""
+
+import argparse
+from flask import Flask
+from flask_cors import CORS
+from fast_json import init_json
+from metrics import init_metrics
+from http_cache import init_compression
+from shared_cache import SharedFrameCache
+
+# (模块名, 路由前缀)，靠前的应用优先占用根路径
+MOUNTS = [
+    ('stock_web_app', ''),
+    ('progressive_stock_app', '/progressive'),
+    ('simple_stock_test', '/simple'),
+    ('test_app', '/test-app'),
+]
+
+
+def mount(app, source, prefix, name):
+    """把 source 应用的路由复制到 app：挂在 prefix 下，根路径空闲时同时挂在根路径"""
+    taken = {rule.rule for rule in app.url_map.iter_rules()}
+    for rule in source.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        view = source.view_functions[rule.endpoint]
+        methods = sorted(rule.methods - {'HEAD', 'OPTIONS'})
+        paths = [prefix + rule.rule if prefix else rule.rule]
+        if prefix and rule.rule not in taken:
+            paths.append(rule.rule)
+        for i, path in enumerate(paths):
+            if path in taken:
+                continue
+            endpoint = f"{name}.{rule.endpoint}" + ('' if i == 0 else '.root')
+            app.add_url_rule(path, endpoint, view, methods=methods, websocket=rule.websocket)
+            taken.add(path)
+
+
+def create_app(cache_path=None, max_age=None):
+    """创建统一应用
+
+    cache_path: 共享缓存文件（默认环境变量 STOCK_CACHE_PATH 或 ~/.cache/stock_analyzer/stock_cache.sqlite3）
+    max_age: 缓存有效期（秒），默认环境变量 STOCK_CACHE_MAX_AGE 或 15 分钟，0 表示不过期
+    """
+    import importlib
+    modules = {name: importlib.import_module(name) for name, _ in MOUNTS}
+    web = modules['stock_web_app']
+    progressive = modules['progressive_stock_app']
+
+    # 单一分析服务：渐进版的路由也使用 stock_web_app 的分析器（结果字段是其超集）和推送中心
+    analyzer = web.analyzer
+    analyzer.cache = SharedFrameCache(cache_path, max_age)
+    progressive.analyzer = analyzer
+    progressive.stream_hub = web.stream_hub
+
+    app = Flask(__name__,
+                static_folder='static',
+                template_folder='templates')
+    CORS(app)
+    init_json(app)
+    init_metrics(app)
+    init_compression(app)
+    for name, prefix in MOUNTS:
+        mount(app, modules[name].app, prefix, name)
+    app.extensions['stock_analyzer'] = analyzer
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票分析Web应用（统一入口）')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9988)
+    parser.add_argument('--cache', default=None, help='共享缓存文件路径')
+    parser.add_argument('--max-age', type=float, default=None, help='缓存有效期（秒），0 表示不过期')
+    args = parser.parse_args()
+
+    app = create_app(args.cache, args.max_age)
+    print("🚀 股票分析Web应用（统一入口）启动中...")
+    print(f"🌐 访问地址: http://localhost:{args.port}")
+    cache = app.extensions['stock_analyzer'].cache
+    ttl = f"{cache.max_age:.0f} 秒" if cache.max_age else "不过期"
+    print(f"📦 共享缓存: {cache.path}（有效期: {ttl}）")
+    for name, prefix in MOUNTS:
+        print(f"   - {name}: {prefix or '/'}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+股票分析Web应用 - 异步模式 (ASGI)
+路由与 JSON 格式与 stock_web_app.py / progressive_stock_app.py 相同：
+- 行情数据用异步 HTTP 客户端 (httpx) 直接请求 Yahoo 图表接口，等待网络时不占线程
+- 指标计算等 CPU 工作放到有界线程池中执行
+- 同一股票的并发请求共用一次数据请求，上游并发数有上限
+- 准入控制与同步应用共用队列（admission.py），共享缓存（SQLite）的读写不在事件循环中进行
+
+依赖: pip install quart httpx hypercorn
+
+启动:
+    python async_stock_app.py --app web --port 9988
+    hypercorn "async_stock_app:create_app('progressive')" --bind 0.0.0.0:8888
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+from timeframe_resampler import parse_timeframes
+from chart_payload import CHART_MIME, wants_binary, encode_chart_payload
+from chart_downsample import parse_max_points
+from chart_delta import parse_since, parse_version
+from fast_json import dumps, init_json
+from symbol_index import get_index, parse_limit
+from stock_screener import screen_request
+from market_breadth import get_breadth
+from stock_compare import compare_frames, fetch_error, parse_benchmark, parse_compare_symbols
+from quote_socket import SocketSession
+from quote_stream import parse_symbols
+from chart_render import chart_png, parse_size
+from fake_provider import FAKE_LATENCY, PROVIDER, fake_history
+from admission import Overloaded, admission, client_key, is_cached
+from metrics import METRICS_MIME, REGISTRY, STAGE_SECONDS, cache_lookup, record_upstream
+from http_cache import (compressible, encode_body, frame_digest, is_fresh, json_response,
+                        make_etag, not_modified, with_etag)
+
+try:
+    from quart import Quart, Response, jsonify, request, websocket
+    from quart.json.provider import JSONProvider as QuartJSONProvider
+except ImportError:
+    Quart = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}'
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+# 指标计算线程数（CPU 工作）与同时进行的上游请求数
+CPU_WORKERS = int(os.environ.get('STOCK_CPU_WORKERS', os.cpu_count() or 4))
+UPSTREAM_CONCURRENCY = int(os.environ.get('STOCK_UPSTREAM_CONCURRENCY', 20))
+REQUEST_TIMEOUT = 10.0
+# 等待准入名额的线程数（排队可能阻塞到 STOCK_ADMISSION_WAIT 秒，不占用计算线程）
+ADMISSION_WAITERS = 64
+
+
+def parse_chart(payload, symbol):
+    """Yahoo 图表接口 JSON -> 与 yf.Ticker().history 相同列的日线 DataFrame"""
+    chart = payload.get('chart') or {}
+    if chart.get('error') or not chart.get('result'):
+        raise ValueError(f"未找到 {symbol} 的行情数据")
+    result = chart['result'][0]
+    timestamps = result.get('timestamp') or []
+    quote = result['indicators']['quote'][0]
+    tz = result.get('meta', {}).get('exchangeTimezoneName') or 'UTC'
+
+    index = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(tz).normalize()
+    df = pd.DataFrame({
+        'Open': quote.get('open'),
+        'High': quote.get('high'),
+        'Low': quote.get('low'),
+        'Close': quote.get('close'),
+        'Volume': quote.get('volume'),
+    }, index=index, dtype=float)
+    df = df.dropna(subset=['Close'])
+    df = df[~df.index.duplicated(keep='last')]
+    df['Volume'] = df['Volume'].fillna(0).astype(np.int64)
+    return df
+
+
+class AsyncStockService:
+    """为同步版 StockAnalyzer 提供异步数据获取
+
+    复用其缓存、示例数据和 analyze_frame（纯计算）；
+    数据请求按 symbol+period 合并，进行中的请求由后到的请求共同等待
+    """
+
+    def __init__(self, analyzer, cpu_workers=CPU_WORKERS, upstream_concurrency=UPSTREAM_CONCURRENCY):
+        self.analyzer = analyzer
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='stock-cpu')
+        self.waiters = ThreadPoolExecutor(max_workers=ADMISSION_WAITERS, thread_name_prefix='stock-admit')
+        self.upstream_concurrency = upstream_concurrency
+        self.client = None
+        self._upstream = None
+        self._inflight = {}
+
+    async def start(self):
+        """创建 HTTP 客户端（需在事件循环中调用）"""
+        if httpx is None:
+            raise RuntimeError("异步模式需要 httpx: pip install httpx")
+        self.client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            headers={'User-Agent': USER_AGENT},
+            limits=httpx.Limits(max_connections=self.upstream_concurrency),
+        )
+        self._upstream = asyncio.Semaphore(self.upstream_concurrency)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+        self.executor.shutdown(wait=False)
+        self.waiters.shutdown(wait=False)
+
+    async def run_cpu(self, func, *args):
+        """在有界线程池中执行 CPU 工作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def cache_io(self, func, *args):
+        """缓存读写：进程内字典直接调用，共享缓存（SQLite）在线程中执行"""
+        if isinstance(self.analyzer.cache, dict):
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
+
+    async def admit(self, endpoint, client, symbols, period="1mo"):
+        """申请准入名额（与同步应用共用队列），被拒绝时抛出 Overloaded
+
+        缓存检查和排队等待都会阻塞，在单独的线程池中进行；请求在等待中被取消时，拿到的名额随即归还
+        """
+        def enter():
+            cold = not all(is_cached(self.analyzer, symbol, period) for symbol in symbols)
+            return admission.admit(endpoint, client, cold=cold)
+
+        future = asyncio.get_running_loop().run_in_executor(self.waiters, enter)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(
+                lambda f: f.cancelled() or f.exception() is not None or f.result().release())
+            raise
+
+    async def fetch_history(self, symbol, period):
+        """请求 Yahoo 日线数据（STOCK_DATA_PROVIDER=fake 时使用离线数据）"""
+        if PROVIDER == 'fake':
+            started = time.perf_counter()
+            await asyncio.sleep(FAKE_LATENCY)
+            df = await self.run_cpu(fake_history, symbol, period)
+            record_upstream(PROVIDER, 'ok', time.perf_counter() - started)
+            return df
+        async with self._upstream:
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(
+                    YAHOO_CHART_URL.format(symbol=symbol),
+                    params={'range': period, 'interval': '1d', 'includePrePost': 'false'},
+                )
+                response.raise_for_status()
+            except Exception:
+                record_upstream('yahoo_chart', 'error', time.perf_counter() - started)
+                raise
+        df = await self.run_cpu(parse_chart, response.json(), symbol)
+        record_upstream('yahoo_chart', 'empty' if df.empty else 'ok', time.perf_counter() - started)
+        return df
+
+    async def get_stock_data(self, symbol, period="1mo", fallback=True):
+        """获取股票数据（先查缓存，失败时与同步版一样退回示例数据；fallback=False 时抛出异常）"""
+        symbol = symbol.strip().upper()
+        cache_key = f"{symbol}_{period}"
+        df = await self.cache_io(self.analyzer.cache.get, cache_key)
+        cache_lookup(df is not None)
+        if df is not None:
+            return df
+
+        # 是否允许示例数据不同的请求不能共用结果
+        key = (cache_key, fallback)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(symbol, period, cache_key, fallback))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, symbol, period, cache_key, fallback=True):
+        print(f"📈 获取 {symbol} 股票数据 ({period})...")
+        started = time.perf_counter()
+        try:
+            if not symbol or len(symbol) > 10:
+                raise ValueError(f"无效的股票代码: {symbol}")
+            df = await self.fetch_history(symbol, period)
+            if df.empty:
+                if not fallback:
+                    raise ValueError(f"未找到 {symbol} 的行情数据")
+                print(f"⚠️  未找到实时数据，使用示例数据")
+                df = self.analyzer.get_sample_data(symbol)
+            else:
+                print(f"✅ 获取成功: {len(df)} 条记录")
+        except Exception as e:
+            print(f"⚠️  获取实时数据失败: {e}")
+            if not fallback:
+                raise
+            print("   使用示例数据...")
+            df = self.analyzer.get_sample_data(symbol)
+        finally:
+            STAGE_SECONDS.labels('fetch').observe(time.perf_counter() - started)
+        return await self.cache_io(self.analyzer.store, cache_key, df)
+
+    async def analyze_stock(self, symbol, period="1mo", timeframes=None, max_points=None,
+                            version=None, since=None):
+        """与 StockAnalyzer.analyze_stock 相同的结果，数据获取异步、计算在线程池"""
+        df = await self.get_stock_data(symbol, period)
+        return await self.run_cpu(
+            self.analyzer.analyze_frame, symbol, df, period, timeframes, max_points, version, since
+        )
+
+
+def _load_flask_module(name):
+    """导入对应的同步应用模块（复用其分析器与页面）"""
+    if name == 'web':
+        import stock_web_app as module
+    elif name == 'progressive':
+        import progressive_stock_app as module
+    else:
+        raise ValueError(f"未知的应用: {name}，可选 web / progressive")
+    return module
+
+
+def create_app(name='web'):
+    """创建异步应用，name 为 'web'（stock_web_app）或 'progressive'（progressive_stock_app）"""
+    if Quart is None:
+        raise RuntimeError("异步模式需要 quart: pip install quart httpx hypercorn")
+
+    module = _load_flask_module(name)
+    service = AsyncStockService(module.analyzer)
+    app = Quart(__name__, static_folder='static')
+    init_json(app, QuartJSONProvider)
+    app.config['STOCK_SERVICE'] = service
+
+    @app.before_serving
+    async def _startup():
+        await service.start()
+
+    @app.after_serving
+    async def _shutdown():
+        await service.close()
+
+    @app.after_request
+    async def _compress(response):
+        if compressible(response):
+            encode_body(response, await response.get_data(), request.accept_encodings)
+        return response
+
+    @app.route('/')
+    async def index():
+        """首页"""
+        if name == 'web':
+            with module.app.app_context():
+                page = module.index_page()
+        else:
+            page = module.HOME_PAGE
+        return page.respond(request, Response)
+
+    @app.route('/api/metrics')
+    async def api_metrics():
+        """运行指标（Prometheus 文本格式）"""
+        return Response(REGISTRY.render(), content_type=METRICS_MIME)
+
+    @app.route('/api/analyze', methods=['POST'])
+    async def api_analyze():
+        """分析股票API"""
+        symbol = ''
+        try:
+            data = await request.get_json(silent=True)
+            if not data:
+                return jsonify({'error': '请求数据为空'}), 400
+
+            symbol = data.get('symbol', '').strip().upper()
+            period = data.get('period', '1mo')
+
+            if not symbol:
+                return jsonify({'error': '请输入股票代码'}), 400
+
+            if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+                return jsonify({'error': f'无效的股票代码格式: {symbol}'}), 400
+
+            try:
+                timeframes = parse_timeframes(data.get('timeframes'))
+                max_points = parse_max_points(data.get('max_points'))
+                version = data.get('version')
+                if version:
+                    parse_version(version)
+                since = parse_since(data.get('since'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            binary = wants_binary(request.accept_mimetypes)
+            with await service.admit('analyze', client_key(request), [symbol], period):
+                df = await service.get_stock_data(symbol, period)
+                etag = make_etag(await service.run_cpu(frame_digest, df), period, timeframes, max_points, binary,
+                                 version, since)
+                if is_fresh(request, etag):
+                    return not_modified(etag, Response)
+
+                result = await service.run_cpu(
+                    module.analyzer.analyze_frame, symbol, df, period, timeframes, max_points,
+                    version, since
+                )
+                if binary:
+                    body = await service.run_cpu(encode_chart_payload, result)
+                    response = Response(body, mimetype=CHART_MIME)
+                else:
+                    response = jsonify(result)
+            response.headers['Vary'] = 'Accept'
+            return with_etag(response, etag)
+
+        except Overloaded as e:
+            return e.response(Response)
+        except Exception as e:
+            error_msg = str(e)
+            if 'pattern' in error_msg.lower():
+                error_msg = f'股票代码格式错误: {symbol}，请使用如 AAPL、MSFT 等格式'
+            return jsonify({'error': error_msg}), 500
+
+    @app.route('/api/chart/<symbol>.png')
+    async def api_chart(symbol):
+        """分析图表图片（渲染在线程池中进行）"""
+        symbol = symbol.strip().upper()
+        period = request.args.get('period', '1mo')
+        if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+            return jsonify({'error': f'无效的股票代码格式: {symbol}'}), 400
+        try:
+            size = parse_size(request.args.get('width'), request.args.get('height'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            with await service.admit('chart', client_key(request), [symbol], period):
+                df = await service.get_stock_data(symbol, period)
+                version = await service.run_cpu(frame_digest, df)
+                etag = make_etag('png', version, period, size)
+                if is_fresh(request, etag):
+                    return not_modified(etag, Response)
+                png = await service.run_cpu(chart_png, module.analyzer, symbol, period, size, df, version)
+            return with_etag(Response(png, mimetype='image/png'), etag)
+        except Overloaded as e:
+            return e.response(Response)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/stream')
+    async def api_stream():
+        """实时行情推送（Server-Sent Events），与同步应用共用轮询线程"""
+        try:
+            symbols = parse_symbols(request.args.get('symbols'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        response = Response(module.stream_hub.stream_async(symbols, last_event_id), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        # 长连接不受 Quart 默认响应超时限制
+        response.timeout = None
+        return response
+
+    @app.websocket('/api/ws')
+    async def api_ws():
+        """实时行情 WebSocket（多路复用订阅，与同步应用共用轮询线程）"""
+        await SocketSession(module.stream_hub).run_async(websocket.receive, websocket.send)
+
+    @app.route('/api/symbols/suggest')
+    async def api_symbols_suggest():
+        """股票代码联想（代码 / 中文名称 / 拼音首字母）"""
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = request.args.get('q', '')
+        return json_response(request, {'query': query, 'suggestions': get_index().suggest(query, limit)}, Response)
+
+    @app.route('/api/screen', methods=['GET', 'POST'])
+    async def api_screen():
+        """全市场选股（表达式编译为向量运算，在线程池中执行）"""
+        params = request.args if request.method == 'GET' else (await request.get_json(silent=True) or {})
+        try:
+            result = await service.run_cpu(screen_request, params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return json_response(request, result, Response)
+
+    if name == 'progressive':
+        @app.route('/api/test')
+        async def api_test():
+            """测试API"""
+            return jsonify({
+                'status': 'ok',
+                'message': 'API工作正常',
+                'version': '渐进增强版 v1.0 (async)',
+                'timestamp': pd.Timestamp.now().isoformat()
+            })
+        return app
+
+    @app.route('/api/stocks')
+    async def api_stocks():
+        """获取股票列表API"""
+        return json_response(request, {'stocks': module.POPULAR_STOCKS}, Response)
+
+    @app.route('/api/batch_analyze', methods=['POST'])
+    async def api_batch_analyze():
+        """批量分析API（各股票并发获取与计算，支持 NDJSON 流式输出；校验、准入与同步版相同）"""
+        data = await request.get_json(silent=True)
+        try:
+            symbols, versions, since = module.parse_batch_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        requested = len(symbols)
+        symbols = symbols[:module.BATCH_SYMBOL_LIMIT]
+        try:
+            # 整个批次占一个名额，含未缓存股票时走冷队列
+            ticket = await service.admit('batch', client_key(request), symbols)
+        except Overloaded as e:
+            return e.response(Response)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+        async def analyze_one(index, symbol):
+            version = versions.get(symbol)
+            try:
+                result = await service.analyze_stock(symbol, version=version, since=since)
+            except Exception as e:
+                return index, {'symbol': symbol, 'error': str(e)}
+            item = dict(result['analysis'], version=result['update']['version'])
+            if version or since:
+                item['update'] = result['update']
+                item['chart_data'] = result['chart_data']
+            return index, item
+
+        def finish():
+            for task in tasks:
+                task.cancel()
+            ticket.release()
+
+        tasks = []
+        # 流式响应接管名额之前，任何异常都要先归还名额
+        try:
+            tasks.extend(asyncio.ensure_future(analyze_one(i, s)) for i, s in enumerate(symbols))
+            streaming = data.get('stream') or request.accept_mimetypes.best_match(
+                ['application/json', module.NDJSON_MIME]) == module.NDJSON_MIME
+            if streaming:
+                async def lines():
+                    start = time.time()
+                    errors = 0
+                    try:
+                        for next_done in asyncio.as_completed(tasks):
+                            index, item = await next_done
+                            errors += 'error' in item
+                            yield dumps(dict(item, index=index)) + b'\n'
+                        yield dumps({
+                            'done': True,
+                            'count': len(tasks),
+                            'errors': errors,
+                            'requested': requested,
+                            'limit': module.BATCH_SYMBOL_LIMIT,
+                            'elapsed': round(time.time() - start, 3)
+                        }) + b'\n'
+                    finally:
+                        finish()
+
+                body = lines()
+                # 客户端在开始读取前断开时生成器不会运行，由生成器被回收时释放
+                weakref.finalize(body, finish)
+                response = Response(body, mimetype=module.NDJSON_MIME)
+                response.headers['X-Accel-Buffering'] = 'no'
+                return response
+        except Exception as e:
+            finish()
+            return jsonify({'error': str(e)}), 500
+
+        try:
+            results = await asyncio.gather(*tasks)
+            return jsonify({'results': [item for _, item in results]})
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            finish()
+
+    @app.route('/api/trending')
+    async def api_trending():
+        """热门股票分析（后台快照）"""
+        snapshot = await module.trending.wait_ready_async(module.TRENDING_FIRST_WAIT)
+        if snapshot is None:
+            response = jsonify({'error': '热门股票数据生成中，请稍后重试'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+        return snapshot.respond(request, Response)
+
+    @app.route('/api/compare', methods=['GET', 'POST'])
+    async def api_compare():
+        """多股票对比（各股票并发获取，对齐后一次矩阵运算）"""
+        params = request.args if request.method == 'GET' else (await request.get_json(silent=True) or {})
+        period = params.get('period', '1mo')
+        try:
+            symbols = parse_compare_symbols(params.get('symbols'))
+            benchmark = parse_benchmark(params.get('benchmark'), symbols)
+            max_points = parse_max_points(params.get('max_points'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        try:
+            with await service.admit('compare', client_key(request), symbols, period):
+                # 不用示例数据充当行情，任何一只失败都返回错误
+                frames = await asyncio.gather(*(service.get_stock_data(symbol, period, fallback=False)
+                                                for symbol in symbols), return_exceptions=True)
+                for symbol, df in zip(symbols, frames):
+                    if isinstance(df, Exception):
+                        payload, status = fetch_error(symbol, df)
+                        return jsonify(payload), status
+                frames = dict(zip(symbols, frames))
+                digests = [await service.run_cpu(frame_digest, df) for df in frames.values()]
+                etag = make_etag(*digests, symbols, period, benchmark, max_points)
+                if is_fresh(request, etag):
+                    return not_modified(etag, Response)
+                result = await service.run_cpu(compare_frames, frames, benchmark, max_points)
+            result['period'] = period
+            return with_etag(jsonify(result), etag)
+        except Overloaded as e:
+            return e.response(Response)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/market/breadth')
+    @app.route('/api/market/heatmap')
+    async def api_market():
+        """市场宽度 / 行业热力图（同一快照只计算一次）"""
+        try:
+            snapshot = await service.run_cpu(get_breadth().current)
+        except Exception as e:
+            response = jsonify({'error': f'市场行情快照获取失败: {e}'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '30'
+            return response
+        if request.path.endswith('/heatmap'):
+            return snapshot.respond('heatmap', request, Response)
+        symbol = request.args.get('symbol', '').strip().upper()
+        if symbol:
+            return json_response(request, snapshot.context(symbol), Response)
+        return snapshot.respond('breadth', request, Response)
+
+    return app
+
+
+def serve(app, host, port):
+    """优先用 hypercorn 运行，未安装时退回 Quart 自带的服务器"""
+    try:
+        import hypercorn.asyncio
+        from hypercorn.config import Config
+    except ImportError:
+        app.run(host=host, port=port)
+        return
+    config = Config()
+    config.bind = [f"{host}:{port}"]
+    asyncio.run(hypercorn.asyncio.serve(app, config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票分析Web应用（异步模式）')
+    parser.add_argument('--app', choices=['web', 'progressive'], default='web', help='要运行的应用')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=None, help='默认 web=9988, progressive=8888')
+    args = parser.parse_args()
+
+    port = args.port or (9988 if args.app == 'web' else 8888)
+    print(f"🚀 股票分析Web应用（异步模式: {args.app}）启动中...")
+    print(f"🌐 访问地址: http://localhost:{port}")
+    print(f"⚙️  计算线程: {CPU_WORKERS}，上游并发: {UPSTREAM_CONCURRENCY}")
+    serve(create_app(args.app), args.host, port)
+
+
+if __name__ == '__main__':
+    main()
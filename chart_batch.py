@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+批量生成股票分析图表
+整个自选股列表一次出图：数据在线程池中并发获取，图表在进程池中并行渲染（Agg，无界面），
+每个工作进程启动时预加载字体并建好图表模板，之后每张图只更新数据
+
+输出目录按日期和周期整理:
+    charts/2026-02-19/3mo/AAPL.png
+    charts/2026-02-19/3mo/report.json     每张图的渲染耗时、大小、失败原因
+    charts/2026-02-19/sample/AAPL.png     --sample 的示例数据单独存放，不与真实行情图混在一起
+
+获取失败的股票记入 report.json 的 errors，不会用示例数据代替
+
+用法:
+    python chart_batch.py AAPL MSFT TSLA BABA
+    python chart_batch.py --file watchlist.txt --period 6mo --workers 8
+    python chart_batch.py --popular --sample        # 使用示例数据（离线）
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+import numpy as np
+
+DEFAULT_SIZE = (1200, 900)
+DEFAULT_OUTPUT = 'charts'
+POPULAR_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'TSLA', 'NVDA', 'AMZN', 'BABA', 'JD']
+
+# 工作进程内的图表模板（initializer 中创建）
+_template = None
+
+
+def _init_worker(width, height):
+    """工作进程初始化：Agg 后端、预加载字体、预热模板"""
+    global _template
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import font_manager
+    import pandas as pd
+    from chart_render import ChartTemplate, add_chart_indicators
+
+    for family in matplotlib.rcParams['font.sans-serif']:
+        font_manager.findfont(family, fallback_to_default=True)
+    _template = ChartTemplate(width, height, full=True)
+    # 预热一次，让字体与文字排版缓存就绪
+    index = pd.date_range('2024-01-01', periods=40, freq='B')
+    warmup = pd.DataFrame({'Close': np.linspace(100, 110, 40)}, index=index)
+    _template.render('WARMUP', add_chart_indicators(warmup))
+
+
+def render_chart(symbol, df, path):
+    """工作进程中执行：补齐指标、渲染并写入文件，返回统计信息"""
+    from chart_render import add_chart_indicators
+    started = time.perf_counter()
+    png = _template.render(symbol, add_chart_indicators(df.copy()))
+    render_ms = (time.perf_counter() - started) * 1000
+    with open(path, 'wb') as f:
+        f.write(png)
+    return {'symbol': symbol, 'file': path, 'render_ms': round(render_ms, 1), 'bytes': len(png), 'rows': len(df)}
+
+
+def read_symbols(args):
+    """命令行参数 + 列表文件（每行一个或逗号分隔，# 开头为注释）"""
+    symbols = list(args.symbols)
+    if args.file:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0]
+                symbols.extend(part for part in re.split(r'[,\s]+', line) if part)
+    if args.popular:
+        symbols.extend(POPULAR_SYMBOLS)
+    result = []
+    for symbol in symbols:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in result:
+            result.append(symbol)
+    return result
+
+
+def safe_filename(symbol):
+    return re.sub(r'[^A-Za-z0-9._^-]', '_', symbol) + '.png'
+
+
+def parse_size(value):
+    try:
+        width, height = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"尺寸格式应为 宽x高，如 1200x900: {value}")
+    return width, height
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 1) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量生成股票分析图表')
+    parser.add_argument('symbols', nargs='*', help='股票代码')
+    parser.add_argument('--file', help='自选股列表文件')
+    parser.add_argument('--popular', action='store_true', help='加入常用股票')
+    parser.add_argument('--period', default='3mo', help='数据周期，默认 3mo')
+    parser.add_argument('--size', type=parse_size, default=DEFAULT_SIZE, help='图片尺寸，默认 1200x900')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='渲染进程数')
+    parser.add_argument('--fetch-workers', type=int, default=8, help='数据获取线程数')
+    parser.add_argument('--sample', action='store_true', help='使用示例数据（不访问网络）')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='输出根目录')
+    args = parser.parse_args()
+
+    symbols = read_symbols(args)
+    if not symbols:
+        parser.error('请提供股票代码、--file 或 --popular')
+
+    from quick_stock_analyzer import QuickStockAnalyzer
+    analyzer = QuickStockAnalyzer()
+    if args.sample:
+        fetch = analyzer.get_sample_data
+    else:
+        fetch = lambda s: analyzer.get_stock_data(s, period=args.period, fallback=False)
+
+    out_dir = os.path.join(args.output, datetime.now().strftime('%Y-%m-%d'), 'sample' if args.sample else args.period)
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"🖼️  批量出图: {len(symbols)} 只股票, {args.workers} 个渲染进程 -> {out_dir}")
+
+    started = time.perf_counter()
+    results, errors = [], []
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=tuple(args.size)) as renderers, \
+            ThreadPoolExecutor(max_workers=args.fetch_workers) as fetchers:
+        # 数据一到就提交渲染，获取与渲染流水线进行
+        fetches = {fetchers.submit(fetch, symbol): symbol for symbol in symbols}
+        renders = {}
+        for future in as_completed(fetches):
+            symbol = fetches[future]
+            try:
+                df = future.result()
+                if df is None or df.empty:
+                    raise ValueError('没有数据')
+            except Exception as e:
+                errors.append({'symbol': symbol, 'error': f'获取数据失败: {e}'})
+                continue
+            path = os.path.join(out_dir, safe_filename(symbol))
+            renders[renderers.submit(render_chart, symbol, df, path)] = symbol
+        for future in as_completed(renders):
+            try:
+                item = future.result()
+            except Exception as e:
+                errors.append({'symbol': renders[future], 'error': f'渲染失败: {e}'})
+                continue
+            results.append(item)
+            print(f"✅ {item['symbol']:<10} {item['render_ms']:>7.1f}ms  {item['bytes'] / 1024:>6.0f}KB  {item['file']}")
+    elapsed = time.perf_counter() - started
+
+    times = [item['render_ms'] for item in results]
+    summary = {
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'period': args.period,
+        'sample': args.sample,
+        'size': list(args.size),
+        'workers': args.workers,
+        'charts': len(results),
+        'failed': len(errors),
+        'elapsed_seconds': round(elapsed, 2),
+        'charts_per_second': round(len(results) / elapsed, 2) if elapsed else None,
+        'render_ms': {'p50': percentile(times, 50), 'p95': percentile(times, 95), 'max': max(times, default=None)},
+        'results': sorted(results, key=lambda item: item['symbol']),
+        'errors': errors,
+    }
+    report_path = os.path.join(out_dir, 'report.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    for error in errors:
+        print(f"❌ {error['symbol']}: {error['error']}")
+    print(f"\n📊 完成: {len(results)} 张图, 失败 {len(errors)}, 用时 {elapsed:.1f}s "
+          f"(渲染 p50 {summary['render_ms']['p50']}ms, p95 {summary['render_ms']['p95']}ms)")
+    print(f"📄 报告: {report_path}")
+
+
+if __name__ == '__main__':
+    main()
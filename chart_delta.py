@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+图表增量更新
+为每份行情数据生成版本令牌，客户端带上令牌（或最后一根K线日期）再次请求时，
+只返回新增或被修改的K线，令牌不匹配时返回完整数据
+
+令牌格式: "<K线数>.<前 n-1 根K线的摘要>"
+最后一根K线不参与摘要，盘中更新最后一根K线时令牌前缀仍然有效，
+增量从客户端的最后一根K线开始（覆盖它并追加新K线）
+"""
+
+import hashlib
+import pandas as pd
+import numpy as np
+
+
+def _digest(df, n, column='Close'):
+    """前 n 根K线（日期 + 收盘价）的摘要"""
+    head = df.iloc[:n]
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(head.index.asi8).tobytes())
+    h.update(np.ascontiguousarray(head[column].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()[:16]
+
+
+def data_version(df, column='Close'):
+    """当前数据的版本令牌"""
+    n = len(df)
+    return f"{n}.{_digest(df, max(n - 1, 0), column)}"
+
+
+def parse_version(token):
+    """解析版本令牌，返回 (K线数, 摘要)"""
+    try:
+        count, digest = str(token).split('.', 1)
+        return int(count), digest
+    except ValueError:
+        raise ValueError(f"无效的数据版本: {token}")
+
+
+def parse_since(value):
+    """解析客户端最后一根K线的日期，返回 "YYYY-MM-DD"（未提供时为 None），格式错误时抛出 ValueError"""
+    if value in (None, ''):
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"since 必须是日期字符串: {value!r}")
+    try:
+        since = pd.Timestamp(value)
+    except (TypeError, ValueError, OverflowError):
+        since = pd.NaT
+    if pd.isna(since):
+        raise ValueError(f"无效的日期: {value}")
+    return since.strftime('%Y-%m-%d')
+
+
+def delta_start(df, version=None, since=None, column='Close'):
+    """计算增量起点下标，返回 None 表示需要完整数据
+
+    version: 客户端持有的版本令牌（优先，会校验历史是否被改写）
+    since: 客户端最后一根K线的日期
+    """
+    if version:
+        count, digest = parse_version(version)
+        if count < 1 or count > len(df):
+            return None
+        if _digest(df, count - 1, column) != digest:
+            return None
+        return count - 1
+
+    if since:
+        since = pd.Timestamp(since)
+        index = df.index
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        pos = index.searchsorted(since)
+        if pos >= len(index) or index[pos].normalize() != since.normalize():
+            return None
+        return int(pos)
+
+    return None
+
+
+def update_info(df, start, column='Close'):
+    """增量响应的元信息"""
+    info = {
+        'mode': 'full' if start is None else 'delta',
+        'version': data_version(df, column),
+        'points': len(df) if start is None else len(df) - start,
+    }
+    if start is not None:
+        info['replace_from'] = df.index[start].strftime('%Y-%m-%d')
+    return info
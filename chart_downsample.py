@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+图表降采样模块
+长周期图表用 LTTB（Largest-Triangle-Three-Buckets）保形降采样，
+所有序列共用同一组采样点；成交量按区间保留最大、最小两根K线（按时间顺序），放量和缩量都不被抹掉
+"""
+
+import numpy as np
+
+# 单个图表允许请求的最大点数
+MAX_POINTS_LIMIT = 5000
+# 少于该点数时不再降采样
+MIN_POINTS = 3
+
+
+def lttb_indices(y, n_out):
+    """LTTB 选点，返回保留点的下标（含首尾）
+
+    y: 数值序列（横轴为等间距的下标）；NaN 视为前值
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < MIN_POINTS:
+        return np.arange(n)
+
+    # NaN 前向填充，开头的 NaN 用第一个有效值
+    mask = np.isnan(y)
+    if mask.any():
+        valid = np.flatnonzero(~mask)
+        if len(valid) == 0:
+            return np.linspace(0, n - 1, n_out).astype(np.intp)
+        fill = np.maximum.accumulate(np.where(mask, 0, np.arange(n)))
+        fill[:valid[0]] = valid[0]
+        y = y[fill]
+
+    x = np.arange(n, dtype=float)
+    # 首尾之外的点均分为 n_out-2 个桶
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.intp)
+
+    # 每个桶的均值（作为下一桶的参考点）
+    sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_y = sums / counts
+    avg_x = (edges[:-1] + edges[1:] - 1) / 2.0
+    avg_y = np.append(avg_y, y[-1])
+    avg_x = np.append(avg_x, x[-1])
+
+    selected = np.empty(n_out, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        bx = x[start:end]
+        by = y[start:end]
+        # 三角形面积（省略常数 1/2）
+        area = np.abs((x[a] - cx) * (by - y[a]) - (x[a] - bx) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def bucket_extremes(values, indices):
+    """每个保留点代表相邻采样点之间的区间，返回各区间最小值、最大值所在的下标（按时间顺序）"""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    # 区间边界取相邻保留点的中点
+    bounds = np.concatenate(([0], (indices[:-1] + indices[1:] + 1) // 2, [len(values)]))
+    extremes = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        segment = values[start:end]
+        low, high = start + int(np.argmin(segment)), start + int(np.argmax(segment))
+        extremes.extend(sorted({low, high}))
+    return np.asarray(extremes, dtype=np.intp)
+
+
+def downsample_frame(df, max_points, price_column='Close', volume_column='Volume'):
+    """按价格序列选点，对整张表降采样
+
+    所有列取同一组下标，保证各图表横轴一致；有成交量列时点数的三分之一给价格选点，
+    其余用于各区间成交量最大、最小的K线，总点数不超过 max_points
+    """
+    if not max_points or len(df) <= max_points:
+        return df
+    max_points = max(MIN_POINTS, min(int(max_points), MAX_POINTS_LIMIT))
+    with_volume = volume_column in df.columns and max_points >= 3 * MIN_POINTS
+    indices = lttb_indices(df[price_column].to_numpy(), max_points // 3 if with_volume else max_points)
+    if with_volume:
+        indices = np.union1d(indices, bucket_extremes(df[volume_column].to_numpy(), indices))
+    return df.iloc[indices]
+
+
+def parse_max_points(value):
+    """解析请求中的 max_points 参数"""
+    if value in (None, ''):
+        return None
+    try:
+        points = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"max_points 必须是整数: {value}")
+    if points < MIN_POINTS:
+        raise ValueError(f"max_points 不能小于 {MIN_POINTS}")
+    return min(points, MAX_POINTS_LIMIT)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+二进制图表数据格式
+把 /api/analyze 的图表序列打包成一个二进制帧：每个序列为紧凑的类型化数组
+（数值为 float32，日期为相对 1970-01-01 的 int32 天数），前端直接解码为 Float32Array
+
+帧结构（小端）:
+    b'SCP1' | uint32 头部长度 | JSON 头部（空格补齐到 4 字节对齐） | 数据区
+头部:
+    {"version": 1, "result": 除图表数组外的分析结果,
+     "series": [{"block": "daily", "name": "prices", "dtype": "f4", "offset": 0, "count": 250}, ...]}
+offset 相对数据区起点；block 为 "daily" 或 timeframes 中的周期名
+"""
+
+import json
+import math
+import struct
+import pandas as pd
+import numpy as np
+
+CHART_MIME = 'application/x-stock-chart'
+MAGIC = b'SCP1'
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def wants_binary(accept_mimetypes):
+    """按 Accept 协商：客户端明确偏好二进制格式时返回 True"""
+    return accept_mimetypes.best_match(['application/json', CHART_MIME]) == CHART_MIME
+
+
+def dates_to_days(dates):
+    """日期索引 -> int32 天数"""
+    index = pd.DatetimeIndex(dates)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = index.values.astype('datetime64[D]') - EPOCH
+    return days.astype('<i4')
+
+
+def days_to_dates(days):
+    """int32 天数 -> 日期索引"""
+    return pd.DatetimeIndex(EPOCH + np.asarray(days).astype('timedelta64[D]'))
+
+
+def _clean(value):
+    """把头部中的 NaN/inf 与 numpy 标量转为 JSON 可表示的值"""
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _blocks(result):
+    """按 block 列出需要打包的图表数据"""
+    yield 'daily', result.get('chart_data') or {}
+    for timeframe, tf_result in (result.get('timeframes') or {}).items():
+        if 'chart_data' in tf_result:
+            yield timeframe, tf_result['chart_data']
+
+
+def _strip_charts(result):
+    """去掉图表数组后的结果（写入头部）"""
+    meta = {k: v for k, v in result.items() if k != 'chart_data'}
+    if 'timeframes' in meta:
+        meta['timeframes'] = {
+            tf: {k: v for k, v in tf_result.items() if k != 'chart_data'}
+            for tf, tf_result in meta['timeframes'].items()
+        }
+    return meta
+
+
+def encode_chart_payload(result):
+    """把分析结果编码为二进制帧
+
+    result['chart_data'] 中 dates 为日期索引，其余为数值数组
+    """
+    series = []
+    chunks = []
+    offset = 0
+    for block, chart_data in _blocks(result):
+        for name, values in chart_data.items():
+            if name == 'dates':
+                data = dates_to_days(values)
+                dtype = 'i4'
+            else:
+                data = np.asarray(values, dtype='<f4')
+                dtype = 'f4'
+            raw = data.tobytes()
+            series.append({'block': block, 'name': name, 'dtype': dtype, 'offset': offset, 'count': int(len(data))})
+            chunks.append(raw)
+            offset += len(raw)
+
+    header = json.dumps(
+        {'version': 1, 'result': _clean(_strip_charts(result)), 'series': series},
+        ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+    header += b' ' * (-(len(MAGIC) + 4 + len(header)) % 4)
+
+    return b''.join([MAGIC, struct.pack('<I', len(header)), header] + chunks)
+
+
+def decode_chart_payload(payload):
+    """解码二进制帧（Python 客户端/测试使用），返回与 JSON 接口同结构的字典"""
+    if payload[:4] != MAGIC:
+        raise ValueError("不是有效的图表数据帧")
+    header_len = struct.unpack_from('<I', payload, 4)[0]
+    header = json.loads(payload[8:8 + header_len].decode('utf-8'))
+    body = 8 + header_len
+
+    blocks = {}
+    for entry in header['series']:
+        dtype = '<i4' if entry['dtype'] == 'i4' else '<f4'
+        values = np.frombuffer(payload, dtype=dtype, count=entry['count'], offset=body + entry['offset'])
+        if entry['name'] == 'dates':
+            values = days_to_dates(values)
+        blocks.setdefault(entry['block'], {})[entry['name']] = values
+
+    result = header['result']
+    result['chart_data'] = blocks.get('daily', {})
+    for timeframe, tf_result in (result.get('timeframes') or {}).items():
+        if timeframe in blocks:
+            tf_result['chart_data'] = blocks[timeframe]
+    return result
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+服务端图表渲染
+按尺寸预先建好 Agg 图表模板（坐标轴、网格、图例、参考线），每次只更新曲线数据后输出 PNG；
+渲染结果按 (股票, 周期, 数据版本, 尺寸) 缓存，按总字节数 LRU 淘汰，
+同一股票出现新数据时旧版本图片立即淘汰
+
+- 模板不经过 pyplot，线程安全：每个模板同一时间只被一个线程使用，并发请求各取一个（按尺寸分池）
+- 缓存命中直接返回字节；未命中只需 set_data + 一次 Agg 绘制（几十毫秒）
+- 横轴为交易日序号（不留周末空档），刻度按序号取日期标签；刻度数固定为少量，文字绘制是主要开销
+- PNG 以 RGB、低压缩级别编码（体积略大，编码耗时约为默认的 1/4）
+"""
+
+import io
+import os
+import queue
+import itertools
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+from PIL import Image
+
+# 中文字体按顺序回退（缺少时中文显示为方框，不影响数据）
+matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei',
+                                          'DejaVu Sans']
+matplotlib.rcParams['axes.unicode_minus'] = False
+
+DPI = 100
+DEFAULT_SIZE = (800, 500)
+MIN_SIZE = (200, 150)
+MAX_SIZE = (2000, 1500)
+# 图片缓存上限（字节），可用环境变量 STOCK_CHART_CACHE_MB 调整
+CACHE_BYTES = int(float(os.environ.get('STOCK_CHART_CACHE_MB', 64)) * 1024 * 1024)
+# 每种尺寸最多保留的空闲模板数
+TEMPLATES_PER_SIZE = 4
+
+
+def parse_size(width, height):
+    """解析图片尺寸参数（像素）"""
+    try:
+        width = int(width) if width not in (None, '') else DEFAULT_SIZE[0]
+        height = int(height) if height not in (None, '') else DEFAULT_SIZE[1]
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的图片尺寸: {width}x{height}")
+    if not (MIN_SIZE[0] <= width <= MAX_SIZE[0] and MIN_SIZE[1] <= height <= MAX_SIZE[1]):
+        raise ValueError(f"图片尺寸需在 {MIN_SIZE[0]}x{MIN_SIZE[1]} 到 {MAX_SIZE[0]}x{MAX_SIZE[1]} 之间")
+    return width, height
+
+
+def add_chart_indicators(df):
+    """补齐完整图表需要的指标列（已存在的列不重新计算）"""
+    close = df['Close']
+    if 'SMA_10' not in df:
+        df['SMA_10'] = close.rolling(window=10).mean()
+    if 'SMA_30' not in df:
+        df['SMA_30'] = close.rolling(window=30).mean()
+    if 'RSI' not in df:
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+        df['RSI'] = 100 - (100 / (1 + gain / loss))
+    if 'BB_upper' not in df or 'BB_lower' not in df:
+        middle = close.rolling(window=20).mean()
+        std = close.rolling(window=20).std()
+        df['BB_upper'] = middle + std * 2
+        df['BB_lower'] = middle - std * 2
+    if 'MACD' not in df or 'MACD_signal' not in df:
+        df['MACD'] = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+        df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
+    return df
+
+
+class ChartTemplate:
+    """一种尺寸的图表模板：价格 + 均线，RSI + 超买超卖线
+
+    full=True 时价格图加布林带，并增加 MACD 图（需要 BB_upper / BB_lower / MACD / MACD_signal 列）
+    """
+
+    def __init__(self, width, height, full=False):
+        self.full = full
+        self.figure = Figure(figsize=(width / DPI, height / DPI), dpi=DPI)
+        self.canvas = FigureCanvasAgg(self.figure)
+        if full:
+            price_ax, rsi_ax, macd_ax = self.figure.subplots(
+                3, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1, 1]})
+        else:
+            price_ax, rsi_ax = self.figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+            macd_ax = None
+        self.price_ax, self.rsi_ax, self.macd_ax = price_ax, rsi_ax, macd_ax
+        self.bottom_ax = macd_ax or rsi_ax
+
+        self.close_line, = price_ax.plot([], [], label='收盘价', linewidth=2)
+        self.sma10_line, = price_ax.plot([], [], label='10日MA', linestyle='--')
+        self.sma30_line, = price_ax.plot([], [], label='30日MA', linestyle='--')
+        if full:
+            self.bb_upper_line, = price_ax.plot([], [], label='布林上轨', color='gray', linewidth=1, alpha=0.7)
+            self.bb_lower_line, = price_ax.plot([], [], label='布林下轨', color='gray', linewidth=1, alpha=0.7)
+            self.bb_fill = None
+        self.title = price_ax.set_title('')
+        price_ax.legend(loc='upper left', fontsize='small')
+        price_ax.grid(True, alpha=0.3)
+
+        self.rsi_line, = rsi_ax.plot([], [], label='RSI', color='orange', linewidth=2)
+        rsi_ax.axhline(y=70, color='r', linestyle='--', alpha=0.5)
+        rsi_ax.axhline(y=30, color='g', linestyle='--', alpha=0.5)
+        rsi_ax.set_ylim(0, 100)
+        rsi_ax.set_yticks([30, 70])
+        rsi_ax.set_title('RSI指标')
+        rsi_ax.grid(True, alpha=0.3)
+
+        if full:
+            self.macd_line, = macd_ax.plot([], [], label='MACD', linewidth=1)
+            self.signal_line, = macd_ax.plot([], [], label='Signal', linewidth=1)
+            self.hist = None
+            macd_ax.axhline(y=0, color='black', linewidth=0.5, alpha=0.5)
+            macd_ax.set_title('MACD指标')
+            macd_ax.yaxis.set_major_locator(MaxNLocator(3))
+            macd_ax.grid(True, alpha=0.3)
+
+        self.labels = []
+        for ax in (price_ax, rsi_ax, macd_ax):
+            if ax is not None and ax is not self.bottom_ax:
+                ax.tick_params(labelbottom=False)
+        price_ax.yaxis.set_major_locator(MaxNLocator(5))
+        self.bottom_ax.xaxis.set_major_locator(MaxNLocator(6, integer=True))
+        self.bottom_ax.xaxis.set_major_formatter(FuncFormatter(self._date_label))
+        # 固定边距，避免每次渲染都做 tight_layout
+        self.figure.subplots_adjust(left=0.08, right=0.98, top=0.95 if full else 0.93,
+                                    bottom=0.06 if full else 0.08, hspace=0.35 if full else 0.3)
+
+    def _date_label(self, value, pos=None):
+        i = int(round(value))
+        return self.labels[i] if 0 <= i < len(self.labels) else ''
+
+    def _render_full(self, x, df):
+        """布林带与 MACD（填充区域和柱状图随数据长度变化，每次重建这两个集合）"""
+        upper = df['BB_upper'].to_numpy(dtype=float)
+        lower = df['BB_lower'].to_numpy(dtype=float)
+        self.bb_upper_line.set_data(x, upper)
+        self.bb_lower_line.set_data(x, lower)
+        if self.bb_fill is not None:
+            self.bb_fill.remove()
+        self.bb_fill = self.price_ax.fill_between(x, lower, upper, color='gray', alpha=0.1, linewidth=0)
+
+        macd = df['MACD'].to_numpy(dtype=float)
+        signal = df['MACD_signal'].to_numpy(dtype=float)
+        self.macd_line.set_data(x, macd)
+        self.signal_line.set_data(x, signal)
+        if self.hist is not None:
+            self.hist.remove()
+        hist = np.nan_to_num(macd - signal)
+        self.hist = self.macd_ax.vlines(x, 0, hist, colors=np.where(hist >= 0, 'tab:red', 'tab:green'),
+                                        linewidth=2, alpha=0.5)
+        values = np.concatenate([macd, signal, hist])
+        values = values[np.isfinite(values)]
+        if values.size:
+            bound = max(abs(values.min()), abs(values.max())) * 1.1 or 1.0
+            self.macd_ax.set_ylim(-bound, bound)
+
+    def render(self, symbol, df):
+        """更新曲线数据并输出 PNG 字节（df 需已计算 SMA_10 / SMA_30 / RSI）"""
+        x = np.arange(len(df))
+        self.labels = list(df.index.strftime('%Y-%m-%d'))
+        self.close_line.set_data(x, df['Close'].to_numpy())
+        self.sma10_line.set_data(x, df['SMA_10'].to_numpy())
+        self.sma30_line.set_data(x, df['SMA_30'].to_numpy())
+        self.rsi_line.set_data(x, df['RSI'].to_numpy())
+        self.title.set_text(f'{symbol} 价格走势')
+        columns = ['Close', 'SMA_10', 'SMA_30']
+        if self.full:
+            columns += ['BB_upper', 'BB_lower']
+            self._render_full(x, df)
+
+        if len(x) > 1:
+            self.bottom_ax.set_xlim(x[0], x[-1])
+        elif len(x):
+            self.bottom_ax.set_xlim(x[0] - 1, x[0] + 1)
+        prices = df[columns].to_numpy(dtype=float)
+        finite = prices[np.isfinite(prices)]
+        if finite.size:
+            low, high = finite.min(), finite.max()
+            pad = (high - low) * 0.05 or abs(high) * 0.01 or 1.0
+            self.price_ax.set_ylim(low - pad, high + pad)
+
+        self.canvas.draw()
+        image = Image.frombuffer('RGBA', self.canvas.get_width_height(), self.canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, format='png', compress_level=1)
+        return buffer.getvalue()
+
+
+class ChartRenderer:
+    """模板池 + 图片缓存"""
+
+    def __init__(self, cache_bytes=CACHE_BYTES):
+        self.cache_bytes = cache_bytes
+        self.cache = OrderedDict()      # (股票, 周期, 版本, 宽, 高) -> PNG
+        self.cached_bytes = 0
+        self.latest = {}                # (股票, 周期) -> (先后顺序, 最新版本)
+        self._sequence = itertools.count()
+        self.pools = {}                 # (宽, 高) -> 空闲模板
+        self.lock = threading.Lock()
+        self.rendered = 0
+        self.hits = 0
+
+    def _pool(self, size):
+        with self.lock:
+            pool = self.pools.get(size)
+            if pool is None:
+                pool = self.pools[size] = queue.LifoQueue(maxsize=TEMPLATES_PER_SIZE)
+            return pool
+
+    def get(self, symbol, period, version, size):
+        """取缓存的图片，没有时返回 None"""
+        key = (symbol, period, version) + tuple(size)
+        with self.lock:
+            png = self.cache.get(key)
+            if png is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def render(self, symbol, period, version, size, df):
+        """渲染并缓存（df 需已计算指标）"""
+        # 先后顺序: 最后一根K线的时间，相同时（K线被修正）以开始渲染的先后为准
+        order = (df.index[-1].value if len(df) else 0, next(self._sequence))
+        pool = self._pool(size)
+        try:
+            template = pool.get_nowait()
+        except queue.Empty:
+            template = ChartTemplate(*size)
+        try:
+            png = template.render(symbol, df)
+        finally:
+            try:
+                pool.put_nowait(template)
+            except queue.Full:
+                pass
+        self.put(symbol, period, version, size, png, order)
+        return png
+
+    def put(self, symbol, period, version, size, png, order=None):
+        """缓存图片；order 早于已缓存的最新版本时（渲染期间数据已更新）不缓存，不传 order 视为最新"""
+        key = (symbol, period, version) + tuple(size)
+        with self.lock:
+            self.rendered += 1
+            current = self.latest.get((symbol, period))
+            # 出现新版本时淘汰该股票所有尺寸的旧图片
+            if current is None or current[1] != version:
+                if current is not None and order is not None and current[0] is not None and order < current[0]:
+                    return
+                self.latest[(symbol, period)] = (order, version)
+                for old in [k for k in self.cache if k[:2] == (symbol, period) and k[2] != version]:
+                    self.cached_bytes -= len(self.cache.pop(old))
+            if key in self.cache:
+                self.cached_bytes -= len(self.cache.pop(key))
+            self.cache[key] = png
+            self.cached_bytes += len(png)
+            while self.cached_bytes > self.cache_bytes and len(self.cache) > 1:
+                _, old = self.cache.popitem(last=False)
+                self.cached_bytes -= len(old)
+
+    def stats(self):
+        with self.lock:
+            return {'images': len(self.cache), 'bytes': self.cached_bytes,
+                    'rendered': self.rendered, 'hits': self.hits}
+
+
+# 进程内共享的渲染器
+chart_renderer = ChartRenderer()
+
+
+def chart_png(analyzer, symbol, period, size, df, version):
+    """取缓存的图表，未命中时在数据副本上计算指标后渲染"""
+    png = chart_renderer.get(symbol, period, version, size)
+    if png is None:
+        frame = analyzer.calculate_indicators(df.copy())
+        png = chart_renderer.render(symbol, period, version, size, frame)
+    return png
@@ -8,6 +8,7 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from support_resistance import SupportResistanceEngine
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -186,9 +187,13 @@ class ChinaStockAnalyzer:
         trend = '上涨' if current > prices[-2] else '下跌'
         ma_trend = '金叉' if ma_10 > ma_30 else '死叉'
         
-        # 支撑阻力
-        support = min(prices[-5:]) * 0.95
-        resistance = max(prices[-5:]) * 1.05
+        # 支撑阻力：优先使用摆动高低点聚类出的价位，结构不足时按近5日区间估算
+        levels = SupportResistanceEngine(window=3).analyze_prices(prices)
+        support = levels['support'] or min(prices[-5:]) * 0.95
+        resistance = levels['resistance'] or max(prices[-5:]) * 1.05
+        support_2 = levels['support_2'] or support * 0.95
+        # 止损：有第二档支撑时设在其下方 1%，否则与原来一样取支撑位下浮 5%
+        stop_loss = levels['support_2'] * 0.99 if levels['support_2'] else support * 0.95
         
         return {
             'current_price': current,
@@ -197,6 +202,8 @@ class ChinaStockAnalyzer:
             'ma_10': round(ma_10, 2),
             'ma_30': round(ma_30, 2),
             'support': round(support, 2),
+            'support_2': round(support_2, 2),
+            'stop_loss': round(stop_loss, 2),
             'resistance': round(resistance, 2),
             'price_change': price_data['price_change'],
             'price_change_pct': price_data['price_change_pct']
@@ -277,7 +284,7 @@ class ChinaStockAnalyzer:
             'recommendation': recommendation,
             'buy_range': buy_range,
             'target_price': round(technical['resistance'] * 1.1, 2),
-            'stop_loss': round(technical['support'] * 0.95, 2),
+            'stop_loss': technical['stop_loss'],
             'confidence': '高' if total_score >= 3 else '中' if total_score >= 1 else '低'
         }
     
@@ -318,6 +325,7 @@ class ChinaStockAnalyzer:
         
         print(f"\n   技术面分析:")
         print(f"     支撑位: ¥{data['analysis']['technical']['support']:.2f}")
+        print(f"     第二支撑位: ¥{data['analysis']['technical']['support_2']:.2f}")
         print(f"     阻力位: ¥{data['analysis']['technical']['resistance']:.2f}")
         print(f"     10日均线: ¥{data['analysis']['technical']['ma_10']:.2f}")
         print(f"     30日均线: ¥{data['analysis']['technical']['ma_30']:.2f}")
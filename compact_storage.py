@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+紧凑存储模块
+把行情 DataFrame 的 OHLC 降为 float32、成交量降为 int32/int64、代码列转为分类或定长字节，
+缓存和价格面板内存约减半
+
+精度保证:
+- 价格列: float32 有 24 位尾数，相对误差 ≤ 2^-24 ≈ 6e-8。
+  降精度后逐列校验最大绝对误差 ≤ 半个最小价位（默认 0.005，即两位小数可无损还原），
+  不满足的列保持 float64（两位小数时约 13.1 万以上的价格会触发）。
+- 其他浮点列（指标、收益率等）: 校验相对误差 ≤ 1e-6，否则保持 float64。
+- 成交量列: 仅在取值全为整数时转换，超出 int32 范围时使用 int64，不丢失精度。
+"""
+
+import pandas as pd
+import numpy as np
+
+PRICE_COLUMNS = {'Open', 'High', 'Low', 'Close', 'Adj Close', '开盘', '最高', '最低', '收盘', '最新价', '昨收', '今开'}
+VOLUME_COLUMNS = {'Volume', '成交量'}
+CODE_COLUMNS = {'股票代码', '代码', '名称', 'symbol', 'Symbol'}
+DATE_COLUMNS = {'日期', 'date', 'Date'}
+
+INT32_MAX = np.iinfo(np.int32).max
+INT32_MIN = np.iinfo(np.int32).min
+
+
+def _downcast_float(values, tolerance, relative=False):
+    """尝试转为 float32，超出误差容限时返回 None"""
+    values64 = np.asarray(values, dtype=np.float64)
+    values32 = values64.astype(np.float32)
+    finite = np.isfinite(values64)
+    if not finite.any():
+        return values32
+    error = np.abs(values32[finite].astype(np.float64) - values64[finite])
+    if relative:
+        scale = np.maximum(np.abs(values64[finite]), 1e-12)
+        ok = (error / scale).max() <= tolerance
+    else:
+        ok = error.max() <= tolerance
+    return values32 if ok else None
+
+
+def _downcast_int(values):
+    """整数列按取值范围选择 int32 或 int64"""
+    values = np.asarray(values)
+    if values.dtype.kind == 'f':
+        if not np.isfinite(values).all() or not np.array_equal(values, np.round(values)):
+            return None
+    if len(values) == 0:
+        return values.astype(np.int32)
+    lo, hi = values.min(), values.max()
+    if INT32_MIN <= lo and hi <= INT32_MAX:
+        return values.astype(np.int32)
+    return values.astype(np.int64)
+
+
+def compact_frame(df, price_decimals=2, code_format='category', inplace=False):
+    """返回紧凑存储的 DataFrame
+
+    price_decimals: 价格需无损保留的小数位数
+    code_format: 'category' 转为分类类型，'bytes' 转为定长字节 (numpy 'S' 类型)
+    """
+    if not inplace:
+        df = df.copy()
+    price_tolerance = 0.5 * 10 ** (-price_decimals)
+
+    for column in df.columns:
+        series = df[column]
+        kind = series.dtype.kind
+
+        if column in DATE_COLUMNS and kind == 'O':
+            df[column] = pd.to_datetime(series)
+        elif column in CODE_COLUMNS and kind in 'OU':
+            if code_format == 'bytes':
+                df[column] = series.astype(str).str.encode('utf-8').to_numpy(dtype=bytes)
+            else:
+                df[column] = series.astype('category')
+        elif column in VOLUME_COLUMNS and kind in 'iuf':
+            downcast = _downcast_int(series.to_numpy())
+            if downcast is not None:
+                df[column] = downcast
+        elif kind == 'f' and series.dtype != np.float32:
+            if column in PRICE_COLUMNS:
+                downcast = _downcast_float(series.to_numpy(), price_tolerance)
+            else:
+                downcast = _downcast_float(series.to_numpy(), 1e-6, relative=True)
+            if downcast is not None:
+                df[column] = downcast
+    return df
+
+
+def compact_panel(panel, price_decimals=2):
+    """价格面板（行=日期，列=股票）整体降为 float32，精度不满足时保持原样"""
+    tolerance = 0.5 * 10 ** (-price_decimals)
+    values = _downcast_float(panel.to_numpy(dtype=np.float64), tolerance)
+    if values is None:
+        return panel
+    return pd.DataFrame(values, index=panel.index, columns=panel.columns)
+
+
+def memory_usage(df):
+    """DataFrame 实际占用内存（字节，含对象列）"""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compaction_report(original, compact):
+    """对比紧凑化前后的内存与数据类型"""
+    before = memory_usage(original)
+    after = memory_usage(compact)
+    return {
+        'bytes_before': before,
+        'bytes_after': after,
+        'ratio': round(after / before, 3) if before else None,
+        'dtypes': {str(col): str(dtype) for col, dtype in compact.dtypes.items()},
+    }
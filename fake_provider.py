@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+离线行情数据源
+按股票代码生成确定性的日线数据（同一代码、同一周期每次结果相同），接口与 yfinance.Ticker 一致；
+设置环境变量 STOCK_DATA_PROVIDER=fake 后各应用改用它，用于压测和离线演示，结果可重复
+
+- STOCK_FAKE_LATENCY_MS: 模拟上游延迟（毫秒，默认 50）
+"""
+
+import os
+import time
+import zlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+PROVIDER = os.environ.get('STOCK_DATA_PROVIDER', 'yfinance')
+FAKE_LATENCY = float(os.environ.get('STOCK_FAKE_LATENCY_MS', 50)) / 1000
+# 各周期对应的交易日数，固定结束日期保证结果可重复
+PERIOD_BARS = {'1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, 'ytd': 250,
+               '1y': 252, '2y': 504, '5y': 1260, '10y': 2520, 'max': 2520}
+END_DATE = '2024-12-31'
+
+
+@lru_cache(maxsize=1)
+def trading_days():
+    """固定的交易日序列（生成一次，各股票共用）"""
+    return pd.bdate_range(end=END_DATE, periods=PERIOD_BARS['max'], name='Date')
+
+
+def fake_history(symbol, period='1mo'):
+    """生成 OHLCV 日线（种子由股票代码决定）"""
+    bars = PERIOD_BARS.get(period, PERIOD_BARS['1mo'])
+    seed = zlib.crc32(symbol.encode('utf-8'))
+    rng = np.random.default_rng(seed)
+    # 生成足够长的序列再截取尾部，短周期是长周期的尾部，与真实数据一致
+    total = PERIOD_BARS['max']
+    close = (20 + seed % 480) * np.exp(np.cumsum(rng.normal(0.0003, 0.02, total)))
+    open_ = close * (1 + rng.normal(0, 0.005, total))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.02, total))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.02, total))
+    volume = rng.integers(1_000_000, 50_000_000, total)
+    df = pd.DataFrame({'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+                      index=trading_days())
+    return df.iloc[-bars:].copy()
+
+
+class FakeTicker:
+    """与 yfinance.Ticker 相同的用法: FakeTicker('AAPL').history(period='1mo')"""
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    def history(self, period='1mo', **kwargs):
+        if FAKE_LATENCY > 0:
+            time.sleep(FAKE_LATENCY)
+        return fake_history(self.symbol, period)
+
+
+def ticker_class():
+    """当前配置的数据源（yfinance.Ticker 或 FakeTicker）"""
+    if PROVIDER == 'fake':
+        return FakeTicker
+    import yfinance as yf
+    return yf.Ticker
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+快速 JSON 序列化
+直接把 numpy 数组、pandas 序列/时间索引写成 JSON 字节，NaN/inf 输出为 null（不再用 fillna 填充假数据），
+所有 Flask 应用通过 init_json(app) 让 jsonify 使用它
+
+- 安装了 orjson 时用 orjson（数组不经过 Python 列表）
+- 否则用内置实现: 数值数组交给标准库的 C 编码器整体输出，再把 NaN/Infinity 记号替换为 null
+- 日期: 全部为零点的时间索引/时间戳输出 'YYYY-MM-DD'，否则输出 ISO 格式
+"""
+
+import json
+import math
+from datetime import date, datetime
+import pandas as pd
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+_encode_str = json.encoder.encode_basestring
+_encode_list = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def format_timestamp(value):
+    """时间戳 -> 字符串（零点时只保留日期）"""
+    if isinstance(value, datetime):
+        if (value.hour, value.minute, value.second, value.microsecond) == (0, 0, 0, 0):
+            return value.strftime('%Y-%m-%d')
+        return value.isoformat()
+    return value.isoformat()
+
+
+def format_dates(index):
+    """时间索引 -> 字符串数组（全部为零点时只保留日期）"""
+    index = pd.DatetimeIndex(index)
+    if len(index) and (index == index.normalize()).all():
+        return index.strftime('%Y-%m-%d')
+    return index.map(lambda ts: ts.isoformat())
+
+
+def _default(obj):
+    """orjson 无法直接处理的类型"""
+    if obj is pd.NaT:
+        return None
+    if isinstance(obj, (datetime, date)):
+        return format_timestamp(obj)
+    if isinstance(obj, pd.DatetimeIndex):
+        return format_dates(obj).tolist()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        if obj.dtype.kind == 'M':
+            return format_dates(obj).tolist()
+        return obj.to_numpy()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'M':
+            return format_dates(obj).tolist()
+        if not obj.flags.c_contiguous:
+            return np.ascontiguousarray(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict('records')
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+
+def _array_text(values):
+    """数值数组 -> JSON 数组文本"""
+    kind = values.dtype.kind
+    if kind == 'b':
+        return '[' + ','.join('true' if v else 'false' for v in values.tolist()) + ']'
+    if kind in 'iu':
+        return _encode_list(values.tolist())
+    if kind == 'f':
+        finite = np.isfinite(values)
+        if values.dtype.itemsize <= 4:
+            # float32 取 7 位有效数字，避免 0.1 -> 0.10000000149011612
+            items = ['%.7g' % v if ok else 'null' for v, ok in zip(values.tolist(), finite.tolist())]
+            return '[' + ','.join(items) + ']'
+        text = _encode_list(values.tolist())
+        if finite.all():
+            return text
+        # 纯数值数组的文本中只有非有限值会出现这些记号
+        return text.replace('-Infinity', 'null').replace('Infinity', 'null').replace('NaN', 'null')
+    if kind == 'M':
+        return _encode_list(format_dates(values).tolist())
+    return _text(values.tolist())
+
+
+def _text(obj):
+    """内置实现：递归生成 JSON 文本"""
+    if obj is None or obj is pd.NaT:
+        return 'null'
+    if isinstance(obj, str):
+        return _encode_str(obj)
+    if isinstance(obj, bool):
+        return 'true' if obj else 'false'
+    if isinstance(obj, int):
+        return str(obj)
+    if isinstance(obj, float):
+        return repr(obj) if math.isfinite(obj) else 'null'
+    if isinstance(obj, dict):
+        return '{' + ','.join(_encode_str(str(k)) + ':' + _text(v) for k, v in obj.items()) + '}'
+    if isinstance(obj, (list, tuple)):
+        return '[' + ','.join(map(_text, obj)) + ']'
+    if isinstance(obj, np.ndarray):
+        return _array_text(obj)
+    if isinstance(obj, pd.DatetimeIndex):
+        return _encode_list(format_dates(obj).tolist())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return _array_text(obj.to_numpy())
+    if isinstance(obj, np.generic):
+        return _text(obj.item())
+    return _text(_default(obj))
+
+
+def dumps(obj):
+    """序列化为 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return _text(obj).encode('utf-8')
+
+
+def loads(data):
+    """解析 JSON"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def init_json(app, provider_base=None):
+    """让 jsonify / request.json 使用本模块
+
+    provider_base: JSON provider 基类，默认为 Flask 的（Quart 应用传入 quart.json.provider.JSONProvider）
+    """
+    if provider_base is None:
+        from flask.json.provider import JSONProvider as provider_base
+
+    class FastJSONProvider(provider_base):
+        def dumps(self, obj, **kwargs):
+            return dumps(obj).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            if args and kwargs:
+                raise TypeError("jsonify() 不能同时使用位置参数和关键字参数")
+            obj = args[0] if len(args) == 1 else (args or kwargs or None)
+            return self._app.response_class(dumps(obj), mimetype='application/json')
+
+    app.json = FastJSONProvider(app)
+    return app
@@ -7,16 +7,23 @@ import akshare as ak
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from timeframe_resampler import TimeframeResampler
+from support_resistance import SupportResistanceEngine
+from risk_metrics import RiskPanel
+from compact_storage import compact_frame
 import warnings
 warnings.filterwarnings('ignore')
 
 class StockAnalyzer:
     """股票分析器类"""
     
-    def __init__(self, symbol):
+    def __init__(self, symbol, compact=False):
         self.symbol = symbol
+        self.compact = compact  # 紧凑存储：价格 float32、成交量 int32、代码列转分类
         self.data = None
         self.analysis_results = {}
+        self.resampler = TimeframeResampler()
+        self.risk_panel = None
         
     def fetch_data(self, start_date="2024-01-01", end_date=None):
         """获取股票数据"""
@@ -47,6 +54,9 @@ class StockAnalyzer:
             df['Returns'] = df['收盘'].pct_change()
             df['Log_Returns'] = np.log(df['收盘'] / df['收盘'].shift(1))
             
+            if self.compact:
+                df = compact_frame(df)
+            
             self.data = df
             print(f"✓ 获取到 {len(df)} 个交易日数据")
             return True
@@ -61,8 +71,11 @@ class StockAnalyzer:
             print("请先获取数据")
             return
         
-        df = self.data
-        
+        self.data = self._add_indicators(self.data)
+        print("✓ 技术指标计算完成")
+    
+    def _add_indicators(self, df):
+        """在数据上添加技术指标列"""
         # 移动平均线
         df['MA5'] = df['收盘'].rolling(window=5).mean()
         df['MA10'] = df['收盘'].rolling(window=10).mean()
@@ -93,18 +106,42 @@ class StockAnalyzer:
         df['Volume_MA20'] = df['成交量'].rolling(window=20).mean()
         df['Volume_Ratio'] = df['成交量'] / df['Volume_MA20']
         
-        self.data = df
-        print("✓ 技术指标计算完成")
+        return df
     
-    def analyze_trend(self):
-        """趋势分析"""
+    def get_timeframe_data(self, timeframe):
+        """获取指定周期的K线（由日线重采样，带缓存）"""
+        if self.data is None:
+            return None
+        return self.resampler.resample(self.data, timeframe, key=self.symbol)
+    
+    def analyze_trend(self, timeframes=None):
+        """趋势分析
+
+        timeframes: 额外分析的周期列表，如 ['weekly', 'monthly']
+        """
         if self.data is None:
             return {}
         
-        df = self.data
+        trend_analysis = self._trend_snapshot(self.data)
+        
+        if timeframes:
+            trend_analysis['timeframes'] = {}
+            for timeframe in timeframes:
+                tf_data = self.get_timeframe_data(timeframe)
+                if tf_data is None or len(tf_data) < 2:
+                    trend_analysis['timeframes'][timeframe] = {'error': '数据不足'}
+                    continue
+                tf_data = self._add_indicators(tf_data.copy())
+                trend_analysis['timeframes'][timeframe] = self._trend_snapshot(tf_data)
+        
+        self.analysis_results['trend'] = trend_analysis
+        return trend_analysis
+    
+    def _trend_snapshot(self, df):
+        """基于最新一根K线生成趋势结论"""
         current_price = df['收盘'].iloc[-1]
         
-        trend_analysis = {
+        return {
             'current_price': current_price,
             'trend_short': '上涨' if current_price > df['MA5'].iloc[-1] else '下跌',
             'trend_medium': '上涨' if current_price > df['MA20'].iloc[-1] else '下跌',
@@ -113,43 +150,64 @@ class StockAnalyzer:
             'rsi_status': self._get_rsi_status(df['RSI'].iloc[-1]),
             'macd_signal': '金叉' if df['MACD'].iloc[-1] > df['Signal'].iloc[-1] else '死叉',
         }
-        
-        self.analysis_results['trend'] = trend_analysis
-        return trend_analysis
     
     def analyze_volatility(self):
-        """波动性分析"""
+        """波动性分析
+
+        风险指标由滚动风险面板一次算出完整时间序列，
+        self.risk_panel 可按任意日期读取历史指标
+        """
         if self.data is None:
             return {}
         
-        df = self.data
+        self.risk_panel = RiskPanel(self.data['收盘'].rename(self.symbol))
+        latest = self.risk_panel.symbol_metrics(self.symbol)
+        
+        # 数据不足一个窗口时退回全历史波动率
+        def windowed(name):
+            value = latest[name]
+            return value if value is not None else latest['volatility']
         
-        # 计算不同时间段的波动率
         volatility_analysis = {
-            'volatility_20d': df['Returns'].tail(20).std() * np.sqrt(252) * 100,
-            'volatility_60d': df['Returns'].tail(60).std() * np.sqrt(252) * 100,
-            'volatility_120d': df['Returns'].tail(120).std() * np.sqrt(252) * 100,
-            'max_drawdown': self._calculate_max_drawdown(df['收盘']),
-            'sharpe_ratio': self._calculate_sharpe_ratio(df['Returns']),
+            'volatility_20d': windowed('volatility_20d'),
+            'volatility_60d': windowed('volatility_60d'),
+            'volatility_120d': windowed('volatility_120d'),
+            'downside_deviation_60d': latest['downside_deviation_60d'],
+            'max_drawdown': latest['max_drawdown'],
+            'current_drawdown': latest['drawdown'],
+            'sharpe_ratio': latest['sharpe'],
+            'sortino_ratio': latest['sortino'],
         }
         
         self.analysis_results['volatility'] = volatility_analysis
         return volatility_analysis
     
     def analyze_support_resistance(self, lookback_days=50):
-        """支撑阻力分析"""
+        """支撑阻力分析
+
+        基于全部历史的摆动高低点聚类得到价位；若近期没有形成
+        有效结构，则退回到最近 lookback_days 天的最低/最高收盘价。
+        """
         if self.data is None:
             return {}
         
         df = self.data
+        current_price = df['收盘'].iloc[-1]
         recent_data = df.tail(lookback_days)
         
+        levels = SupportResistanceEngine().analyze(df)
+        support = levels['support'] or recent_data['收盘'].min()
+        resistance = levels['resistance'] or recent_data['收盘'].max()
+        
         support_resistance = {
-            'support_level': recent_data['收盘'].min(),
-            'resistance_level': recent_data['收盘'].max(),
-            'current_to_support': ((df['收盘'].iloc[-1] / recent_data['收盘'].min()) - 1) * 100,
-            'current_to_resistance': ((recent_data['收盘'].max() / df['收盘'].iloc[-1]) - 1) * 100,
+            'support_level': support,
+            'resistance_level': resistance,
+            'support_level_2': levels['support_2'],
+            'resistance_level_2': levels['resistance_2'],
+            'current_to_support': ((current_price / support) - 1) * 100,
+            'current_to_resistance': ((resistance / current_price) - 1) * 100,
             'bb_position': self._get_bb_position(df),
+            'levels': levels['supports'] + levels['resistances'],
         }
         
         self.analysis_results['support_resistance'] = support_resistance
@@ -169,8 +227,8 @@ class StockAnalyzer:
             'post_festival': spring_festival + pd.Timedelta(days=90),
         }
         
-        mask = (df.index >= analysis_period['pre_festival']) & (df.index <= analysis_period['post_festival'])
-        seasonal_data = df[mask]
+        # 索引已排序，按日期切片（二分查找）代替逐行布尔掩码
+        seasonal_data = df.loc[analysis_period['pre_festival']:analysis_period['post_festival']]
         
         if len(seasonal_data) > 10:
             seasonality = {
@@ -223,18 +281,6 @@ class StockAnalyzer:
         else:
             return "中性"
     
-    def _calculate_max_drawdown(self, prices):
-        """计算最大回撤"""
-        cumulative = prices / prices.cummax()
-        max_drawdown = (1 - cumulative.min()) * 100
-        return max_drawdown
-    
-    def _calculate_sharpe_ratio(self, returns, risk_free_rate=0.02):
-        """计算夏普比率"""
-        excess_returns = returns - risk_free_rate / 252
-        sharpe = np.sqrt(252) * excess_returns.mean() / returns.std()
-        return sharpe
-    
     def _get_bb_position(self, df):
         """获取布林带位置"""
         price = df['收盘'].iloc[-1]
@@ -267,7 +313,7 @@ if __name__ == "__main__":
         analyzer.calculate_technical_indicators()
         
         # 进行分析
-        analyzer.analyze_trend()
+        analyzer.analyze_trend(timeframes=['weekly', 'monthly'])
         analyzer.analyze_volatility()
         analyzer.analyze_support_resistance()
         analyzer.analyze_seasonality(year=2024)
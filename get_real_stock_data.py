@@ -9,6 +9,7 @@ import json
 import pandas as pd
 from datetime import datetime
 import time
+from support_resistance import SupportResistanceEngine
 
 def get_huachen_real_data():
     """获取华辰装备真实数据"""
@@ -243,8 +244,44 @@ def get_huachen_real_data():
     print("\n" + "=" * 60)
     return results
 
-def analyze_buy_price(real_data):
-    """基于真实数据分析买入价格"""
+def get_huachen_history(limit=750):
+    """获取华辰装备日K线历史（东方财富，前复权）"""
+    print(f"\n📜 获取最近 {limit} 个交易日K线...")
+    try:
+        url = "http://push2his.eastmoney.com/api/qt/stock/kline/get"
+        params = {
+            'secid': '0.300809',
+            'fields1': 'f1,f2,f3,f4,f5,f6',
+            'fields2': 'f51,f52,f53,f54,f55,f56,f57',
+            'klt': '101',  # 日K
+            'fqt': '1',    # 前复权
+            'end': '20500101',
+            'lmt': str(limit),
+            'ut': 'fa5fd1943c7b386f172d6893dbfba10b',
+        }
+        response = requests.get(url, params=params, timeout=10)
+        klines = (response.json().get('data') or {}).get('klines') or []
+        if not klines:
+            print("❌ K线数据为空")
+            return None
+        
+        rows = [line.split(',') for line in klines]
+        df = pd.DataFrame(rows, columns=['日期', '开盘', '收盘', '最高', '最低', '成交量', '成交额'])
+        df['日期'] = pd.to_datetime(df['日期'])
+        df.set_index('日期', inplace=True)
+        df = df.astype(float)
+        print(f"✅ 获取到 {len(df)} 条K线")
+        return df
+    except Exception as e:
+        print(f"❌ K线数据获取失败: {e}")
+        return None
+
+def analyze_buy_price(real_data, history=None):
+    """基于真实数据分析买入价格
+
+    history: 日K线 DataFrame，提供时支撑阻力取自历史摆动高低点的聚类价位，
+    否则按当日振幅估算
+    """
     print("\n🎯 基于真实数据的年后买入价格分析")
     print("=" * 60)
     
@@ -266,13 +303,24 @@ def analyze_buy_price(real_data):
     # 技术分析
     print(f"\n📈 技术分析:")
     
-    # 计算支撑阻力位
+    # 计算支撑阻力位：当日振幅估算作为兜底
     today_range = sina_data['今日最高价'] - sina_data['今日最低价']
     support_1 = sina_data['今日最低价'] - today_range * 0.1
     support_2 = sina_data['今日最低价'] - today_range * 0.2
     resistance_1 = sina_data['今日最高价'] + today_range * 0.1
     resistance_2 = sina_data['今日最高价'] + today_range * 0.2
     
+    if history is not None and len(history) > 20:
+        levels = SupportResistanceEngine().analyze(history)
+        support_1 = levels['support'] or support_1
+        support_2 = levels['support_2'] or min(support_2, support_1 * 0.97)
+        resistance_1 = levels['resistance'] or resistance_1
+        resistance_2 = levels['resistance_2'] or max(resistance_2, resistance_1 * 1.03)
+        print(f"   (基于 {len(history)} 个交易日的摆动高低点)")
+        for lv in levels['supports'][:3] + levels['resistances'][:3]:
+            kind = '支撑' if lv['type'] == 'support' else '阻力'
+            print(f"   {kind} ¥{lv['price']:.2f}: 触及{lv['touches']}次，最近 {lv.get('last_touch', '-')}")
+    
     print(f"   第一支撑位: ¥{support_1:.2f}")
     print(f"   第二支撑位: ¥{support_2:.2f}")
     print(f"   第一阻力位: ¥{resistance_1:.2f}")
@@ -316,7 +364,8 @@ if __name__ == "__main__":
     
     # 分析买入价格
     if real_data:
-        analyze_buy_price(real_data)
+        history = get_huachen_history()
+        analyze_buy_price(real_data, history)
     
     print("\n✅ 分析完成！")
     print("💡 提示: 投资有风险，入市需谨慎")
\ No newline at end of file
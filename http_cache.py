@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+HTTP 条件请求与压缩
+- ETag 由底层行情数据的内容摘要生成，If-None-Match 命中时在任何计算之前返回 304
+- JSON/HTML 响应按 Accept-Encoding 做 gzip/brotli 压缩（brotli 为可选依赖）
+- 静态页面预先压缩并缓存各编码版本，重复访问不再消耗 CPU
+
+ETag 均为弱校验（W/"..."）：同一内容的不同压缩编码共用一个 ETag
+"""
+
+import gzip
+import hashlib
+import pandas as pd
+from flask import Response
+from chart_payload import CHART_MIME
+from fast_json import dumps
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 需要压缩的内容类型
+COMPRESSIBLE_TYPES = {'application/json', 'text/html', 'text/css', 'application/javascript', CHART_MIME}
+# 小于该字节数的响应不压缩
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def make_etag(*parts):
+    """由若干部分拼成 ETag 值"""
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(repr(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()[:20]
+
+
+def frame_digest(df):
+    """行情数据的内容摘要（含索引与所有列，最后一根K线的盘中变化也会改变摘要）"""
+    hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()[:16]
+
+
+def is_fresh(request, etag):
+    """客户端缓存是否仍然有效"""
+    return request.if_none_match.contains_weak(etag)
+
+
+def with_etag(response, etag):
+    """给响应加上 ETag，并要求客户端每次重新校验"""
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(etag, response_class=Response):
+    """304 响应"""
+    return with_etag(response_class(status=304), etag)
+
+
+def json_response(request, payload, response_class=Response):
+    """序列化后按内容生成 ETag 的 JSON 响应（适合无需计算的小数据）"""
+    body = dumps(payload)
+    etag = make_etag(body)
+    if is_fresh(request, etag):
+        return not_modified(etag, response_class)
+    return with_etag(response_class(body, mimetype='application/json'), etag)
+
+
+def choose_encoding(accept_encodings):
+    """按 Accept-Encoding 选择压缩编码，优先 brotli"""
+    offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return accept_encodings.best_match(offered)
+
+
+def compress(data, encoding, level=None):
+    """压缩字节串"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def add_vary(response, value):
+    """在 Vary 头中追加一项"""
+    vary = {v.strip() for v in response.headers.get('Vary', '').split(',') if v.strip()}
+    vary.add(value)
+    response.headers['Vary'] = ', '.join(sorted(vary))
+
+
+def compressible(response):
+    """响应是否需要压缩（流式、文件直传和已编码的响应除外）"""
+    return (response.status_code == 200
+            and not getattr(response, 'direct_passthrough', False)
+            and not getattr(response, 'is_streamed', False)
+            and 'Content-Encoding' not in response.headers
+            and response.mimetype in COMPRESSIBLE_TYPES)
+
+
+def encode_body(response, data, accept_encodings):
+    """按客户端支持的编码压缩响应体，返回是否已压缩"""
+    add_vary(response, 'Accept-Encoding')
+    if len(data) < MIN_COMPRESS_SIZE:
+        return False
+    encoding = choose_encoding(accept_encodings)
+    if not encoding:
+        return False
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return True
+
+
+def compress_response(response, request):
+    """对可压缩的响应按客户端支持的编码压缩"""
+    if compressible(response):
+        encode_body(response, response.get_data(), request.accept_encodings)
+    return response
+
+
+def init_compression(app):
+    """注册压缩钩子"""
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        return compress_response(response, request)
+
+    return app
+
+
+class PrecompressedPage:
+    """预压缩的静态页面：ETag 与各编码版本只计算一次"""
+
+    def __init__(self, html, mimetype='text/html'):
+        self.body = html.encode('utf-8') if isinstance(html, str) else html
+        self.mimetype = mimetype
+        self.etag = make_etag(self.body)
+        self._variants = {None: self.body}
+
+    def variant(self, encoding):
+        """取某个编码的页面内容（首次请求时用最高压缩等级生成）"""
+        if encoding not in self._variants:
+            level = 11 if encoding == 'br' else 9
+            self._variants[encoding] = compress(self.body, encoding, level)
+        return self._variants[encoding]
+
+    def respond(self, request, response_class=Response):
+        """返回 304 或对应编码的页面"""
+        if is_fresh(request, self.etag):
+            return not_modified(self.etag, response_class)
+        encoding = choose_encoding(request.accept_encodings)
+        response = response_class(self.variant(encoding), mimetype=self.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return with_etag(response, self.etag)
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+股票 HTTP API 压测工具
+按设定的并发、请求速率和接口/股票组合压测 /api/analyze、/api/batch_analyze（含 NDJSON 流式）、
+/api/trending 和 /api/stream（SSE），输出延迟分位数、吞吐、错误率和服务端缓存命中率（JSON），
+便于不同版本之间比较
+
+- 默认在本机启动统一应用（app_factory），数据源为离线的 fake_provider，结果可重复
+- --url 指向已运行的服务时直接压测（服务端需自行设置 STOCK_DATA_PROVIDER=fake 才能离线）
+- 指定 --rate 时按固定速率发送（开环，延迟从计划发送时间算起，避免协同遗漏），否则各并发连接连续发送
+- 服务端指标（缓存命中、上游调用）取自压测前后 /api/metrics 的差值
+
+用法:
+    python load_test.py --duration 30 --concurrency 32
+    python load_test.py --mix analyze=80,trending=20 --universe 200 --skew 1.2 --rate 200
+    python load_test.py --url http://localhost:9988 --output v2.json --compare v1.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+
+SCENARIOS = ('analyze', 'batch', 'batch_stream', 'trending', 'stream')
+DEFAULT_MIX = 'analyze=70,batch=10,batch_stream=5,trending=10,stream=5'
+METRIC_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)$')
+LABEL_PAIR = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_mix(value):
+    """'analyze=70,trending=30' -> {场景: 权重}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"未知场景: {name}（可选: {', '.join(SCENARIOS)}）")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"无效的权重: {part}")
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("场景权重之和必须大于 0")
+    return mix
+
+
+def parse_metrics(text):
+    """Prometheus 文本 -> {(指标名, ((标签, 值), ...)): 数值}"""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = METRIC_LINE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        labels = tuple(sorted(LABEL_PAIR.findall(labels or '')))
+        try:
+            values[(name, labels)] = float(value)
+        except ValueError:
+            continue
+    return values
+
+
+def percentiles(values):
+    """延迟统计（毫秒）"""
+    if not values:
+        return None
+    data = np.asarray(values) * 1000
+    return {
+        'p50': round(float(np.percentile(data, 50)), 2),
+        'p90': round(float(np.percentile(data, 90)), 2),
+        'p95': round(float(np.percentile(data, 95)), 2),
+        'p99': round(float(np.percentile(data, 99)), 2),
+        'max': round(float(data.max()), 2),
+        'mean': round(float(data.mean()), 2),
+    }
+
+
+class SymbolPicker:
+    """股票组合：按 Zipf 分布选取（skew=0 为均匀分布），热门股票更常被请求"""
+
+    def __init__(self, symbols, skew):
+        self.symbols = symbols
+        weights = 1.0 / np.arange(1, len(symbols) + 1) ** skew
+        self.cumulative = np.cumsum(weights / weights.sum())
+
+    def pick(self, rng, count=1):
+        picks = []
+        for _ in range(count):
+            index = int(np.searchsorted(self.cumulative, rng.random(), side='right'))
+            picks.append(self.symbols[min(index, len(self.symbols) - 1)])
+        return picks
+
+
+class Recorder:
+    """线程安全的结果记录"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.first_bytes = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.error_samples = []
+
+    def record(self, scenario, status, latency, size=0, first_byte=None, error=None):
+        with self.lock:
+            self.latencies[scenario].append(latency)
+            self.statuses[scenario][str(status)] += 1
+            self.bytes[scenario] += size
+            if first_byte is not None:
+                self.first_bytes[scenario].append(first_byte)
+            if error is not None or not (200 <= status < 400):
+                self.errors[scenario] += 1
+                if len(self.error_samples) < 20:
+                    self.error_samples.append({'scenario': scenario, 'status': status, 'error': error})
+
+
+class Worker(threading.Thread):
+    """一个并发连接：按场景权重发请求（keep-alive）"""
+
+    def __init__(self, runner, index):
+        super().__init__(name=f"load-{index}", daemon=True)
+        self.runner = runner
+        self.rng = random.Random(runner.args.seed * 1000 + index)
+        self.conn = None
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = self.runner.new_connection()
+        return self.conn
+
+    def request(self, method, path, body=None, headers=None):
+        """发送请求并读完响应，返回 (状态码, 字节数)"""
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            conn = self.connection()
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            return response.status, len(data)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def run_scenario(self, scenario):
+        """执行一次场景，返回 (状态码, 字节数, 首字节耗时)"""
+        args = self.runner.args
+        picker = self.runner.picker
+        if scenario == 'analyze':
+            symbol = picker.pick(self.rng)[0]
+            status, size = self.request('POST', '/api/analyze', {'symbol': symbol, 'period': args.period})
+            return status, size, None
+        if scenario == 'batch':
+            symbols = picker.pick(self.rng, args.batch_size)
+            status, size = self.request('POST', '/api/batch_analyze', {'symbols': symbols})
+            return status, size, None
+        if scenario == 'trending':
+            status, size = self.request('GET', '/api/trending')
+            return status, size, None
+        if scenario == 'batch_stream':
+            return self.read_stream('POST', '/api/batch_analyze',
+                                    {'symbols': picker.pick(self.rng, args.batch_size), 'stream': True},
+                                    until=lambda line: line.startswith(b'{"done"'))
+        # stream: 订阅后等到第一条行情事件即断开（衡量首个事件延迟）
+        symbol = picker.pick(self.rng)[0]
+        return self.read_stream('GET', f'/api/stream?symbols={symbol}', None,
+                                until=lambda line: line.startswith(b'event: quote'))
+
+    def read_stream(self, method, path, body, until):
+        """流式响应：记录首字节时间，读到 until 行为止（独立连接，读完关闭）"""
+        conn = self.runner.new_connection(timeout=self.runner.args.stream_timeout)
+        started = time.perf_counter()
+        try:
+            payload = json.dumps(body).encode('utf-8') if body is not None else None
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            first_byte = None
+            size = 0
+            while True:
+                line = response.fp.readline()
+                if not line:
+                    break
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(line)
+                if until(line):
+                    break
+            return response.status, size, first_byte
+        finally:
+            conn.close()
+
+    def run(self):
+        runner = self.runner
+        scenarios, weights = zip(*runner.args.mix.items())
+        while not runner.stopped.is_set():
+            scheduled = runner.next_slot()
+            if scheduled is None:
+                break
+            scenario = self.rng.choices(scenarios, weights)[0]
+            start = scheduled if runner.args.rate else time.perf_counter()
+            try:
+                status, size, first_byte = self.run_scenario(scenario)
+                runner.recorder.record(scenario, status, time.perf_counter() - start, size, first_byte)
+            except Exception as e:
+                runner.recorder.record(scenario, 0, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+        self.close()
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        parts = urlsplit(args.url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = Recorder()
+        self.picker = SymbolPicker(args.symbols, args.skew)
+        self.stopped = threading.Event()
+        self._slot_lock = threading.Lock()
+        self._sent = 0
+
+    def new_connection(self, timeout=30):
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def next_slot(self):
+        """下一个请求的计划发送时间（固定速率时等待到该时刻）；达到请求数或时长后返回 None"""
+        with self._slot_lock:
+            if self.args.requests and self._sent >= self.args.requests:
+                return None
+            index = self._sent
+            self._sent += 1
+        if self.args.rate:
+            scheduled = self.started + index / self.args.rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            scheduled = time.perf_counter()
+        if not self.args.requests and scheduled - self.started >= self.args.duration:
+            return None
+        return scheduled
+
+    def scrape(self):
+        """读取服务端指标（失败时返回空）"""
+        try:
+            conn = self.new_connection(timeout=10)
+            conn.request('GET', '/api/metrics')
+            response = conn.getresponse()
+            text = response.read().decode('utf-8')
+            conn.close()
+            return parse_metrics(text) if response.status == 200 else {}
+        except Exception:
+            return {}
+
+    def run(self):
+        before = self.scrape()
+        workers = [Worker(self, i) for i in range(self.args.concurrency)]
+        self.started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - self.started
+        after = self.scrape()
+        return self.report(elapsed, before, after)
+
+    def server_stats(self, before, after):
+        """压测期间服务端指标的增量"""
+        def delta(name, **labels):
+            total = 0.0
+            for (metric, metric_labels), value in after.items():
+                if metric != name:
+                    continue
+                metric_labels = dict(metric_labels)
+                if all(metric_labels.get(k) == v for k, v in labels.items()):
+                    total += value - before.get((metric, tuple(sorted(metric_labels.items()))), 0.0)
+            return total
+
+        if not after:
+            return None
+        hits = delta('stock_cache_lookups_total', result='hit')
+        misses = delta('stock_cache_lookups_total', result='miss')
+        upstream = defaultdict(dict)
+        for (metric, labels), _ in after.items():
+            if metric == 'stock_upstream_requests_total':
+                labels = dict(labels)
+                upstream[labels['provider']][labels['outcome']] = int(delta(metric, **labels))
+        return {
+            'cache_hits': int(hits),
+            'cache_misses': int(misses),
+            'cache_hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'upstream_requests': upstream,
+        }
+
+    def report(self, elapsed, before, after):
+        recorder = self.recorder
+        endpoints = {}
+        all_latencies = []
+        total_errors = 0
+        for scenario in SCENARIOS:
+            latencies = recorder.latencies.get(scenario)
+            if not latencies:
+                continue
+            all_latencies.extend(latencies)
+            errors = recorder.errors.get(scenario, 0)
+            total_errors += errors
+            endpoints[scenario] = {
+                'requests': len(latencies),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4),
+                'throughput_rps': round(len(latencies) / elapsed, 2),
+                'status': dict(recorder.statuses[scenario]),
+                'bytes': recorder.bytes[scenario],
+                'latency_ms': percentiles(latencies),
+                'first_byte_ms': percentiles(recorder.first_bytes.get(scenario, [])),
+            }
+        args = self.args
+        return {
+            'tool': 'load_test',
+            'format': 1,
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'revision': git_revision(),
+            'config': {
+                'url': args.url, 'builtin_server': args.builtin, 'duration': args.duration,
+                'requests': args.requests, 'concurrency': args.concurrency, 'rate': args.rate,
+                'mix': args.mix, 'symbols': len(args.symbols), 'skew': args.skew, 'period': args.period,
+                'batch_size': args.batch_size, 'seed': args.seed,
+            },
+            'duration_seconds': round(elapsed, 3),
+            'requests': len(all_latencies),
+            'errors': total_errors,
+            'error_rate': round(total_errors / len(all_latencies), 4) if all_latencies else None,
+            'throughput_rps': round(len(all_latencies) / elapsed, 2) if elapsed else None,
+            'latency_ms': percentiles(all_latencies),
+            'endpoints': endpoints,
+            'server': self.server_stats(before, after),
+            'error_samples': recorder.error_samples,
+        }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args):
+    """启动内置服务（统一应用 + 离线数据源），返回进程"""
+    port = free_port()
+    cache = tempfile.NamedTemporaryFile(prefix='load_test_', suffix='.sqlite3', delete=False).name
+    env = dict(os.environ,
+               STOCK_DATA_PROVIDER='fake',
+               STOCK_FAKE_LATENCY_MS=str(args.fake_latency),
+               STOCK_TRENDING_SYMBOLS=','.join(args.symbols[:20]),
+               STOCK_STREAM_INTERVAL='2')
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(here, 'app_factory.py'), '--host', '127.0.0.1', '--port', str(port),
+         '--cache', cache],
+        cwd=here, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    process.cache_path = cache
+    args.url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('内置服务启动失败')
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/metrics')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('内置服务启动超时')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(process.cache_path + suffix)
+        except OSError:
+            pass
+
+
+def print_summary(report, baseline=None):
+    print(f"\n📊 压测结果（{report['duration_seconds']}s, 版本 {report['revision'] or '未知'}）")
+    print(f"   总请求 {report['requests']}, 吞吐 {report['throughput_rps']} req/s, 错误率 {report['error_rate']}")
+    header = f"   {'场景':<14}{'请求':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'错误率':>8}"
+    print(header)
+    for name, stats in report['endpoints'].items():
+        latency = stats['latency_ms']
+        line = (f"   {name:<14}{stats['requests']:>8}{stats['throughput_rps']:>9}"
+                f"{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}{stats['error_rate']:>8}")
+        old = (baseline or {}).get('endpoints', {}).get(name)
+        if old:
+            change = (latency['p50'] - old['latency_ms']['p50']) / old['latency_ms']['p50'] * 100
+            line += f"   p50 {change:+.1f}%, req/s {stats['throughput_rps'] - old['throughput_rps']:+.1f}"
+        print(line)
+    server = report['server']
+    if server:
+        print(f"   缓存命中率 {server['cache_hit_ratio']}（命中 {server['cache_hits']}, 未命中 {server['cache_misses']}）, "
+              f"上游调用 {json.dumps(server['upstream_requests'], ensure_ascii=False)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票 HTTP API 压测工具')
+    parser.add_argument('--url', help='已运行的服务地址，省略时启动内置服务（离线数据源）')
+    parser.add_argument('--duration', type=float, default=20, help='压测时长（秒）')
+    parser.add_argument('--requests', type=int, default=0, help='总请求数（指定后忽略 --duration）')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发连接数')
+    parser.add_argument('--rate', type=float, default=0, help='目标速率（req/s），0 为不限速')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'场景权重，默认 {DEFAULT_MIX}')
+    parser.add_argument('--symbols', help='股票代码列表（逗号分隔），默认生成 --universe 只')
+    parser.add_argument('--universe', type=int, default=50, help='生成的股票数')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf 偏斜度（0 为均匀）')
+    parser.add_argument('--period', default='1mo')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--stream-timeout', type=float, default=30, help='流式请求的超时（秒）')
+    parser.add_argument('--fake-latency', type=float, default=50, help='内置服务的模拟上游延迟（毫秒）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('-o', '--output', default='load_test_report.json', help="报告文件，'-' 输出到标准输出")
+    parser.add_argument('--compare', help='与之前的报告比较')
+    args = parser.parse_args()
+
+    if args.symbols:
+        args.symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    else:
+        args.symbols = [f'T{i:04d}' for i in range(args.universe)]
+
+    args.builtin = not args.url
+    server = start_server(args) if args.builtin else None
+    try:
+        print(f"🚀 压测 {args.url}: 并发 {args.concurrency}, "
+              f"{'速率 %s req/s' % args.rate if args.rate else '不限速'}, "
+              f"{'%d 个请求' % args.requests if args.requests else '%ss' % args.duration}")
+        report = LoadTest(args).run()
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output == '-':
+        print(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print_summary(report, baseline)
+        print(f"📄 报告: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
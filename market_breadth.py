@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+市场宽度与行业热力图
+一次下载全市场实时行情快照（akshare stock_zh_a_spot_em / stock_zh_a_spot），整体向量化计算:
+涨跌家数、涨停 / 跌停、创 52 周新高 / 新低、涨跌幅分布，以及按行业分组的平均 / 市值加权涨跌幅
+
+- 行业分类与 52 周高低点取自选股面板（stock_screener），快照本身不含这些信息；
+  实时快照而面板只是离线示例数据（未生成 market_panel.npz）时不使用面板：行业统一为"其他"、
+  新高 / 新低为 null，结果中 panel_source 为 null 并附 panel_note 说明
+- 同一快照只计算一次（按内容摘要缓存），结果预先序列化、压缩，接口直接返回；
+  快照最多每 STOCK_BREADTH_INTERVAL 秒（默认 60）重新下载一次
+- 离线（STOCK_DATA_PROVIDER=fake 或未安装 akshare）时用选股面板的最新数据代替快照
+
+用法:
+    python market_breadth.py            # 打印市场宽度和行业涨跌
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from fast_json import dumps
+from http_cache import PrecompressedPage
+
+REFRESH_INTERVAL = float(os.environ.get('STOCK_BREADTH_INTERVAL', 60))
+# 行情快照列名（两个 akshare 接口的中文列名）
+SPOT_COLUMNS = {
+    '代码': 'code', '名称': 'name', '最新价': 'price', '昨收': 'prev_close', '涨跌幅': 'change',
+    '最高': 'high', '最低': 'low', '成交量': 'volume', '成交额': 'amount', '总市值': 'market_cap',
+}
+# 涨跌幅分布的分组边界（%）
+CHANGE_BINS = [-np.inf, -9, -7, -5, -3, -1, 0, 1, 3, 5, 7, 9, np.inf]
+CHANGE_LABELS = ['<-9', '-9~-7', '-7~-5', '-5~-3', '-3~-1', '-1~0', '0~1', '1~3', '3~5', '5~7', '7~9', '>9']
+LIST_LIMIT = 20
+
+
+def fetch_spot():
+    """下载全市场行情快照，返回 (DataFrame, 来源)；离线时用选股面板代替"""
+    from fake_provider import PROVIDER
+    if PROVIDER != 'fake':
+        try:
+            import akshare as ak
+        except ImportError:
+            print("⚠️  未安装 akshare，市场宽度使用选股面板数据")
+        else:
+            try:
+                return ak.stock_zh_a_spot_em(), 'akshare'
+            except Exception as e:
+                print(f"⚠️  stock_zh_a_spot_em 失败（{e}），改用 stock_zh_a_spot")
+                return ak.stock_zh_a_spot(), 'akshare'
+    return spot_from_panel(), 'panel'
+
+
+def spot_from_panel(panel=None):
+    """用选股面板的最新一根K线构造快照（列名与 akshare 相同）"""
+    from stock_screener import get_panel
+    panel = panel or get_panel()
+    cols = panel.columns
+    a_share = np.isin(cols['market'], ['SS', 'SZ', 'BJ'])
+    close = cols['close'][a_share]
+    change = cols['change'][a_share]
+    return pd.DataFrame({
+        '代码': np.char.partition(cols['symbol'][a_share], '.')[:, 0],
+        '名称': cols['name'][a_share],
+        '最新价': close,
+        '昨收': close / (1 + change / 100),
+        '涨跌幅': change,
+        '成交量': cols['volume'][a_share],
+        '成交额': cols['volume'][a_share] * close,
+        '总市值': cols['market_cap'][a_share] * 1e8,
+    })
+
+
+def normalize_spot(df):
+    """统一列名和类型：code 为 6 位代码（去掉 sh / sz 前缀），数值列转为浮点"""
+    frame = df.rename(columns=SPOT_COLUMNS)
+    frame = frame[[c for c in SPOT_COLUMNS.values() if c in frame.columns]].copy()
+    frame['code'] = frame['code'].astype(str).str.extract(r'(\d{6})$', expand=False)
+    frame['name'] = frame['name'].astype(str) if 'name' in frame else ''
+    for column in ('price', 'prev_close', 'change', 'high', 'low', 'volume', 'amount', 'market_cap'):
+        frame[column] = pd.to_numeric(frame[column], errors='coerce') if column in frame else np.nan
+    missing = frame['prev_close'].isna()
+    frame.loc[missing, 'prev_close'] = frame['price'] / (1 + frame['change'] / 100)
+    return frame.dropna(subset=['code']).drop_duplicates('code').reset_index(drop=True)
+
+
+def limit_ratio(code, name):
+    """涨跌停幅度：创业板 / 科创板 20%，北交所 30%，ST 5%，其余 10%"""
+    ratio = np.full(len(code), 0.10)
+    ratio[code.str.startswith(('300', '301', '688', '689')).to_numpy()] = 0.20
+    ratio[code.str.startswith(('4', '8', '92')).to_numpy()] = 0.30
+    st = name.str.contains('ST', na=False).to_numpy()
+    ratio[st & (ratio == 0.10)] = 0.05
+    return ratio
+
+
+def panel_for(source):
+    """与快照搭配的选股面板；实时快照不与离线示例面板（随机行业、模拟价格）混用，返回 None"""
+    from stock_screener import get_panel
+    panel = get_panel()
+    if source == 'akshare' and panel.source == 'sample':
+        return None
+    return panel
+
+
+def panel_lookup(codes, panel):
+    """按 6 位代码从选股面板取行业与 52 周高低点（面板中没有的、或 panel 为 None 时为空）"""
+    if panel is None:
+        empty = np.full(len(codes), np.nan)
+        return np.full(len(codes), '其他', dtype=object), empty, empty, empty
+    cols = panel.columns
+    panel_codes = pd.Index(np.char.partition(cols['symbol'], '.')[:, 0])
+    position = panel_codes.get_indexer(codes)
+    found = position >= 0
+    position = np.where(found, position, 0)
+    industry = np.where(found, cols['industry'][position], '')
+    industry = np.where(industry == '', '其他', industry)
+    return (industry,
+            np.where(found, cols['high_52w'][position], np.nan),
+            np.where(found, cols['low_52w'][position], np.nan),
+            np.where(found, cols['market_cap'][position], np.nan))
+
+
+def _records(frame, columns):
+    return [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+            for row in frame[columns].round(2).to_dict('records')]
+
+
+def compute_breadth(spot, panel=None):
+    """由行情快照计算市场宽度与行业汇总，返回 (summary, sectors)
+
+    panel: 提供行业与 52 周高低点的选股面板，None 时不统计新高 / 新低
+    """
+    frame = normalize_spot(spot)
+    industry, high_52w, low_52w, panel_cap = panel_lookup(frame['code'], panel)
+    frame['industry'] = industry
+    frame['market_cap'] = (frame['market_cap'] / 1e8).fillna(pd.Series(panel_cap))
+
+    # 停牌（无最新价或无成交）不计入涨跌
+    active = frame['price'].gt(0) & frame['volume'].fillna(1).gt(0)
+    price, prev = frame['price'].to_numpy(), frame['prev_close'].to_numpy()
+    ratio = limit_ratio(frame['code'], frame['name'])
+    with np.errstate(invalid='ignore'):
+        frame['limit_up'] = active & (price >= np.round(prev * (1 + ratio) + 1e-9, 2) - 1e-3)
+        frame['limit_down'] = active & (price <= np.round(prev * (1 - ratio) + 1e-9, 2) + 1e-3)
+        frame['new_high'] = active & (price >= high_52w)
+        frame['new_low'] = active & (price <= low_52w)
+    frame['up'] = active & frame['change'].gt(0)
+    frame['down'] = active & frame['change'].lt(0)
+    live = frame[active]
+
+    advancers, decliners = int(frame['up'].sum()), int(frame['down'].sum())
+    distribution = pd.cut(live['change'], CHANGE_BINS, labels=CHANGE_LABELS, right=False).value_counts(sort=False)
+    by_change = live.sort_values('change', ascending=False)
+    summary = {
+        'total': len(frame),
+        'active': len(live),
+        'suspended': int(len(frame) - len(live)),
+        'advancers': advancers,
+        'decliners': decliners,
+        'unchanged': int(len(live) - advancers - decliners),
+        'advance_decline_ratio': round(advancers / decliners, 3) if decliners else None,
+        'net_advancers': advancers - decliners,
+        'limit_up': int(frame['limit_up'].sum()),
+        'limit_down': int(frame['limit_down'].sum()),
+        'new_highs': int(frame['new_high'].sum()) if panel is not None else None,
+        'new_lows': int(frame['new_low'].sum()) if panel is not None else None,
+        'mean_change': round(float(live['change'].mean()), 3) if len(live) else None,
+        'median_change': round(float(live['change'].median()), 3) if len(live) else None,
+        'amount': round(float(live['amount'].sum()) / 1e8, 2),
+        'distribution': {label: int(count) for label, count in distribution.items()},
+        'limit_up_list': _records(by_change[by_change['limit_up']].head(LIST_LIMIT),
+                                  ['code', 'name', 'industry', 'price', 'change']),
+        'limit_down_list': _records(by_change[by_change['limit_down']].tail(LIST_LIMIT)[::-1],
+                                    ['code', 'name', 'industry', 'price', 'change']),
+        'new_high_list': _records(by_change[by_change['new_high']].head(LIST_LIMIT),
+                                  ['code', 'name', 'industry', 'price', 'change']) if panel is not None else None,
+        'panel_source': panel.source if panel is not None else None,
+    }
+    if panel is None:
+        summary['panel_note'] = '未加载选股面板（market_panel.npz），行业分类与 52 周新高 / 新低不可用'
+
+    # 行业汇总：一次分组聚合；市值加权涨跌幅 = Σ(涨跌幅 × 市值) / Σ市值
+    live = live.assign(weighted=live['change'] * live['market_cap'],
+                       weight=live['market_cap'].where(live['change'].notna()))
+    groups = live.groupby('industry', sort=False)
+    sectors = groups.agg(
+        count=('code', 'size'),
+        advancers=('up', 'sum'),
+        decliners=('down', 'sum'),
+        limit_up=('limit_up', 'sum'),
+        limit_down=('limit_down', 'sum'),
+        change=('change', 'mean'),
+        median_change=('change', 'median'),
+        amount=('amount', 'sum'),
+        market_cap=('market_cap', 'sum'),
+        weighted=('weighted', 'sum'),
+        weight=('weight', 'sum'),
+    )
+    sectors['weighted_change'] = np.where(sectors['weight'] > 0, sectors['weighted'] / sectors['weight'],
+                                          sectors['change'])
+    sectors['amount'] = sectors['amount'] / 1e8
+    sectors.loc[sectors['weight'] <= 0, 'market_cap'] = np.nan
+    leaders = live.loc[groups['change'].idxmax().dropna(), ['industry', 'code', 'name', 'change']]
+    leaders = leaders.set_index('industry')
+    sectors = sectors.drop(columns=['weighted', 'weight']).sort_values('weighted_change', ascending=False)
+    result = []
+    for name, row in sectors.round(3).iterrows():
+        item = {'industry': name}
+        for key, value in row.items():
+            item[key] = None if pd.isna(value) else (int(value) if key in (
+                'count', 'advancers', 'decliners', 'limit_up', 'limit_down') else float(value))
+        if name in leaders.index:
+            leader = leaders.loc[name]
+            item['leader'] = {'code': leader['code'], 'name': leader['name'], 'change': round(float(leader['change']), 2)}
+        result.append(item)
+    return summary, result
+
+
+class BreadthSnapshot:
+    """一个行情快照的计算结果（生成后不再修改，正文预先序列化、压缩）"""
+
+    def __init__(self, digest, summary, sectors, source, duration, panel=None):
+        self.digest = digest
+        self.panel = panel
+        self.summary = summary
+        self.sectors = {item['industry']: item for item in sectors}
+        self.fetched_at = time.time()
+        generated_at = datetime.fromtimestamp(self.fetched_at).strftime('%Y-%m-%d %H:%M:%S')
+        meta = {'generated_at': generated_at, 'source': source, 'snapshot': digest,
+                'compute_seconds': round(duration, 3)}
+        self.pages = {
+            'breadth': PrecompressedPage(dumps(dict(summary, **meta)), mimetype='application/json'),
+            'heatmap': PrecompressedPage(dumps(dict(meta, sectors=sectors, summary={
+                k: v for k, v in summary.items() if not isinstance(v, (list, dict))})), mimetype='application/json'),
+        }
+
+    def respond(self, kind, request, response_class=None):
+        """返回预先生成的结果（或 304），Age 头为快照年龄"""
+        page = self.pages[kind]
+        response = page.respond(request) if response_class is None else page.respond(request, response_class)
+        response.headers['Age'] = str(int(time.time() - self.fetched_at))
+        return response
+
+    def context(self, symbol):
+        """单只股票的市场背景：整体涨跌家数 + 所属行业的汇总"""
+        code = symbol.split('.')[0][-6:]
+        industry = panel_lookup(pd.Index([code]), self.panel)[0][0]
+        keys = ('advancers', 'decliners', 'advance_decline_ratio', 'limit_up', 'limit_down',
+                'new_highs', 'new_lows', 'median_change')
+        return {
+            'symbol': symbol,
+            'market': {k: self.summary[k] for k in keys},
+            'industry': self.sectors.get(industry, {'industry': industry}),
+        }
+
+
+class MarketBreadth:
+    """按需刷新的市场宽度：过期后由一个请求重新下载快照，其他请求继续使用旧结果"""
+
+    def __init__(self, fetch=fetch_spot, interval=REFRESH_INTERVAL):
+        self.fetch = fetch
+        self.interval = interval
+        self.snapshot = None
+        self._refreshing = threading.Lock()
+
+    def refresh(self):
+        """下载快照并计算（内容与上次相同时只更新时间）"""
+        started = time.time()
+        spot, source = self.fetch()
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(spot, index=False).to_numpy().tobytes(),
+                                 digest_size=8).hexdigest()
+        if self.snapshot is not None and self.snapshot.digest == digest:
+            self.snapshot.fetched_at = time.time()
+            return self.snapshot
+        panel = panel_for(source)
+        if panel is None:
+            print("⚠️  未找到选股面板文件（python stock_screener.py build --akshare），行业分类与新高 / 新低不可用")
+        summary, sectors = compute_breadth(spot, panel)
+        self.snapshot = BreadthSnapshot(digest, summary, sectors, source, time.time() - started, panel)
+        print(f"🌡️  市场宽度已更新: {summary['advancers']} 涨 / {summary['decliners']} 跌, "
+              f"{len(sectors)} 个行业, 用时 {time.time() - started:.2f}s")
+        return self.snapshot
+
+    def current(self):
+        """当前结果；过期时刷新（已有结果且其他请求正在刷新时直接返回旧结果）"""
+        snapshot = self.snapshot
+        if snapshot is not None and time.time() - snapshot.fetched_at < self.interval:
+            return snapshot
+        if not self._refreshing.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self.snapshot is snapshot:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    if snapshot is None:
+                        raise
+                    print(f"⚠️  市场宽度刷新失败，继续使用旧数据: {e}")
+            return self.snapshot
+        finally:
+            self._refreshing.release()
+
+
+_breadth = None
+_breadth_lock = threading.Lock()
+
+
+def get_breadth():
+    """进程内共享的市场宽度"""
+    global _breadth
+    with _breadth_lock:
+        if _breadth is None:
+            _breadth = MarketBreadth()
+        return _breadth
+
+
+def main():
+    snapshot = get_breadth().current()
+    s = snapshot.summary
+    print(f"\n📊 市场宽度: {s['advancers']} 涨 / {s['decliners']} 跌 / {s['unchanged']} 平, 停牌 {s['suspended']}")
+    print(f"   涨停 {s['limit_up']}, 跌停 {s['limit_down']}, 52 周新高 {s['new_highs']}, 新低 {s['new_lows']}, "
+          f"涨跌幅中位数 {s['median_change']}%")
+    print(f"   分布: {s['distribution']}")
+    print(f"\n🔥 行业涨跌（市值加权）:")
+    for item in snapshot.sectors.values():
+        leader = item.get('leader', {})
+        print(f"   {item['industry']:<8} {item['weighted_change']:>7.2f}%  {item['advancers']:>4} 涨 / "
+              f"{item['decliners']:>4} 跌  领涨 {leader.get('name', '-')} {leader.get('change', '')}")
+
+
+if __name__ == '__main__':
+    main()
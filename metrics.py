@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+运行指标
+轻量的计数器 / 仪表 / 直方图，按 Prometheus 文本格式输出到 /api/metrics
+
+- stock_stage_duration_seconds{stage}: 各阶段耗时（fetch / indicators / summarize / analyze / serialize / render）
+- stock_cache_lookups_total{result}、stock_cache_hit_ratio: 行情缓存命中情况
+- stock_upstream_requests_total{provider,outcome}、stock_upstream_duration_seconds{provider}: 上游数据源调用
+- stock_http_requests_total / stock_http_request_duration_seconds / stock_http_inflight_requests: 各接口请求
+
+热路径上每次记录只是一次 perf_counter、一次二分查找和一次加锁累加（微秒级）
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_MIME = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    """带标签的指标，labels() 返回对应子指标（按标签值缓存）；子类实现子指标的创建与输出"""
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abstractmethod
+    def _new_child(self):
+        """创建一个子指标"""
+
+    @abstractmethod
+    def _render_child(self, values, child):
+        """子指标的 Prometheus 文本行"""
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), function=None):
+        super().__init__(name, help_text, labelnames)
+        # function: 采集时计算取值（无标签）
+        self.function = function
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def render(self):
+        if self.function is not None:
+            value = self.function()
+            if value is None:
+                return []
+            return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge",
+                    f"{self.name} {_format_value(float(value))}"]
+        return super().render()
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total, count = child.sum, child.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float('inf'),), counts):
+            cumulative += n
+            labels = _format_labels(self.labelnames, values, ('le', _format_value(float(bound))))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics.setdefault(metric.name, metric)
+        return self.metrics[metric.name]
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'stock_stage_duration_seconds', '各处理阶段耗时', ['stage']))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    'stock_cache_lookups_total', '行情缓存查询次数', ['result']))
+UPSTREAM_REQUESTS = REGISTRY.register(Counter(
+    'stock_upstream_requests_total', '上游数据源调用次数', ['provider', 'outcome']))
+UPSTREAM_SECONDS = REGISTRY.register(Histogram(
+    'stock_upstream_duration_seconds', '上游数据源调用耗时', ['provider']))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'stock_http_requests_total', '接口请求数', ['endpoint', 'method', 'status']))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    'stock_http_request_duration_seconds', '接口处理耗时（不含流式响应的推送时间）', ['endpoint']))
+HTTP_INFLIGHT = REGISTRY.register(Gauge(
+    'stock_http_inflight_requests', '正在处理的请求数', ['endpoint']))
+
+
+def _cache_hit_ratio():
+    hits = CACHE_LOOKUPS.labels('hit').value
+    total = hits + CACHE_LOOKUPS.labels('miss').value
+    return hits / total if total else None
+
+
+REGISTRY.register(Gauge('stock_cache_hit_ratio', '行情缓存命中率', function=_cache_hit_ratio))
+
+
+def stage(name):
+    """阶段计时（上下文管理器）: with stage('fetch'): ..."""
+    return STAGE_SECONDS.labels(name).time()
+
+
+def timed_stage(name):
+    """阶段计时（装饰器）"""
+    child = STAGE_SECONDS.labels(name)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def cache_lookup(hit):
+    """记录一次缓存查询"""
+    CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+
+def record_upstream(provider, outcome, seconds):
+    """记录一次上游调用（outcome: ok / empty / error）"""
+    UPSTREAM_REQUESTS.labels(provider, outcome).inc()
+    UPSTREAM_SECONDS.labels(provider).observe(seconds)
+
+
+def init_metrics(app):
+    """注册请求计时钩子与 /api/metrics 接口"""
+    from flask import Response, g, request
+
+    def endpoint():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_endpoint = endpoint()
+        HTTP_INFLIGHT.labels(g._metrics_endpoint).inc()
+
+    @app.after_request
+    def _record(response):
+        start = g.get('_metrics_start')
+        if start is not None:
+            name = g._metrics_endpoint
+            HTTP_SECONDS.labels(name).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(name, request.method, response.status_code).inc()
+        return response
+
+    @app.teardown_request
+    def _done(exc):
+        name = g.pop('_metrics_endpoint', None)
+        if name is not None:
+            HTTP_INFLIGHT.labels(name).dec()
+
+    @app.route('/api/metrics')
+    def api_metrics():
+        """运行指标（Prometheus 文本格式）"""
+        return Response(REGISTRY.render(), content_type=METRICS_MIME)
+
+    return app
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+组合相关性分析模块
+对监控列表的收益率维护滚动协方差/相关系数矩阵，新K线到来时增量更新
+"""
+
+import json
+import pandas as pd
+import numpy as np
+
+
+class RollingCorrelation:
+    """滚动协方差/相关系数矩阵
+
+    维护窗口内收益率的和向量 S 与叉积矩阵 Q = Σ r·rᵀ，
+    每根新K线只需加上新向量、减去移出窗口的向量（O(N²)），
+    不必对整个窗口重算（O(W·N²)）。缺失收益按 0 处理。
+    recompute_every: 每隔多少次增量更新做一次完整重算，抑制浮点误差累积
+    """
+
+    def __init__(self, symbols, window=60, recompute_every=None):
+        self.symbols = list(symbols)
+        self.window = window
+        self.recompute_every = recompute_every or window
+        n = len(self.symbols)
+        self.buffer = np.zeros((window, n))
+        self.count = 0          # 已写入的K线总数
+        self.sum = np.zeros(n)
+        self.cross = np.zeros((n, n))
+        self.last_date = None
+        self._updates_since_recompute = 0
+
+    @property
+    def filled(self):
+        """窗口内的有效K线数"""
+        return min(self.count, self.window)
+
+    def _vector(self, returns):
+        """把一行收益整理为与 symbols 对齐的向量"""
+        if isinstance(returns, dict):
+            returns = pd.Series(returns)
+        if isinstance(returns, pd.Series):
+            returns = returns.reindex(self.symbols).to_numpy(dtype=float)
+        return np.nan_to_num(np.asarray(returns, dtype=float))
+
+    def update(self, returns, date=None):
+        """追加一根K线的收益率"""
+        r = self._vector(returns)
+        slot = self.count % self.window
+        if self.count >= self.window:
+            old = self.buffer[slot]
+            self.sum -= old
+            self.cross -= np.outer(old, old)
+        self.buffer[slot] = r
+        self.sum += r
+        self.cross += np.outer(r, r)
+        self.count += 1
+        if date is not None:
+            self.last_date = pd.Timestamp(date)
+
+        self._updates_since_recompute += 1
+        if self._updates_since_recompute >= self.recompute_every:
+            self.recompute()
+
+    def replace_last(self, returns):
+        """替换最新一根K线的收益（盘中K线更新），并按窗口重算"""
+        if self.count == 0:
+            return False
+        r = self._vector(returns)
+        slot = (self.count - 1) % self.window
+        if np.array_equal(self.buffer[slot], r):
+            return False
+        self.buffer[slot] = r
+        self.recompute()
+        return True
+
+    def recompute(self):
+        """按窗口数据完整重算和向量与叉积矩阵"""
+        data = self.buffer[:self.filled]
+        self.sum = data.sum(axis=0)
+        self.cross = data.T @ data
+        self._updates_since_recompute = 0
+
+    def load(self, returns):
+        """用历史收益 DataFrame 初始化（只保留最后一个窗口）"""
+        returns = returns.reindex(columns=self.symbols)
+        tail = returns.tail(self.window)
+        values = np.nan_to_num(tail.to_numpy(dtype=float))
+        self.buffer[:] = 0
+        self.buffer[:len(values)] = values
+        self.count = len(values)
+        self.last_date = tail.index[-1] if len(tail) else None
+        self.recompute()
+
+    def sync(self, prices):
+        """与收盘价面板同步：last_date 当天的K线有变化时替换，之后新增的K线逐根追加"""
+        prices = prices.reindex(columns=self.symbols).sort_index()
+        returns = prices.pct_change()
+        if self.last_date is None:
+            self.load(returns.iloc[1:])
+            return len(returns) - 1
+        changed = 0
+        if self.last_date in returns.index:
+            changed += self.replace_last(returns.loc[[self.last_date]].to_numpy(dtype=float)[-1])
+        new_rows = returns.loc[returns.index > self.last_date]
+        for date, row in zip(new_rows.index, new_rows.to_numpy(dtype=float)):
+            self.update(row, date)
+        return changed + len(new_rows)
+
+    def covariance(self):
+        """当前窗口的样本协方差矩阵"""
+        n = self.filled
+        if n < 2:
+            return pd.DataFrame(np.nan, index=self.symbols, columns=self.symbols)
+        mean = self.sum / n
+        cov = (self.cross - n * np.outer(mean, mean)) / (n - 1)
+        return pd.DataFrame(cov, index=self.symbols, columns=self.symbols)
+
+    def correlation(self):
+        """当前窗口的相关系数矩阵"""
+        cov = self.covariance().to_numpy()
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(std, std)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=self.symbols, columns=self.symbols)
+
+    def clusters(self, threshold=0.7):
+        """按相关系数阈值划分联动板块（相关图的连通分量）"""
+        corr = np.nan_to_num(self.correlation().to_numpy())
+        adjacency = corr >= threshold
+        n = len(self.symbols)
+        labels = np.full(n, -1)
+        current = 0
+        for start in range(n):
+            if labels[start] >= 0:
+                continue
+            stack = [start]
+            labels[start] = current
+            while stack:
+                node = stack.pop()
+                neighbors = np.flatnonzero(adjacency[node] & (labels < 0))
+                labels[neighbors] = current
+                stack.extend(neighbors.tolist())
+            current += 1
+
+        groups = []
+        for label in range(current):
+            members = np.flatnonzero(labels == label)
+            sub = corr[np.ix_(members, members)]
+            avg = (sub.sum() - len(members)) / (len(members) * (len(members) - 1)) if len(members) > 1 else 1.0
+            groups.append({
+                'symbols': [self.symbols[i] for i in members],
+                'size': int(len(members)),
+                'avg_correlation': round(float(avg), 4),
+            })
+        groups.sort(key=lambda g: g['size'], reverse=True)
+        return groups
+
+    def top_pairs(self, k=10):
+        """相关性最高的 k 对股票"""
+        corr = self.correlation().to_numpy()
+        iu = np.triu_indices(len(self.symbols), k=1)
+        values = np.nan_to_num(corr[iu], nan=-np.inf)
+        k = min(k, len(values))
+        if k == 0:
+            return []
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top])]
+        return [
+            {'pair': (self.symbols[iu[0][i]], self.symbols[iu[1][i]]), 'correlation': round(float(values[i]), 4)}
+            for i in top
+        ]
+
+    def diversification(self, weights=None):
+        """组合分散度摘要
+
+        diversification_ratio: 加权波动之和 / 组合波动，越大越分散
+        effective_bets: 协方差特征值的有效个数（参与率）
+        top_factor_share: 第一主成分解释的方差占比，越高越集中
+        """
+        cov = np.nan_to_num(self.covariance().to_numpy())
+        n = len(self.symbols)
+        w = np.full(n, 1.0 / n) if weights is None else self._vector(weights)
+        w = w / w.sum()
+
+        vols = np.sqrt(np.clip(np.diag(cov), 0, None))
+        portfolio_vol = float(np.sqrt(max(w @ cov @ w, 0.0)))
+        eigenvalues = np.clip(np.linalg.eigvalsh(cov), 0, None)
+        total = eigenvalues.sum()
+
+        corr = np.nan_to_num(self.correlation().to_numpy())
+        avg_corr = (corr.sum() - n) / (n * (n - 1)) if n > 1 else 1.0
+
+        return {
+            'symbols': n,
+            'window': self.window,
+            'observations': self.filled,
+            'as_of': self.last_date.strftime('%Y-%m-%d') if self.last_date is not None else None,
+            'avg_correlation': round(float(avg_corr), 4),
+            'portfolio_volatility': round(float(portfolio_vol * np.sqrt(252) * 100), 2),
+            'diversification_ratio': round(float(w @ vols) / portfolio_vol, 4) if portfolio_vol > 0 else None,
+            'effective_bets': round(float(total ** 2 / (eigenvalues ** 2).sum()), 2) if total > 0 else None,
+            'top_factor_share': round(float(eigenvalues.max() / total), 4) if total > 0 else None,
+        }
+
+    def summary(self, threshold=0.7, top_k=5, weights=None):
+        """分散度 + 联动板块 + 高相关股票对"""
+        return {
+            'diversification': self.diversification(weights),
+            'clusters': [g for g in self.clusters(threshold) if g['size'] > 1],
+            'top_pairs': self.top_pairs(top_k),
+        }
+
+
+def load_watchlist(config_file="monitor_config.json"):
+    """读取监控列表中的股票代码"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    return [stock['symbol'] for stock in config.get('stocks', [])]
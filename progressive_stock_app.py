@@ -4,22 +4,39 @@
 从简单开始，逐步添加功能
 """
 
-from flask import Flask, jsonify, request, render_template_string
+from flask import Flask, Response, jsonify, request, render_template_string
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, timedelta
+import os
+import time
+from timeframe_resampler import TimeframeResampler, parse_timeframes
+from compact_storage import compact_frame
+from chart_payload import CHART_MIME, wants_binary, encode_chart_payload
+from chart_downsample import downsample_frame, parse_max_points
+from chart_delta import delta_start, parse_since, parse_version, update_info
+from quote_stream import StreamHub, parse_symbols
+from chart_render import chart_png, parse_size
+from fake_provider import PROVIDER, ticker_class
+from quote_socket import init_websocket
+from admission import Overloaded, admission, client_key, is_cached
+from symbol_index import get_index, parse_limit
+from stock_screener import screen_request
+from fast_json import init_json
+from metrics import cache_lookup, init_metrics, record_upstream, stage, timed_stage
+from http_cache import (PrecompressedPage, frame_digest, init_compression, is_fresh,
+                        json_response, make_etag, not_modified, with_etag)
 import warnings
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
+init_json(app)
+init_metrics(app)
+init_compression(app)
 
 # ==================== 阶段1: 基础功能 ====================
 
-@app.route('/')
-def home():
-    """首页 - 极简版"""
-    return '''
+HOME_HTML = '''
     <!DOCTYPE html>
     <html>
     <head>
@@ -73,6 +90,7 @@ def home():
             }
         </style>
         <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+        <script src="/static/chart_payload.js"></script>
     </head>
     <body>
         <div class="container">
@@ -84,7 +102,7 @@ def home():
             <div class="card">
                 <h2>股票查询</h2>
                 <div class="search-box">
-                    <input type="text" id="stockInput" placeholder="输入股票代码，如：AAPL, MSFT, TSLA..." value="AAPL">
+                    <input type="text" id="stockInput" placeholder="输入股票代码、名称或拼音首字母，如：AAPL, 300809, hczb..." value="AAPL">
                     <button onclick="analyzeStock()">分析股票</button>
                 </div>
                 
@@ -169,12 +187,7 @@ def home():
                 document.getElementById('analysisContent').style.display = 'none';
                 
                 // 发送请求
-                fetch('/api/analyze', {
-                    method: 'POST',
-                    headers: {'Content-Type': 'application/json'},
-                    body: JSON.stringify({ symbol: symbol, period: '1mo' })
-                })
-                .then(response => response.json())
+                fetchAnalyze(symbol, '1mo')
                 .then(data => {
                     if (data.error) {
                         throw new Error(data.error);
@@ -189,6 +202,7 @@ def home():
                     
                     // 显示股票信息
                     displayStockInfo(data.analysis);
+                    watchQuotes(symbol, quote => displayStockInfo(quote.analysis));
                     
                     // 绘制图表
                     if (data.chart_data) {
@@ -439,6 +453,7 @@ def home():
             
             // 页面加载时自动分析AAPL
             window.onload = function() {
+                attachSymbolSuggest(document.getElementById('stockInput'));
                 analyzeStock();
             };
         </script>
@@ -446,36 +461,83 @@ def home():
     </html>
     '''
 
+# 首页内容固定，启动时计算 ETag，压缩版本按编码缓存
+HOME_PAGE = PrecompressedPage(HOME_HTML)
+
+
+@app.route('/')
+def home():
+    """首页 - 极简版"""
+    return HOME_PAGE.respond(request)
+
 # ==================== 阶段1: API功能 ====================
 
 class StockAnalyzer:
-    def __init__(self):
+    def __init__(self, compact=None):
         self.cache = {}
+        self.resampler = TimeframeResampler()
+        # 紧凑存储模式：缓存中的行情降为 float32/int32，可用环境变量 STOCK_COMPACT_CACHE=1 开启
+        if compact is None:
+            compact = os.environ.get('STOCK_COMPACT_CACHE') == '1'
+        self.compact = compact
     
-    def get_stock_data(self, symbol, period="1mo"):
-        """获取股票数据"""
+    def get_stock_data(self, symbol, period="1mo", use_cache=True, fallback=True):
+        """获取股票数据
+
+        fallback: 数据源失败时是否改用模拟数据；为 False 时直接抛出异常（后台刷新用，避免把模拟数据当作行情）
+        """
         symbol = symbol.strip().upper()
         cache_key = f"{symbol}_{period}"
         
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        if use_cache:
+            hit = cache_key in self.cache
+            cache_lookup(hit)
+            if hit:
+                return self.cache[cache_key]
+            # 共享缓存（app_factory）: 其他进程正在获取同一数据时等待其结果，不重复请求上游
+            if hasattr(self.cache, 'claim'):
+                df = self.cache.claim(cache_key)
+                if df is not None:
+                    return df
         
+        try:
+            return self.fetch_stock_data(symbol, period, cache_key, fallback)
+        except Exception:
+            # 获取失败时不会写入缓存，归还加载权，其他请求不必等到租约过期
+            if hasattr(self.cache, 'release'):
+                self.cache.release(cache_key)
+            raise
+    
+    @timed_stage('fetch')
+    def fetch_stock_data(self, symbol, period, cache_key, fallback=True):
+        """从数据源获取并写入缓存，失败时使用模拟数据（fallback=False 时抛出异常）"""
         print(f"📈 获取 {symbol} 数据...")
+        started = time.perf_counter()
         try:
             # 尝试获取真实数据
-            stock = yf.Ticker(symbol)
+            stock = ticker_class()(symbol)
             df = stock.history(period=period)
+            record_upstream(PROVIDER, 'empty' if df.empty else 'ok', time.perf_counter() - started)
             
             if not df.empty:
                 print(f"✅ 获取成功: {len(df)} 条记录")
-                self.cache[cache_key] = df
-                return df
+                return self.store(cache_key, df)
         except:
-            pass
+            record_upstream(PROVIDER, 'error', time.perf_counter() - started)
+            if not fallback:
+                raise
         
+        if not fallback:
+            raise ValueError(f"未找到 {symbol} 的行情数据")
         # 使用模拟数据
         print(f"⚠️  使用模拟数据")
         df = self.get_sample_data(symbol)
+        return self.store(cache_key, df)
+    
+    def store(self, cache_key, df):
+        """写入缓存（紧凑模式下先降精度）"""
+        if self.compact:
+            df = compact_frame(df)
         self.cache[cache_key] = df
         return df
     
@@ -506,6 +568,7 @@ class StockAnalyzer:
         
         return df
     
+    @timed_stage('indicators')
     def calculate_indicators(self, df):
         """计算技术指标"""
         # 移动平均线
@@ -519,13 +582,64 @@ class StockAnalyzer:
         rs = gain / loss
         df['RSI'] = 100 - (100 / (1 + rs))
         
+        if self.compact:
+            compact_frame(df, inplace=True)
+        
         return df
     
-    def analyze_stock(self, symbol, period="1mo"):
-        """分析股票"""
+    @timed_stage('analyze_stock')
+    def analyze_stock(self, symbol, period="1mo", timeframes=None, max_points=None,
+                      version=None, since=None):
+        """分析股票
+
+        timeframes: 额外分析的周期，如 ['weekly', 'monthly']，
+        由缓存的日线重采样得到，不会再次请求数据源
+        max_points: 每个图表序列的最大点数，超出时用 LTTB 降采样
+        version/since: 客户端已有数据的版本令牌或最后日期，匹配时只返回新增/变化的K线
+        """
         df = self.get_stock_data(symbol, period)
-        df = self.calculate_indicators(df)
+        return self.analyze_frame(symbol, df, period, timeframes, max_points, version, since)
+    
+    @timed_stage('analyze_frame')
+    def analyze_frame(self, symbol, df, period="1mo", timeframes=None, max_points=None,
+                      version=None, since=None):
+        """对已获取的行情数据计算指标并生成分析结果
+
+        纯计算、不访问数据源（异步模式下在线程池中执行）；
+        指标写在副本上，缓存中的原始数据保持不变
+        """
+        df = self.calculate_indicators(df.copy())
+        
+        start = None
+        if version or since:
+            # 降采样后的点与原始K线不一一对应，只在全分辨率图表上做增量
+            if not max_points or len(df) <= max_points:
+                start = delta_start(df, version, since)
+        
+        result = self.summarize(symbol, df, max_points, start)
+        result['update'] = update_info(df, start)
+        
+        if timeframes:
+            cache_key = f"{symbol.strip().upper()}_{period}"
+            result['timeframes'] = {}
+            for timeframe in timeframes:
+                if timeframe == 'daily':
+                    continue
+                tf_df = self.resampler.resample(df, timeframe, key=cache_key)
+                if len(tf_df) < 2:
+                    result['timeframes'][timeframe] = {'error': '数据不足'}
+                    continue
+                tf_df = self.calculate_indicators(tf_df.copy())
+                result['timeframes'][timeframe] = self.summarize(symbol, tf_df, max_points)
         
+        return result
+    
+    @timed_stage('summarize')
+    def summarize(self, symbol, df, max_points=None, start=None):
+        """根据已计算指标的数据生成分析结论和图表数据
+
+        start: 增量起点，只输出该下标之后的图表数据
+        """
         latest = df.iloc[-1]
         prev = df.iloc[-2] if len(df) > 1 else latest
         
@@ -541,14 +655,16 @@ class StockAnalyzer:
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        # 准备图表数据
+        # 准备图表数据（长序列按 max_points 降采样，各序列共用同一组采样点）
+        chart_df = downsample_frame(df, max_points) if start is None else df.iloc[start:]
+        # 直接使用底层数组（JSON 与二进制编码共用），指标预热期保留为 NaN，输出为 null
         chart_data = {
-            'dates': df.index.strftime('%Y-%m-%d').tolist(),
-            'prices': df['Close'].fillna(0).tolist(),
-            'sma_10': df['SMA_10'].fillna(0).tolist(),
-            'sma_30': df['SMA_30'].fillna(0).tolist(),
-            'rsi': df['RSI'].fillna(50).tolist(),
-            'volumes': df['Volume'].fillna(0).tolist()
+            'dates': chart_df.index,
+            'prices': chart_df['Close'].to_numpy(),
+            'sma_10': chart_df['SMA_10'].to_numpy(),
+            'sma_30': chart_df['SMA_30'].to_numpy(),
+            'rsi': chart_df['RSI'].to_numpy(),
+            'volumes': chart_df['Volume'].to_numpy()
         }
         
         return {
@@ -569,12 +685,118 @@ def api_analyze():
         if not symbol:
             return jsonify({'error': '请输入股票代码'}), 400
         
-        result = analyzer.analyze_stock(symbol, period)
-        return jsonify(result)
+        try:
+            timeframes = parse_timeframes(data.get('timeframes'))
+            max_points = parse_max_points(data.get('max_points'))
+            version = data.get('version')
+            if version:
+                parse_version(version)
+            since = parse_since(data.get('since'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 准入控制：缓存未命中的请求走有界的冷队列，满了立即返回 503
+        with admission.admit('analyze', client_key(request), cold=not is_cached(analyzer, symbol, period)):
+            # ETag 由数据状态和响应形态（含增量基准 version/since）共同决定，命中时跳过指标计算
+            binary = wants_binary(request.accept_mimetypes)
+            df = analyzer.get_stock_data(symbol, period)
+            etag = make_etag(frame_digest(df), period, timeframes, max_points, binary,
+                             version, since)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+            
+            # 直接分析上面已获取的数据，不再重复查询缓存
+            result = analyzer.analyze_frame(
+                symbol, df, period, timeframes, max_points=max_points,
+                version=version, since=since
+            )
+            # Accept 协商：二进制格式直接打包数组，否则由 JSON 序列化器直接写出数组
+            with stage('serialize'):
+                if binary:
+                    response = Response(encode_chart_payload(result), mimetype=CHART_MIME)
+                else:
+                    response = jsonify(result)
+        response.headers['Vary'] = 'Accept'
+        return with_etag(response, etag)
         
+    except Overloaded as e:
+        return e.response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 服务端图表：模板复用 + 按数据版本和尺寸缓存的 PNG
+@app.route('/api/chart/<symbol>.png')
+def api_chart(symbol):
+    """分析图表图片，如 /api/chart/AAPL.png?period=3mo&width=800&height=500"""
+    symbol = symbol.strip().upper()
+    period = request.args.get('period', '1mo')
+    if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+        return jsonify({'error': f'无效的股票代码格式: {symbol}'}), 400
+    try:
+        size = parse_size(request.args.get('width'), request.args.get('height'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        with admission.admit('chart', client_key(request), cold=not is_cached(analyzer, symbol, period)):
+            df = analyzer.get_stock_data(symbol, period)
+            version = frame_digest(df)
+            etag = make_etag('png', version, period, size)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+            with stage('render'):
+                png = chart_png(analyzer, symbol, period, size, df, version)
+        return with_etag(Response(png, mimetype='image/png'), etag)
+    except Overloaded as e:
+        return e.response()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# 实时推送：每只股票一个后台轮询线程，所有连接共享其结果
+stream_hub = StreamHub(analyzer)
+
+@app.route('/api/stream')
+def api_stream():
+    """实时行情推送（Server-Sent Events），如 /api/stream?symbols=AAPL,MSFT"""
+    try:
+        symbols = parse_symbols(request.args.get('symbols'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 浏览器重连时自动带 Last-Event-ID；也允许用查询参数指定
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(stream_hub.stream(symbols, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# WebSocket：一个连接多路订阅，二进制消息按周期合并，与 SSE 共用轮询线程
+init_websocket(app, stream_hub)
+
+# 股票代码联想索引（启动时加载，每次按键只需沿前缀树走几步）
+symbol_index = get_index()
+
+@app.route('/api/symbols/suggest')
+def api_symbols_suggest():
+    """股票代码联想（代码 / 中文名称 / 拼音首字母），如 /api/symbols/suggest?q=hczb"""
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = request.args.get('q', '')
+    return json_response(request, {'query': query, 'suggestions': symbol_index.suggest(query, limit)})
+
+@app.route('/api/screen', methods=['GET', 'POST'])
+def api_screen():
+    """全市场选股，如 /api/screen?q=ma5>ma20>ma60 and rsi<30 and pe<20&sort=change&limit=50"""
+    params = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    try:
+        with stage('screen'):
+            result = screen_request(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(request, result)
+
 @app.route('/api/test')
 def api_test():
     """测试API"""
@@ -8,7 +8,7 @@ import pandas as pd
 import numpy as np
 import yfinance as yf
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
+from chart_render import ChartTemplate
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -18,9 +18,13 @@ class QuickStockAnalyzer:
     def __init__(self):
         print("🚀 快速股票分析器 v1.0")
         print("=" * 50)
+        self.chart_template = None
         
-    def get_stock_data(self, symbol, period="1mo"):
-        """获取股票数据"""
+    def get_stock_data(self, symbol, period="1mo", fallback=True):
+        """获取股票数据
+
+        fallback: 获取失败时是否改用示例数据；为 False 时直接抛出异常（批量出图用，避免把示例数据当作行情）
+        """
         print(f"📈 获取 {symbol} 股票数据 ({period})...")
         try:
             import time
@@ -31,6 +35,8 @@ class QuickStockAnalyzer:
             df = stock.history(period=period)
             
             if df.empty:
+                if not fallback:
+                    raise ValueError(f"未找到 {symbol} 的行情数据")
                 # 尝试其他数据源或本地缓存
                 print(f"⚠️  未找到实时数据，使用示例数据演示")
                 return self.get_sample_data(symbol)
@@ -40,6 +46,8 @@ class QuickStockAnalyzer:
             return df
         except Exception as e:
             print(f"⚠️  获取实时数据失败: {e}")
+            if not fallback:
+                raise
             print("   使用示例数据演示功能...")
             return self.get_sample_data(symbol)
     
@@ -158,36 +166,14 @@ class QuickStockAnalyzer:
         print("=" * 50)
     
     def plot_chart(self, symbol, df):
-        """绘制图表"""
+        """绘制图表（复用同一个图表模板，同一股票覆盖保存为 <代码>_analysis.png）"""
         try:
-            plt.figure(figsize=(12, 8))
-            
-            # 价格和移动平均线
-            plt.subplot(2, 1, 1)
-            plt.plot(df.index, df['Close'], label='收盘价', linewidth=2)
-            plt.plot(df.index, df['SMA_10'], label='10日MA', linestyle='--')
-            plt.plot(df.index, df['SMA_30'], label='30日MA', linestyle='--')
-            plt.title(f'{symbol} 价格走势')
-            plt.legend()
-            plt.grid(True, alpha=0.3)
-            
-            # RSI
-            plt.subplot(2, 1, 2)
-            plt.plot(df.index, df['RSI'], label='RSI', color='orange', linewidth=2)
-            plt.axhline(y=70, color='r', linestyle='--', alpha=0.5, label='超买线')
-            plt.axhline(y=30, color='g', linestyle='--', alpha=0.5, label='超卖线')
-            plt.title('RSI指标')
-            plt.legend()
-            plt.grid(True, alpha=0.3)
-            
-            plt.tight_layout()
-            
-            # 保存图表
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{symbol}_analysis_{timestamp}.png"
-            plt.savefig(filename, dpi=100)
+            if self.chart_template is None:
+                self.chart_template = ChartTemplate(1200, 800)
+            filename = f"{symbol}_analysis.png"
+            with open(filename, 'wb') as f:
+                f.write(self.chart_template.render(symbol, df))
             print(f"📊 图表已保存: {filename}")
-            plt.close()
             
         except Exception as e:
             print(f"❌ 绘制图表失败: {e}")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+实时行情 WebSocket 推送（多路复用）
+一个连接可随时订阅 / 取消订阅多只股票的多个频道，每个推送周期内的更新合并为一条二进制消息
+
+- 复用 quote_stream.StreamHub 的轮询线程：每只股票仍然只轮询一次
+- 每次更新按频道只编码一次（缓存在 Tick 上），所有连接发送同一段字节，编码开销只与股票数有关
+- 背压: 每个连接只保留每个 (股票, 频道) 的最新记录，慢连接合并更新
+
+控制消息（文本 JSON）:
+    {"op": "subscribe", "symbols": ["AAPL", "MSFT"], "channels": ["quote", "indicators"]}
+    {"op": "unsubscribe", "symbols": ["MSFT"]}     省略 channels 表示全部频道
+    {"op": "ping"}
+服务端以文本 JSON 回复（subscribed / unsubscribed / pong / error / heartbeat），行情为二进制消息（小端序）:
+    消息头: b'SQB1' + uint16 记录数
+    记录:   uint32 序号 + uint8 频道 + uint8 代码长度 + uint32 正文长度 + 代码(UTF-8) + 正文(JSON)
+    频道: 0=quote（分析结论 + 最新K线） 1=indicators（最新指标值）
+"""
+
+import asyncio
+import struct
+import threading
+import time
+from collections import OrderedDict
+from fast_json import dumps, loads
+from quote_stream import HEARTBEAT_INTERVAL, parse_symbols
+
+try:
+    from flask_sock import Sock
+except ImportError:
+    Sock = None
+
+CHANNELS = ('quote', 'indicators')
+MAGIC = b'SQB1'
+RECORD_HEADER = struct.Struct('<IBBI')
+# 单个连接最多订阅的股票数、合并推送的周期（秒）
+MAX_SOCKET_SYMBOLS = 200
+FLUSH_INTERVAL = 0.05
+
+
+def channel_data(snapshot, channel):
+    """各频道的推送内容"""
+    if channel == 'quote':
+        return {'date': snapshot['date'], 'analysis': snapshot['analysis'],
+                'bar': snapshot['bar'], 'version': snapshot['version']}
+    return {'date': snapshot['date'], 'indicators': snapshot['indicators']}
+
+
+def encode_record(tick, channel_id):
+    """一条记录的字节（每个 Tick 每个频道只编码一次）"""
+    key = ('socket', channel_id)
+    record = tick.encoded.get(key)
+    if record is None:
+        symbol = tick.symbol.encode('utf-8')
+        body = dumps(channel_data(tick.snapshot, CHANNELS[channel_id]))
+        record = RECORD_HEADER.pack(tick.seq & 0xFFFFFFFF, channel_id, len(symbol), len(body)) + symbol + body
+        tick.encoded[key] = record
+    return record
+
+
+def batch_message(records):
+    """把多条记录合并为一条二进制消息"""
+    return MAGIC + struct.pack('<H', len(records)) + b''.join(records)
+
+
+def decode_message(data):
+    """解析二进制消息 -> [(序号, 频道, 代码, 内容)]（测试与 Python 客户端用）"""
+    if data[:4] != MAGIC:
+        raise ValueError("不是行情消息")
+    count = struct.unpack_from('<H', data, 4)[0]
+    offset = 6
+    records = []
+    for _ in range(count):
+        seq, channel_id, symbol_len, body_len = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        symbol = data[offset:offset + symbol_len].decode('utf-8')
+        offset += symbol_len
+        records.append((seq, CHANNELS[channel_id], symbol, loads(data[offset:offset + body_len])))
+        offset += body_len
+    return records
+
+
+def parse_channels(value):
+    """解析频道列表，省略时为全部频道"""
+    if not value:
+        return frozenset(range(len(CHANNELS)))
+    if isinstance(value, str):
+        value = value.split(',')
+    channels = set()
+    for name in value:
+        name = str(name).strip().lower()
+        if name not in CHANNELS:
+            raise ValueError(f"未知频道: {name}（可选: {', '.join(CHANNELS)}）")
+        channels.add(CHANNELS.index(name))
+    return frozenset(channels)
+
+
+class SocketSubscription:
+    """单个 WebSocket 连接的订阅与待发送记录"""
+
+    def __init__(self, wakeup=None):
+        self.channels = {}          # 股票 -> frozenset(频道)
+        self.pending = OrderedDict()
+        self.lock = threading.Lock()
+        self.wakeup = wakeup
+        self.conflated = 0
+
+    def deliver(self, tick):
+        """轮询线程调用：取共享的编码结果放入待发送队列"""
+        channels = self.channels.get(tick.symbol)
+        if not channels:
+            return
+        records = [((tick.symbol, c), encode_record(tick, c)) for c in sorted(channels)]
+        with self.lock:
+            for key, record in records:
+                if key in self.pending:
+                    self.conflated += 1
+                    del self.pending[key]
+                self.pending[key] = record
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def take_batch(self):
+        """取出全部待发送记录，合并为一条消息；没有时返回 None"""
+        with self.lock:
+            if not self.pending:
+                return None
+            records = list(self.pending.values())
+            self.pending.clear()
+        return batch_message(records)
+
+
+class SocketSession:
+    """一个 WebSocket 连接：处理控制消息，按周期发送合并后的行情"""
+
+    def __init__(self, hub, max_symbols=MAX_SOCKET_SYMBOLS):
+        self.hub = hub
+        self.max_symbols = max_symbols
+        self.subscription = SocketSubscription()
+
+    def handle(self, message):
+        """处理一条控制消息，返回回复内容"""
+        try:
+            request = loads(message)
+            if not isinstance(request, dict):
+                raise ValueError("控制消息必须是 JSON 对象")
+            op = request.get('op')
+            if op == 'ping':
+                return {'op': 'pong', 'time': time.time()}
+            if op not in ('subscribe', 'unsubscribe'):
+                raise ValueError(f"未知操作: {op}")
+            symbols = request.get('symbols') or []
+            if isinstance(symbols, list):
+                symbols = ','.join(str(s) for s in symbols)
+            symbols = parse_symbols(symbols, self.max_symbols)
+            channels = request.get('channels')
+            if op == 'subscribe':
+                self.subscribe(symbols, parse_channels(channels))
+            else:
+                self.unsubscribe(symbols, parse_channels(channels) if channels else None)
+            return {'op': op + 'd', 'symbols': {s: [CHANNELS[c] for c in sorted(cs)]
+                                                for s, cs in self.subscription.channels.items()}}
+        except ValueError as e:
+            return {'op': 'error', 'error': str(e)}
+
+    def subscribe(self, symbols, channels):
+        current = self.subscription.channels
+        if len(set(current) | set(symbols)) > self.max_symbols:
+            raise ValueError(f"单个连接最多订阅 {self.max_symbols} 只股票")
+        for symbol in symbols:
+            current[symbol] = current.get(symbol, frozenset()) | channels
+        # 已有数据的股票立即发送一次最新状态
+        for tick in self.hub.attach(self.subscription, symbols):
+            self.subscription.deliver(tick)
+
+    def unsubscribe(self, symbols, channels=None):
+        current = self.subscription.channels
+        removed = []
+        for symbol in symbols:
+            if symbol not in current:
+                continue
+            remaining = current[symbol] - channels if channels else frozenset()
+            if remaining:
+                current[symbol] = remaining
+            else:
+                del current[symbol]
+                removed.append(symbol)
+        self.hub.detach(self.subscription, removed)
+
+    def close(self):
+        self.hub.detach(self.subscription, list(self.subscription.channels))
+        self.subscription.channels.clear()
+
+    def _reply(self, message):
+        return dumps(self.handle(message)).decode('utf-8')
+
+    def run_sync(self, ws, flush_interval=FLUSH_INTERVAL, heartbeat=HEARTBEAT_INTERVAL):
+        """阻塞式连接（flask-sock / simple-websocket: receive(timeout)、send）"""
+        last_sent = time.monotonic()
+        try:
+            while True:
+                message = ws.receive(timeout=flush_interval)
+                if message is not None:
+                    ws.send(self._reply(message))
+                batch = self.subscription.take_batch()
+                now = time.monotonic()
+                if batch is not None:
+                    ws.send(batch)
+                    last_sent = now
+                elif now - last_sent >= heartbeat:
+                    ws.send('{"op":"heartbeat"}')
+                    last_sent = now
+        finally:
+            self.close()
+
+    async def run_async(self, receive, send, flush_interval=FLUSH_INTERVAL, heartbeat=HEARTBEAT_INTERVAL):
+        """异步连接（Quart 等: await receive()、await send(data)）"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        self.subscription.wakeup = lambda: loop.call_soon_threadsafe(ready.set)
+
+        async def read_loop():
+            while True:
+                message = await receive()
+                await send(self._reply(message))
+
+        reader = asyncio.ensure_future(read_loop())
+        try:
+            while True:
+                waiter = asyncio.ensure_future(ready.wait())
+                done, _ = await asyncio.wait({reader, waiter}, timeout=heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if reader in done:
+                    waiter.cancel()
+                    reader.result()
+                    return
+                if waiter not in done:
+                    waiter.cancel()
+                    await send('{"op":"heartbeat"}')
+                    continue
+                ready.clear()
+                # 合并同一周期内到达的更新
+                await asyncio.sleep(flush_interval)
+                batch = self.subscription.take_batch()
+                if batch is not None:
+                    await send(batch)
+        finally:
+            reader.cancel()
+            self.close()
+
+
+def init_websocket(app, hub, path='/api/ws'):
+    """注册 WebSocket 接口（需要 flask-sock，未安装时跳过）"""
+    if Sock is None:
+        print("⚠️  未安装 flask-sock，WebSocket 接口不可用（pip install flask-sock）")
+        return None
+    sock = Sock(app)
+
+    @sock.route(path)
+    def api_ws(ws):
+        """实时行情 WebSocket（多路复用订阅）"""
+        SocketSession(hub).run_sync(ws)
+
+    return sock
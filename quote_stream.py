@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+实时行情推送 (Server-Sent Events)
+每只股票只有一个后台轮询线程，所有订阅该股票的连接共享其结果：
+1000 个浏览器订阅同一只股票，上游仍然只轮询一次
+
+- 报价或指标变化时才推送事件；每条事件都是该股票的完整最新状态
+- 事件 id 为 "<服务启动时间>.<全局序号>"，断线重连时按 Last-Event-ID 只补发之后有变化的股票，
+  服务重启后旧的 id 失效，改为发送全部最新状态
+- 空闲时发送心跳注释，防止代理断开连接
+- 背压: 每个连接只保留每只股票的最新事件，慢连接会合并更新而不会阻塞轮询线程
+- 订阅者只需实现 deliver(tick)，WebSocket 推送（quote_socket）复用同一批轮询线程
+- stream_async: 异步应用（async_stock_app）用的 SSE 生成器，等待事件时不占用线程
+"""
+
+import asyncio
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from chart_delta import data_version
+from fast_json import dumps
+
+# 轮询间隔（秒）、心跳间隔（秒）
+POLL_INTERVAL = float(os.environ.get('STOCK_STREAM_INTERVAL', 15))
+HEARTBEAT_INTERVAL = 15.0
+# 客户端重连等待（毫秒）
+RETRY_MS = 3000
+# 单个连接最多订阅的股票数
+MAX_SYMBOLS = 20
+
+
+def format_event(event_id, event, data):
+    """SSE 文本格式"""
+    payload = dumps(data).decode('utf-8')
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+def parse_symbols(value, limit=MAX_SYMBOLS):
+    """解析 symbols 查询参数（逗号分隔）"""
+    symbols = []
+    for symbol in (value or '').split(','):
+        symbol = symbol.strip().upper()
+        if not symbol:
+            continue
+        if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+            raise ValueError(f"无效的股票代码格式: {symbol}")
+        if symbol not in symbols:
+            symbols.append(symbol)
+    if not symbols:
+        raise ValueError("请提供 symbols 参数，如 ?symbols=AAPL,MSFT")
+    if len(symbols) > limit:
+        raise ValueError(f"单个连接最多订阅 {limit} 只股票")
+    return symbols
+
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def _value(value):
+    """numpy 标量 -> Python，NaN -> None"""
+    value = value.item() if hasattr(value, 'item') else value
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def quote_snapshot(analyzer, symbol, df):
+    """推送内容：分析结论 + 最新一根K线 + 最新指标值
+
+    指标在副本上计算；结论只依赖最后两根K线，只对尾部做汇总
+    """
+    frame = analyzer.calculate_indicators(df.copy())
+    analysis = analyzer.summarize(symbol, frame.iloc[-2:])['analysis']
+    latest = frame.iloc[-1]
+    return {
+        'symbol': symbol,
+        'date': frame.index[-1].strftime('%Y-%m-%d'),
+        'analysis': analysis,
+        'bar': {col: _value(latest[col]) for col in BAR_COLUMNS if col in frame.columns},
+        'indicators': {col: _value(latest[col]) for col in frame.columns if col not in BAR_COLUMNS},
+        'version': data_version(df),
+    }
+
+
+def _fingerprint(snapshot):
+    """判断内容是否变化（忽略生成时间）"""
+    return dumps([snapshot['bar'], snapshot['indicators'], snapshot['version']])
+
+
+class Tick:
+    """一只股票的一次更新；各种编码结果按格式缓存在 encoded 中，所有订阅者共用"""
+
+    __slots__ = ('seq', 'symbol', 'snapshot', 'event', 'encoded')
+
+    def __init__(self, seq, symbol, snapshot, event):
+        self.seq = seq
+        self.symbol = symbol
+        self.snapshot = snapshot
+        self.event = event      # SSE 文本
+        self.encoded = {}
+
+
+class Subscription:
+    """单个 SSE 连接的待发送事件（每只股票只保留最新一条）"""
+
+    def __init__(self, symbols, wakeup=None):
+        self.symbols = symbols
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.wakeup = wakeup
+        self.conflated = 0
+
+    def push(self, symbol, event):
+        with self.condition:
+            if symbol in self.pending:
+                self.conflated += 1
+                del self.pending[symbol]
+            self.pending[symbol] = event
+            self.condition.notify()
+        if self.wakeup is not None:
+            self.wakeup()
+
+    def deliver(self, tick):
+        self.push(tick.symbol, tick.event)
+
+    def drain(self, timeout):
+        """等待并取出全部待发送事件，超时返回空列表"""
+        with self.condition:
+            if not self.pending:
+                self.condition.wait(timeout)
+            events = list(self.pending.values())
+            self.pending.clear()
+        return events
+
+    def take(self):
+        """取出全部待发送事件（不等待）"""
+        return self.drain(0)
+
+
+class SymbolPoller(threading.Thread):
+    """单只股票的后台轮询线程"""
+
+    def __init__(self, hub, symbol):
+        super().__init__(name=f"poller-{symbol}", daemon=True)
+        self.hub = hub
+        self.symbol = symbol
+        self.latest = None      # 最新的 Tick
+        self.subscribers = set()
+        self.stopped = threading.Event()
+        self._fingerprint = None
+
+    def poll_once(self):
+        """获取一次数据，内容变化时发布事件
+
+        数据源失败时直接抛出（不使用示例数据），由 run() 记录日志并跳过本次推送，缓存保持不变
+        """
+        analyzer = self.hub.analyzer
+        df = analyzer.get_stock_data(self.symbol, self.hub.period, use_cache=False, fallback=False)
+        snapshot = quote_snapshot(analyzer, self.symbol, df)
+        fingerprint = _fingerprint(snapshot)
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+        self.hub.publish(self, snapshot)
+        return True
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"⚠️  {self.symbol} 行情轮询失败: {e}")
+            self.stopped.wait(self.hub.interval)
+
+
+class StreamHub:
+    """管理各股票的轮询线程与订阅连接"""
+
+    def __init__(self, analyzer, period="1mo", interval=POLL_INTERVAL):
+        self.analyzer = analyzer
+        self.period = period
+        self.interval = interval
+        self.pollers = {}
+        self.lock = threading.Lock()
+        self.epoch = int(time.time())
+        self._ids = itertools.count(1)
+
+    def publish(self, poller, snapshot):
+        """给事件编号、记入缓冲区并分发给订阅者"""
+        with self.lock:
+            seq = next(self._ids)
+            event = format_event(f"{self.epoch}.{seq}", 'quote', snapshot)
+            tick = Tick(seq, poller.symbol, snapshot, event)
+            poller.latest = tick
+            subscribers = list(poller.subscribers)
+        for subscription in subscribers:
+            subscription.deliver(tick)
+
+    def attach(self, subscription, symbols, last_seq=None):
+        """为订阅增加股票（没有轮询线程的启动一个），返回需要补发的最新 Tick"""
+        backlog = []
+        with self.lock:
+            for symbol in symbols:
+                poller = self.pollers.get(symbol)
+                if poller is None:
+                    poller = SymbolPoller(self, symbol)
+                    self.pollers[symbol] = poller
+                    poller.start()
+                poller.subscribers.add(subscription)
+                if poller.latest is not None and (last_seq is None or poller.latest.seq > last_seq):
+                    backlog.append(poller.latest)
+        backlog.sort(key=lambda tick: tick.seq)
+        return backlog
+
+    def detach(self, subscription, symbols):
+        """取消订阅部分股票，最后一个订阅者离开时停止该股票的轮询"""
+        with self.lock:
+            for symbol in symbols:
+                poller = self.pollers.get(symbol)
+                if poller is None:
+                    continue
+                poller.subscribers.discard(subscription)
+                if not poller.subscribers:
+                    poller.stopped.set()
+                    del self.pollers[symbol]
+
+    def subscribe(self, symbols, last_event_id=None):
+        """登记订阅，返回 (订阅, 需要补发的事件)"""
+        subscription = Subscription(symbols)
+        backlog = self.attach(subscription, symbols, self.parse_last_event_id(last_event_id))
+        return subscription, [tick.event for tick in backlog]
+
+    def parse_last_event_id(self, value):
+        """Last-Event-ID -> 序号；格式错误或来自上一次启动的 id 返回 None"""
+        try:
+            epoch, seq = str(value).split('.', 1)
+            if int(epoch) != self.epoch:
+                return None
+            return int(seq)
+        except (TypeError, ValueError):
+            return None
+
+    def unsubscribe(self, subscription):
+        """注销订阅"""
+        self.detach(subscription, subscription.symbols)
+
+    def stream(self, symbols, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """SSE 响应体生成器"""
+        subscription, backlog = self.subscribe(symbols, last_event_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for event in backlog:
+                yield event
+            while True:
+                events = subscription.drain(heartbeat)
+                if not events:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                    continue
+                for event in events:
+                    yield event
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stream_async(self, symbols, last_event_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """SSE 响应体异步生成器：轮询线程推送时唤醒事件循环，等待期间不占用线程"""
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        subscription = Subscription(symbols, wakeup=lambda: loop.call_soon_threadsafe(ready.set))
+        backlog = self.attach(subscription, symbols, self.parse_last_event_id(last_event_id))
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for tick in backlog:
+                yield tick.event
+            while True:
+                try:
+                    await asyncio.wait_for(ready.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield f": heartbeat {int(time.time())}\n\n"
+                    continue
+                # 先清除再取出：取出之后到达的事件会再次唤醒
+                ready.clear()
+                for event in subscription.take():
+                    yield event
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        """各股票的订阅连接数"""
+        with self.lock:
+            return {symbol: len(poller.subscribers) for symbol, poller in self.pollers.items()}
+
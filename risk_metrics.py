@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+滚动风险指标模块
+一次遍历计算整个股票面板的波动率、回撤、下行波动、夏普/索提诺比率时间序列
+"""
+
+import pandas as pd
+import numpy as np
+
+
+class RiskPanel:
+    """多股票滚动风险指标面板
+
+    prices: DataFrame，行为日期、列为股票代码的收盘价
+    windows: 滚动窗口（交易日）
+
+    所有窗口共享同一组累计和（收益、收益平方、下行偏差平方、有效样本数），
+    每个窗口的统计量由累计和相减得到，计算量与窗口长度无关。
+    结果为完整时间序列，可按任意日期读取。
+    """
+
+    def __init__(self, prices, windows=(20, 60, 120), risk_free_rate=0.02, periods_per_year=252):
+        if isinstance(prices, pd.Series):
+            prices = prices.to_frame()
+        self.prices = prices.sort_index()
+        self.windows = tuple(windows)
+        self.risk_free_rate = risk_free_rate
+        self.periods_per_year = periods_per_year
+        self.metrics = {}
+        self.compute()
+
+    def _rolling(self, cum, window):
+        """由累计和得到窗口内的和"""
+        out = cum.copy()
+        out[window:] = cum[window:] - cum[:-window]
+        return out
+
+    def compute(self):
+        """计算全部指标"""
+        prices = self.prices.to_numpy(dtype=float)
+        index, columns = self.prices.index, self.prices.columns
+        ann = np.sqrt(self.periods_per_year)
+        rf = self.risk_free_rate / self.periods_per_year
+
+        returns = np.full_like(prices, np.nan)
+        returns[1:] = prices[1:] / prices[:-1] - 1
+        valid = ~np.isnan(returns)
+        r = np.where(valid, returns, 0.0)
+        downside = np.minimum(r - rf, 0.0) ** 2
+
+        # 共享的中间结果
+        cum_n = np.cumsum(valid, axis=0, dtype=float)
+        cum_r = np.cumsum(r, axis=0)
+        cum_r2 = np.cumsum(r * r, axis=0)
+        cum_down = np.cumsum(downside, axis=0)
+
+        def frame(values):
+            return pd.DataFrame(values, index=index, columns=columns)
+
+        def stats(n, s, s2, down):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = s / n
+                var = (s2 - s * mean) / (n - 1)
+                std = np.sqrt(np.maximum(var, 0.0))
+                down_dev = np.sqrt(down / n)
+                sharpe = ann * (mean - rf) / std
+                sortino = ann * (mean - rf) / down_dev
+            std[n < 2] = np.nan
+            sharpe[n < 2] = np.nan
+            sortino[n < 2] = np.nan
+            down_dev[n < 2] = np.nan
+            return std, down_dev, sharpe, sortino
+
+        self.metrics['returns'] = frame(returns)
+
+        for window in self.windows:
+            n = self._rolling(cum_n, window)
+            std, down_dev, sharpe, sortino = stats(
+                n,
+                self._rolling(cum_r, window),
+                self._rolling(cum_r2, window),
+                self._rolling(cum_down, window),
+            )
+            # 窗口未满时不输出，与 tail(window).std() 的口径一致
+            std[n < window] = np.nan
+            sharpe[n < window] = np.nan
+            sortino[n < window] = np.nan
+            down_dev[n < window] = np.nan
+            self.metrics[f'volatility_{window}d'] = frame(std * ann * 100)
+            self.metrics[f'downside_deviation_{window}d'] = frame(down_dev * ann * 100)
+            self.metrics[f'sharpe_{window}d'] = frame(sharpe)
+            self.metrics[f'sortino_{window}d'] = frame(sortino)
+
+        # 全历史（扩展窗口）指标
+        std, down_dev, sharpe, sortino = stats(cum_n, cum_r, cum_r2, cum_down)
+        self.metrics['volatility'] = frame(std * ann * 100)
+        self.metrics['downside_deviation'] = frame(down_dev * ann * 100)
+        self.metrics['sharpe'] = frame(sharpe)
+        self.metrics['sortino'] = frame(sortino)
+
+        # 回撤（百分比，正数表示回撤幅度）
+        peak = np.fmax.accumulate(np.where(np.isnan(prices), -np.inf, prices), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            drawdown = (1 - prices / peak) * 100
+        self.metrics['drawdown'] = frame(drawdown)
+        self.metrics['max_drawdown'] = frame(np.fmax.accumulate(np.nan_to_num(drawdown), axis=0))
+
+        return self.metrics
+
+    def metric(self, name):
+        """获取某个指标的完整时间序列"""
+        return self.metrics[name]
+
+    def _row(self, date):
+        """日期对应的行号（非交易日取之前最近的交易日）"""
+        if date is None:
+            return len(self.prices.index) - 1
+        pos = self.prices.index.searchsorted(pd.Timestamp(date), side='right') - 1
+        if pos < 0:
+            raise KeyError(f"{date} 早于数据起始日期")
+        return pos
+
+    def snapshot(self, date=None):
+        """读取某一日期全部股票的指标 {symbol: {metric: value}}"""
+        row = self._row(date)
+        rows = {
+            name: frame.to_numpy()[row]
+            for name, frame in self.metrics.items() if name != 'returns'
+        }
+        result = {}
+        for j, symbol in enumerate(self.prices.columns):
+            result[symbol] = {
+                name: (None if np.isnan(values[j]) else float(values[j]))
+                for name, values in rows.items()
+            }
+        return result
+
+    def symbol_metrics(self, symbol, date=None):
+        """读取单只股票在某一日期的指标"""
+        return self.snapshot(date)[symbol]
+
+
+def build_risk_panel(frames, close_column=None, **kwargs):
+    """由 {symbol: DataFrame} 构建风险面板（兼容中英文收盘列名）"""
+    closes = {}
+    for symbol, df in frames.items():
+        column = close_column or ('收盘' if '收盘' in df.columns else 'Close')
+        closes[symbol] = df[column]
+    return RiskPanel(pd.DataFrame(closes), **kwargs)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+跨进程行情缓存
+基于本地 SQLite（WAL 模式）保存行情 DataFrame，同一台机器上的多个工作进程共用：
+进程 A 获取过的股票，进程 B..N 直接读取，不再请求上游
+
+- 用法与字典相同（key in cache / cache[key] / cache[key] = df），可直接替换 StockAnalyzer.cache
+- 每个进程保留已反序列化的副本，数据未变化时命中只需一次索引查询，且返回同一个对象
+- claim(key): 多个进程/线程同时未命中时只有一个去获取，其余等待其写入结果
+- max_age: 条目有效期（秒），默认 15 分钟，可用环境变量 STOCK_CACHE_MAX_AGE 设置（0 表示不过期）；
+  缓存文件在重启后仍然存在，有效期保证旧行情和获取失败时写入的示例数据不会一直被使用
+
+条目为 pickle 格式，能写入数据库文件的人就能在本进程中执行代码：默认放在当前用户的缓存目录
+（~/.cache/stock_analyzer，权限 0700）而不是所有人可写的临时目录，打开前检查目录和文件属于当前用户、
+其他用户不可写，否则拒绝使用
+"""
+
+import os
+import pickle
+import sqlite3
+import stat
+import threading
+import time
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'stock_analyzer')
+DEFAULT_PATH = os.environ.get('STOCK_CACHE_PATH', os.path.join(CACHE_DIR, 'stock_cache.sqlite3'))
+DEFAULT_MAX_AGE = 15 * 60.0
+# 加载权有效期（秒）：持有者崩溃时其他进程最多等待这么久
+LEASE_SECONDS = 30.0
+POLL_SECONDS = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    key TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+def _env_max_age():
+    value = os.environ.get('STOCK_CACHE_MAX_AGE')
+    return float(value) if value else DEFAULT_MAX_AGE
+
+
+def _check_owner(path, owners, allow_sticky=False):
+    """path 的属主必须在 owners 中，且组和其他用户不可写（allow_sticky: 允许 /tmp 这类带粘滞位的公共目录）"""
+    st = os.stat(path)
+    if st.st_uid not in owners:
+        raise PermissionError(f"缓存路径属于其他用户，拒绝使用: {path}")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH) and not (allow_sticky and st.st_mode & stat.S_ISVTX):
+        raise PermissionError(f"缓存路径可被其他用户写入，拒绝使用: {path}")
+
+
+def secure_path(path):
+    """准备缓存文件：目录不存在时以 0700 创建，文件不存在时以 0600 创建，并检查所有权与权限"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    try:
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+    except FileExistsError:
+        pass
+    if not hasattr(os, 'getuid'):
+        return path
+    # 目录可属于 root；带粘滞位的公共目录中别人无法删除或替换我们的文件，只需检查文件本身
+    _check_owner(directory, (os.getuid(), 0), allow_sticky=True)
+    for target in (path, path + '-wal', path + '-shm'):
+        if os.path.exists(target):
+            _check_owner(target, (os.getuid(),))
+    return path
+
+
+class SharedFrameCache:
+    """SQLite 共享缓存（字典接口）"""
+
+    def __init__(self, path=None, max_age=None):
+        self.path = secure_path(path or DEFAULT_PATH)
+        self.max_age = max_age if max_age is not None else _env_max_age()
+        if self.max_age <= 0:
+            self.max_age = None
+        self._local = threading.local()
+        self._memo = {}     # key -> (stamp, DataFrame)
+        self._lock = threading.Lock()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        """每个线程一个连接；fork 后的子进程重新连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _owner(self):
+        return f"{os.getpid()}:{threading.get_ident()}"
+
+    def _expired(self, fetched_at):
+        return self.max_age is not None and time.time() - fetched_at > self.max_age
+
+    def get(self, key, default=None):
+        """读取条目，不存在或已过期返回 default"""
+        conn = self._connect()
+        row = conn.execute('SELECT stamp, fetched_at FROM frames WHERE key = ?', (key,)).fetchone()
+        if row is None or self._expired(row[1]):
+            return default
+        stamp = row[0]
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] == stamp:
+            return memo[1]
+        row = conn.execute('SELECT stamp, data FROM frames WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return default
+        df = pickle.loads(row[1])
+        with self._lock:
+            self._memo[key] = (row[0], df)
+        return df
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        df = self.get(key)
+        if df is None:
+            raise KeyError(key)
+        return df
+
+    def __setitem__(self, key, df):
+        """写入条目并释放该 key 的加载权"""
+        stamp = f"{time.time_ns()}.{self._owner()}"
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT OR REPLACE INTO frames (key, stamp, fetched_at, data) VALUES (?, ?, ?, ?)',
+                         (key, stamp, time.time(), data))
+            conn.execute('DELETE FROM leases WHERE key = ?', (key,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        with self._lock:
+            self._memo[key] = (stamp, df)
+
+    def __delitem__(self, key):
+        if self.pop(key, None) is None:
+            raise KeyError(key)
+
+    def pop(self, key, default=None):
+        df = self.get(key)
+        self._connect().execute('DELETE FROM frames WHERE key = ?', (key,))
+        with self._lock:
+            self._memo.pop(key, None)
+        return default if df is None else df
+
+    def keys(self):
+        return [row[0] for row in self._connect().execute('SELECT key FROM frames ORDER BY key')]
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM frames').fetchone()[0]
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('DELETE FROM frames')
+        conn.execute('DELETE FROM leases')
+        with self._lock:
+            self._memo.clear()
+
+    def claim(self, key, timeout=LEASE_SECONDS):
+        """获取 key 的加载权
+
+        返回 None: 由调用方获取数据（写入缓存时自动释放）；
+        返回 DataFrame: 其他进程/线程已在获取，这是等到的结果。
+        等待超时（持有者可能已崩溃）也返回 None
+        """
+        conn = self._connect()
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM leases WHERE key = ? AND expires < ?', (key, now))
+                acquired = conn.execute('INSERT OR IGNORE INTO leases (key, owner, expires) VALUES (?, ?, ?)',
+                                        (key, self._owner(), now + LEASE_SECONDS)).rowcount
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            df = self.get(key)
+            if acquired:
+                # 加锁前其他进程可能刚写入
+                if df is not None:
+                    self.release(key)
+                return df
+            if df is not None:
+                return df
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_SECONDS)
+
+    def release(self, key):
+        """放弃加载权（获取失败且不写入缓存时调用）；只删除本线程持有的租约"""
+        self._connect().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, self._owner()))
@@ -4,10 +4,12 @@
 """
 
 from flask import Flask, jsonify, request
+from fast_json import init_json
 import random
 from datetime import datetime
 
 app = Flask(__name__)
+init_json(app)
 
 @app.route('/')
 def home():
@@ -0,0 +1,254 @@
+// 二进制图表数据解码（格式说明见 chart_payload.py）
+const CHART_MIME = 'application/x-stock-chart';
+
+function daysToLabels(days) {
+    const labels = new Array(days.length);
+    for (let i = 0; i < days.length; i++) {
+        labels[i] = new Date(days[i] * 86400000).toISOString().slice(0, 10);
+    }
+    return labels;
+}
+
+function decodeChartPayload(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic !== 'SCP1') {
+        throw new Error('无效的图表数据帧');
+    }
+    const headerLen = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLen)));
+    const bodyStart = 8 + headerLen;
+
+    // 数值序列直接映射为 Float32Array（不复制），缺失值为 NaN，Chart.js 会显示为断点
+    const blocks = {};
+    for (const entry of header.series) {
+        const ArrayType = entry.dtype === 'i4' ? Int32Array : Float32Array;
+        let values = new ArrayType(buffer, bodyStart + entry.offset, entry.count);
+        if (entry.name === 'dates') {
+            values = daysToLabels(values);
+        }
+        (blocks[entry.block] = blocks[entry.block] || {})[entry.name] = values;
+    }
+
+    const result = header.result;
+    result.chart_data = blocks.daily || {};
+    for (const timeframe in (result.timeframes || {})) {
+        if (blocks[timeframe]) {
+            result.timeframes[timeframe].chart_data = blocks[timeframe];
+        }
+    }
+    return result;
+}
+
+// 根据 Content-Type 解析 /api/analyze 响应（二进制或 JSON）
+function readAnalyzeResponse(response) {
+    const type = response.headers.get('Content-Type') || '';
+    if (type.indexOf(CHART_MIME) === 0) {
+        return response.arrayBuffer().then(decodeChartPayload);
+    }
+    return response.json();
+}
+
+// 图表画布只有几百像素宽，长周期数据由服务端降采样到该点数以内
+const CHART_MAX_POINTS = 600;
+
+// 增量更新：已绘制的分析结果、版本令牌与 ETag（按股票代码和周期）
+const chartState = {};
+
+function analyzeRequestBody(symbol, period) {
+    const body = { symbol: symbol, period: period, max_points: CHART_MAX_POINTS };
+    const state = chartState[symbol + '_' + period];
+    if (state) {
+        body.version = state.version;
+    }
+    return body;
+}
+
+// 把增量序列拼接到已有序列上（从 replaceFrom 日期开始覆盖）
+function mergeChartData(old, delta, replaceFrom) {
+    let cut = old.dates.indexOf(replaceFrom);
+    if (cut < 0) {
+        cut = old.dates.length;
+    }
+    const merged = {};
+    for (const name in delta) {
+        const head = Array.prototype.slice.call(old[name] || [], 0, cut);
+        merged[name] = head.concat(Array.prototype.slice.call(delta[name]));
+    }
+    return merged;
+}
+
+// 根据响应中的 update 信息得到完整图表数据，并记录新版本
+function applyChartUpdate(symbol, period, data, etag) {
+    const key = symbol + '_' + period;
+    const update = data.update || {};
+    const state = chartState[key];
+    if (update.mode === 'delta' && state) {
+        data.chart_data = mergeChartData(state.data.chart_data, data.chart_data, update.replace_from);
+    }
+    if (update.version) {
+        chartState[key] = { version: update.version, etag: etag, data: data };
+    }
+    return data;
+}
+
+// 请求 /api/analyze：带上版本令牌与 If-None-Match，304 时直接复用上次结果
+function fetchAnalyze(symbol, period) {
+    const state = chartState[symbol + '_' + period];
+    const headers = {
+        'Content-Type': 'application/json',
+        'Accept': CHART_MIME + ', application/json;q=0.9'
+    };
+    if (state && state.etag) {
+        headers['If-None-Match'] = state.etag;
+    }
+    return fetch('/api/analyze', {
+        method: 'POST',
+        headers: headers,
+        body: JSON.stringify(analyzeRequestBody(symbol, period))
+    })
+    .then(response => {
+        if (response.status === 304 && state) {
+            return state.data;
+        }
+        const etag = response.headers.get('ETag');
+        return readAnalyzeResponse(response).then(data => {
+            return data.error ? data : applyChartUpdate(symbol, period, data, etag);
+        });
+    });
+}
+
+// 实时推送：订阅当前股票的报价与指标更新（同一时间只保留一个连接，断线由浏览器自动重连）
+let quoteSource = null;
+
+function watchQuotes(symbol, onQuote) {
+    if (quoteSource) {
+        quoteSource.close();
+        quoteSource = null;
+    }
+    if (!window.EventSource) {
+        return;
+    }
+    quoteSource = new EventSource('/api/stream?symbols=' + encodeURIComponent(symbol));
+    quoteSource.addEventListener('quote', event => onQuote(JSON.parse(event.data)));
+}
+
+// 股票代码联想：输入代码、中文名称或拼音首字母（如 hczb）时从 /api/symbols/suggest 获取候选
+function attachSymbolSuggest(input) {
+    const list = document.createElement('datalist');
+    list.id = input.id + 'Suggestions';
+    input.parentNode.appendChild(list);
+    input.setAttribute('list', list.id);
+    input.setAttribute('autocomplete', 'off');
+
+    const cache = new Map();
+    let pending = null;
+
+    function render(suggestions) {
+        list.innerHTML = '';
+        suggestions.forEach(item => {
+            const option = document.createElement('option');
+            option.value = item.symbol;
+            option.label = item.name ? item.name + ' · ' + item.market : item.market;
+            list.appendChild(option);
+        });
+    }
+
+    input.addEventListener('input', () => {
+        const query = input.value.trim();
+        if (!query) {
+            render([]);
+            return;
+        }
+        if (cache.has(query)) {
+            render(cache.get(query));
+            return;
+        }
+        // 只保留最后一次按键的请求
+        if (pending) {
+            pending.abort();
+        }
+        pending = window.AbortController ? new AbortController() : null;
+        fetch('/api/symbols/suggest?q=' + encodeURIComponent(query), pending ? { signal: pending.signal } : {})
+            .then(response => response.json())
+            .then(data => {
+                const suggestions = data.suggestions || [];
+                cache.set(query, suggestions);
+                if (input.value.trim() === query) {
+                    render(suggestions);
+                }
+            })
+            .catch(() => {});
+    });
+}
+
+// WebSocket 行情：一个连接多路订阅，二进制消息内含多条记录（格式见 quote_socket.py）
+const QUOTE_CHANNELS = ['quote', 'indicators'];
+
+function decodeQuoteBatch(buffer) {
+    const view = new DataView(buffer);
+    const bytes = new Uint8Array(buffer);
+    const text = new TextDecoder();
+    if (text.decode(bytes.subarray(0, 4)) !== 'SQB1') {
+        throw new Error('不是行情消息');
+    }
+    const count = view.getUint16(4, true);
+    const records = [];
+    let offset = 6;
+    for (let i = 0; i < count; i++) {
+        const seq = view.getUint32(offset, true);
+        const channel = QUOTE_CHANNELS[view.getUint8(offset + 4)];
+        const symbolLength = view.getUint8(offset + 5);
+        const bodyLength = view.getUint32(offset + 6, true);
+        offset += 10;
+        const symbol = text.decode(bytes.subarray(offset, offset + symbolLength));
+        offset += symbolLength;
+        const data = JSON.parse(text.decode(bytes.subarray(offset, offset + bodyLength)));
+        offset += bodyLength;
+        records.push({ seq: seq, channel: channel, symbol: symbol, data: data });
+    }
+    return records;
+}
+
+// 打开行情连接；onRecord(record) 逐条接收，断线后自动重连并恢复订阅
+function openQuoteSocket(onRecord) {
+    const subscriptions = new Map();
+    let socket = null;
+
+    function send(message) {
+        if (socket && socket.readyState === WebSocket.OPEN) {
+            socket.send(JSON.stringify(message));
+        }
+    }
+
+    function connect() {
+        const scheme = location.protocol === 'https:' ? 'wss://' : 'ws://';
+        socket = new WebSocket(scheme + location.host + '/api/ws');
+        socket.binaryType = 'arraybuffer';
+        socket.onopen = () => {
+            subscriptions.forEach((channels, symbol) => {
+                send({ op: 'subscribe', symbols: [symbol], channels: channels });
+            });
+        };
+        socket.onmessage = event => {
+            if (typeof event.data === 'string') {
+                return;
+            }
+            decodeQuoteBatch(event.data).forEach(onRecord);
+        };
+        socket.onclose = () => setTimeout(connect, 3000);
+    }
+
+    connect();
+    return {
+        subscribe(symbols, channels) {
+            channels = channels || QUOTE_CHANNELS;
+            symbols.forEach(symbol => subscriptions.set(symbol.toUpperCase(), channels));
+            send({ op: 'subscribe', symbols: symbols, channels: channels });
+        },
+        unsubscribe(symbols) {
+            symbols.forEach(symbol => subscriptions.delete(symbol.toUpperCase()));
+            send({ op: 'unsubscribe', symbols: symbols });
+        }
+    };
+}
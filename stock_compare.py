@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+多股票对比
+把几只股票的收盘价对齐到共同的交易日，一次矩阵运算得到:
+- 归一化走势（首日 = 100）
+- 相对强弱（相对基准股票的比值，100 表示与基准同步）
+- 日收益率的两两相关系数、区间涨跌幅、年化波动率、最大回撤、相对基准的 Beta
+
+一个请求返回全部结果，日期只输出一次，各序列为对齐后的数组
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from chart_downsample import MIN_POINTS, lttb_indices
+
+MAX_COMPARE = int(os.environ.get('STOCK_COMPARE_LIMIT', 10))
+PERIODS_PER_YEAR = 252
+
+
+def parse_compare_symbols(value):
+    """symbols 参数：列表或逗号分隔的字符串，至少 2 只"""
+    if value is not None and not isinstance(value, (list, str)):
+        raise ValueError("symbols 必须是股票代码列表或逗号分隔的字符串")
+    if isinstance(value, str):
+        value = value.split(',')
+    symbols = []
+    for symbol in value or []:
+        symbol = str(symbol).strip().upper()
+        if not symbol:
+            continue
+        if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+            raise ValueError(f"无效的股票代码格式: {symbol}")
+        if symbol not in symbols:
+            symbols.append(symbol)
+    if len(symbols) < 2:
+        raise ValueError("请至少提供 2 只股票，如 symbols=AAPL,MSFT")
+    if len(symbols) > MAX_COMPARE:
+        raise ValueError(f"一次最多对比 {MAX_COMPARE} 只股票")
+    return symbols
+
+
+def fetch_error(symbol, error):
+    """某只股票行情获取失败时的 (错误信息, 状态码)：代码无效或无数据为 404，上游故障为 502"""
+    status = 404 if isinstance(error, ValueError) else 502
+    return {'error': f"{symbol} 行情获取失败: {error}", 'symbol': symbol}, status
+
+
+def parse_benchmark(value, symbols):
+    """基准股票，默认第一只"""
+    benchmark = (value or symbols[0]).strip().upper()
+    if benchmark not in symbols:
+        raise ValueError(f"基准 {benchmark} 不在对比列表中")
+    return benchmark
+
+
+def align_closes(frames):
+    """{代码: 行情} -> 共同交易日上的收盘价表（行为日期，列为代码）
+
+    不同交易所的时间戳时区不同，先统一为不带时区的日期再取交集
+    """
+    columns = {}
+    for symbol, df in frames.items():
+        close = df['Close'].astype(float)
+        index = pd.DatetimeIndex(close.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        close.index = index.normalize()
+        columns[symbol] = close[~close.index.duplicated(keep='last')]
+    closes = pd.concat(columns, axis=1, join='inner').dropna()
+    closes = closes[(closes > 0).all(axis=1)]
+    if len(closes) < 2:
+        raise ValueError("这些股票在所选周期内没有足够的共同交易日")
+    return closes
+
+
+def sample_indices(series, max_points):
+    """多条序列共用的降采样下标：每条序列按 LTTB 分到的点数选点后取并集（保留各自的高低点）"""
+    length = series.shape[0]
+    if not max_points or length <= max_points:
+        return np.arange(length)
+    budget = max(MIN_POINTS, max_points // series.shape[1])
+    chosen = set()
+    for column in series.T:
+        chosen.update(lttb_indices(column, budget).tolist())
+    return np.array(sorted(chosen))
+
+
+def _rounded(matrix, digits):
+    """数组 -> 列表（NaN -> None）"""
+    values = np.round(matrix, digits).tolist()
+    if np.isnan(matrix).any():
+        values = [None if v != v else v for v in values] if matrix.ndim == 1 else \
+            [[None if v != v else v for v in row] for row in values]
+    return values
+
+
+def compare_frames(frames, benchmark=None, max_points=None):
+    """对齐并计算对比结果（frames 的顺序即输出顺序）"""
+    symbols = list(frames)
+    benchmark = benchmark or symbols[0]
+    closes = align_closes(frames)
+    prices = closes.to_numpy()
+    b = symbols.index(benchmark)
+
+    rebased = prices / prices[0] * 100
+    relative = rebased / rebased[:, [b]] * 100
+    returns = prices[1:] / prices[:-1] - 1
+    # 收益率的协方差矩阵一次算出相关系数和 Beta
+    covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    std = np.sqrt(np.diag(covariance))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / np.outer(std, std)
+        beta = covariance[:, b] / covariance[b, b]
+    drawdown = (prices / np.maximum.accumulate(prices, axis=0) - 1).min(axis=0)
+    volatility = returns.std(axis=0, ddof=1) * np.sqrt(PERIODS_PER_YEAR)
+    total = rebased[-1] - 100
+
+    stats = {}
+    for i, symbol in enumerate(symbols):
+        stats[symbol] = {
+            'return': round(float(total[i]), 2),
+            'excess_return': round(float(relative[-1, i] - 100), 2),
+            'volatility': round(float(volatility[i] * 100), 2),
+            'max_drawdown': round(float(drawdown[i] * 100), 2),
+            'beta': None if np.isnan(beta[i]) else round(float(beta[i]), 3),
+            'correlation': None if np.isnan(correlation[i, b]) else round(float(correlation[i, b]), 3),
+        }
+    ranking = [symbols[i] for i in np.argsort(-total, kind='stable')]
+
+    keep = sample_indices(rebased, max_points)
+    dates = closes.index[keep].strftime('%Y-%m-%d').tolist()
+    return {
+        'symbols': symbols,
+        'benchmark': benchmark,
+        'start': dates[0],
+        'end': dates[-1],
+        'points': len(dates),
+        'total_points': len(closes),
+        'dates': dates,
+        'rebased': {symbol: _rounded(rebased[keep, i], 2) for i, symbol in enumerate(symbols)},
+        'relative': {symbol: _rounded(relative[keep, i], 2) for i, symbol in enumerate(symbols)},
+        'correlation': _rounded(correlation, 3),
+        'stats': stats,
+        'ranking': ranking,
+    }
@@ -59,6 +59,13 @@ def get_basic_info(symbol="300809"):
             print(f"  涨跌幅: {stock_info['涨跌幅'].iloc[0]}%")
             print(f"  成交量: {stock_info['成交量'].iloc[0]}")
             print(f"  成交额: {stock_info['成交额'].iloc[0]}")
+            # 同一份全市场快照顺便计算市场宽度，作为个股表现的背景
+            from market_breadth import compute_breadth, panel_for
+            summary, sectors = compute_breadth(df, panel_for('akshare'))
+            print("市场宽度:")
+            print(f"  上涨 {summary['advancers']} / 下跌 {summary['decliners']} / 平盘 {summary['unchanged']}")
+            print(f"  涨停 {summary['limit_up']} / 跌停 {summary['limit_down']}")
+            print(f"  涨跌幅中位数: {summary['median_change']}%")
             return stock_info
         else:
             print("未找到该股票")
@@ -8,6 +8,7 @@ import schedule
 import time
 from datetime import datetime
 from financial_analyzer import StockAnalyzer
+from portfolio_correlation import RollingCorrelation
 import pandas as pd
 
 class StockMonitor:
@@ -17,6 +18,8 @@ class StockMonitor:
         self.config_file = config_file
         self.stocks = self.load_config()
         self.analysis_history = {}
+        self.price_history = {}
+        self.correlation = None
         
     def load_config(self):
         """加载监控配置"""
@@ -51,6 +54,7 @@ class StockMonitor:
         analyzer = StockAnalyzer(symbol)
         
         if analyzer.fetch_data(start_date="2024-01-01"):
+            self.price_history[symbol] = analyzer.data['收盘']
             analyzer.calculate_technical_indicators()
             
             # 执行分析
@@ -139,10 +143,46 @@ class StockMonitor:
                     sr = analysis['support_resistance']
                     print(f"   支撑/阻力: {sr['support_level']:.2f} / {sr['resistance_level']:.2f}")
         
+        self.analyze_portfolio()
+        
         print("\n" + "="*70)
         print("日报生成完成")
         print("="*70)
     
+    def analyze_portfolio(self, window=None, threshold=0.7):
+        """组合相关性分析
+
+        相关矩阵在多次日报之间保留，只用新增K线增量更新
+        """
+        if len(self.price_history) < 2:
+            return None
+        
+        if window is None:
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    window = json.load(f).get('correlation_window', 60)
+            except FileNotFoundError:
+                window = 60
+        
+        prices = pd.DataFrame(self.price_history)
+        symbols = list(prices.columns)
+        if self.correlation is None or self.correlation.symbols != symbols or self.correlation.window != window:
+            self.correlation = RollingCorrelation(symbols, window=window)
+        new_bars = self.correlation.sync(prices)
+        
+        summary = self.correlation.summary(threshold=threshold)
+        div = summary['diversification']
+        
+        print(f"\n🔗 组合相关性 (窗口{div['observations']}日, 更新{new_bars}根K线)")
+        print(f"   平均相关系数: {div['avg_correlation']:.2f}")
+        print(f"   组合年化波动: {div['portfolio_volatility']:.1f}%")
+        if div['diversification_ratio'] is not None:
+            print(f"   分散化比率: {div['diversification_ratio']:.2f} | 有效独立持仓: {div['effective_bets']:.1f}")
+        for cluster in summary['clusters']:
+            print(f"   ⚠️ 高联动板块: {', '.join(cluster['symbols'])} (平均相关 {cluster['avg_correlation']:.2f})")
+        
+        return summary
+    
     def run_monitoring(self, interval_minutes=60):
         """运行监控"""
         print(f"启动股票监控系统 (每{interval_minutes}分钟分析一次)")
@@ -194,6 +234,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='股票监控系统')
     parser.add_argument('--run', action='store_true', help='运行监控')
     parser.add_argument('--report', action='store_true', help='生成日报')
+    parser.add_argument('--portfolio', action='store_true', help='组合相关性分析')
     parser.add_argument('--add', nargs=2, metavar=('SYMBOL', 'NAME'), help='添加股票')
     parser.add_argument('--interval', type=int, default=60, help='分析间隔(分钟)')
     
@@ -208,6 +249,14 @@ if __name__ == "__main__":
     elif args.report:
         monitor.generate_daily_report()
     
+    elif args.portfolio:
+        for stock in monitor.stocks:
+            analyzer = StockAnalyzer(stock['symbol'])
+            if analyzer.fetch_data(start_date="2024-01-01"):
+                monitor.price_history[stock['symbol']] = analyzer.data['收盘']
+        if monitor.analyze_portfolio() is None:
+            print("监控列表至少需要两只股票才能做相关性分析")
+    
     elif args.run:
         monitor.run_monitoring(interval_minutes=args.interval)
     
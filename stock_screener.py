@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+全市场选股
+预先把整个股票池的最新指标与基本面整理成列式面板（每个字段一个 numpy 数组），
+筛选条件编译成对整列数组的向量运算，全市场筛选一次只需几毫秒
+
+条件写法与 Python 表达式相同（字段名不区分大小写，支持部分中文别名）:
+    ma5 > ma20 > ma60 and rsi < 30 and pe < 20
+    (change > 5 or vol_ratio > 3) and industry in ('半导体', '消费电子')
+    contains(name, '银行') and pb < 1 and 市值 > 500
+
+- 只允许白名单内的语法（比较、算术、and/or/not、in、少数函数），不执行任意代码
+- 面板文件由 build 命令生成（np.savez_compressed），修改后自动重新加载；
+  文件不存在时用联想索引中的股票和离线数据（fake_provider）生成示例面板
+
+用法:
+    python stock_screener.py build --akshare                    # 沪深京 A 股（需要 akshare）
+    python stock_screener.py build --sample --universe 5000      # 离线示例面板
+    python stock_screener.py run "ma5 > ma20 > ma60 and rsi < 30 and pe < 20" --sort change
+    python stock_screener.py fields
+"""
+
+import argparse
+import ast
+import os
+import re
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+DEFAULT_PATH = os.environ.get(
+    'STOCK_PANEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_panel.npz'))
+# 计算指标使用的K线数（52 周高低点需要约 250 根）
+HISTORY_BARS = 260
+MAX_EXPRESSION = 500
+MAX_NODES = 200
+MAX_RESULTS = 500
+DEFAULT_LIMIT = 50
+
+# 数值字段及说明
+NUMERIC_FIELDS = {
+    'close': '最新价',
+    'change': '当日涨跌幅（%）',
+    'ret5': '5 日涨跌幅（%）',
+    'ret20': '20 日涨跌幅（%）',
+    'ret60': '60 日涨跌幅（%）',
+    'ma5': '5 日均线',
+    'ma10': '10 日均线',
+    'ma20': '20 日均线',
+    'ma60': '60 日均线',
+    'rsi': 'RSI(14)',
+    'macd': 'MACD',
+    'macd_signal': 'MACD 信号线',
+    'macd_hist': 'MACD 柱（MACD - 信号线）',
+    'bb_upper': '布林带上轨',
+    'bb_lower': '布林带下轨',
+    'volume': '成交量',
+    'vol_ratio': '量比（成交量 / 20 日均量）',
+    'high_52w': '52 周最高价',
+    'low_52w': '52 周最低价',
+    'pe': '市盈率（动态）',
+    'pb': '市净率',
+    'market_cap': '总市值（亿元）',
+    'turnover': '换手率（%）',
+}
+TEXT_FIELDS = {
+    'symbol': '代码',
+    'name': '名称',
+    'market': '市场（SS / SZ / BJ / US）',
+    'industry': '行业',
+}
+ALIASES = {
+    '收盘价': 'close', '最新价': 'close', '涨跌幅': 'change', '均线5': 'ma5', '均线20': 'ma20',
+    '均线60': 'ma60', '成交量': 'volume', '量比': 'vol_ratio', '市盈率': 'pe', '市净率': 'pb',
+    '市值': 'market_cap', '总市值': 'market_cap', '换手率': 'turnover',
+    '代码': 'symbol', '名称': 'name', '市场': 'market', '行业': 'industry',
+}
+# 结果中总是包含的字段
+BASE_COLUMNS = ['symbol', 'name', 'industry', 'close', 'change']
+SAMPLE_INDUSTRIES = ['银行', '证券', '保险', '白酒', '医药', '半导体', '消费电子', '汽车', '新能源',
+                     '电力设备', '有色金属', '化工', '房地产', '软件', '通信', '机械设备']
+
+
+# ==================== 面板 ====================
+
+def compute_indicators(close, volume):
+    """按列计算指标：close / volume 为 K线数 × 股票数 的 DataFrame（右对齐，较短的历史在上方补 NaN）"""
+    last = close.iloc[-1]
+
+    def pct(bars):
+        return (last / close.shift(bars).iloc[-1] - 1) * 100
+
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rsi = 100 - 100 / (1 + gain.iloc[-1] / loss.iloc[-1])
+    middle = close.rolling(window=20).mean().iloc[-1]
+    std = close.rolling(window=20).std().iloc[-1]
+    macd = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    signal = macd.ewm(span=9, adjust=False).mean()
+    recent = close.iloc[-250:]
+    return {
+        'close': last,
+        'change': pct(1),
+        'ret5': pct(5),
+        'ret20': pct(20),
+        'ret60': pct(60),
+        'ma5': close.iloc[-5:].mean(skipna=False),
+        'ma10': close.iloc[-10:].mean(skipna=False),
+        'ma20': middle,
+        'ma60': close.iloc[-60:].mean(skipna=False),
+        'rsi': rsi,
+        'macd': macd.iloc[-1],
+        'macd_signal': signal.iloc[-1],
+        'macd_hist': macd.iloc[-1] - signal.iloc[-1],
+        'bb_upper': middle + std * 2,
+        'bb_lower': middle - std * 2,
+        'volume': volume.iloc[-1],
+        'vol_ratio': volume.iloc[-1] / volume.iloc[-20:].mean(skipna=False),
+        'high_52w': recent.max(),
+        'low_52w': recent.min(),
+    }
+
+
+def right_align(series_list, bars=HISTORY_BARS):
+    """各股票最近 bars 根K线右对齐成矩阵（按K线而不是日期对齐，停牌不会产生空洞）"""
+    matrix = np.full((bars, len(series_list)), np.nan)
+    for j, values in enumerate(series_list):
+        values = np.asarray(values, dtype=float)[-bars:]
+        if len(values):
+            matrix[-len(values):, j] = values
+    return pd.DataFrame(matrix)
+
+
+class MarketPanel:
+    """全市场列式面板：columns 中每个字段是长度为股票数的数组"""
+
+    def __init__(self, columns, date, source):
+        self.columns = columns
+        self.date = date
+        self.source = source
+        self.size = len(columns['symbol'])
+
+    @classmethod
+    def from_history(cls, entries, histories, fundamentals, date, source):
+        """entries: [(代码, 名称, 市场, 行业)]；histories: 与之对应的 (收盘价, 成交量) 数组；
+        fundamentals: {字段: 数组}（pe / pb / market_cap / turnover，缺失时为 NaN）"""
+        close = right_align([h[0] for h in histories])
+        volume = right_align([h[1] for h in histories])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            indicators = compute_indicators(close, volume)
+        columns = {
+            'symbol': np.array([e[0] for e in entries], dtype=str),
+            'name': np.array([e[1] for e in entries], dtype=str),
+            'market': np.array([e[2] for e in entries], dtype=str),
+            'industry': np.array([e[3] for e in entries], dtype=str),
+        }
+        for field in NUMERIC_FIELDS:
+            values = indicators[field] if field in indicators else fundamentals.get(field)
+            if values is None:
+                values = np.full(len(entries), np.nan)
+            columns[field] = np.asarray(values, dtype=float)
+        return cls(columns, date, source)
+
+    def save(self, path=DEFAULT_PATH):
+        np.savez_compressed(path, _date=np.array(self.date), _source=np.array(self.source), **self.columns)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            columns = {key: data[key] for key in data.files if not key.startswith('_')}
+            return cls(columns, str(data['_date']), str(data['_source']))
+
+
+def sample_panel(entries, universe=0):
+    """离线示例面板：行情来自 fake_provider，基本面按代码生成（结果可重复）"""
+    from fake_provider import fake_history
+    entries = [(e[0], e[1], e[2]) for e in entries if e[2] in ('SS', 'SZ', 'BJ', 'US')]
+    for i in range(universe):
+        code = f"{600000 + i if i % 2 == 0 else i:06d}"
+        entries.append((f"{code}.{'SS' if code[0] == '6' else 'SZ'}", f"样本{i:04d}", 'SS' if code[0] == '6' else 'SZ'))
+    entries = list({e[0]: e for e in entries}.values())
+    rows, histories = [], []
+    pe, pb, cap, turnover = [], [], [], []
+    for symbol, name, market in entries:
+        df = fake_history(symbol, 'max')
+        histories.append((df['Close'].to_numpy()[-HISTORY_BARS:], df['Volume'].to_numpy()[-HISTORY_BARS:]))
+        seed = zlib.crc32(symbol.encode('utf-8'))
+        rng = np.random.default_rng(seed)
+        rows.append((symbol, name, market, SAMPLE_INDUSTRIES[seed % len(SAMPLE_INDUSTRIES)]))
+        pe.append(rng.uniform(-20, 80))
+        pb.append(rng.uniform(0.5, 10))
+        cap.append(rng.lognormal(4.5, 1.2))
+        turnover.append(rng.uniform(0.2, 15))
+    fundamentals = {'pe': pe, 'pb': pb, 'market_cap': cap, 'turnover': turnover}
+    date = df.index[-1].strftime('%Y-%m-%d')
+    return MarketPanel.from_history(rows, histories, fundamentals, date, 'sample')
+
+
+def akshare_panel(workers=8, limit=None):
+    """沪深京 A 股面板（需要 akshare）：实时行情快照提供基本面，逐只获取日线计算指标"""
+    import akshare as ak
+    from symbol_index import a_share_symbol, get_index
+    spot = ak.stock_zh_a_spot_em()
+    if limit:
+        spot = spot.head(limit)
+    industries = read_akshare_industries()
+    codes = spot['代码'].astype(str).str.zfill(6).tolist()
+    start = (datetime.now() - timedelta(days=HISTORY_BARS * 2)).strftime('%Y%m%d')
+
+    def history(code):
+        try:
+            df = ak.stock_zh_a_hist(symbol=code, period='daily', start_date=start, adjust='qfq')
+            return df['收盘'].to_numpy(dtype=float), df['成交量'].to_numpy(dtype=float)
+        except Exception:
+            return np.array([]), np.array([])
+
+    print(f"📈 获取 {len(codes)} 只股票的日线（{workers} 个线程）...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        histories = list(pool.map(history, codes))
+    rows = []
+    index = get_index()
+    for code, name in zip(codes, spot['名称'].astype(str)):
+        try:
+            # 交易所以联想索引（各交易所代码表）为准，索引中没有的才按代码段推断
+            symbol, market = a_share_symbol(code, index.a_share_market(code))
+        except ValueError:
+            symbol, market = code, ''
+        rows.append((symbol, name.replace(' ', ''), market, industries.get(code, '')))
+    fundamentals = {
+        'pe': pd.to_numeric(spot['市盈率-动态'], errors='coerce').to_numpy(),
+        'pb': pd.to_numeric(spot['市净率'], errors='coerce').to_numpy(),
+        'market_cap': pd.to_numeric(spot['总市值'], errors='coerce').to_numpy() / 1e8,
+        'turnover': pd.to_numeric(spot['换手率'], errors='coerce').to_numpy(),
+    }
+    return MarketPanel.from_history(rows, histories, fundamentals, datetime.now().strftime('%Y-%m-%d'), 'akshare')
+
+
+def read_akshare_industries():
+    """行业分类 {6 位代码: 行业名}（东方财富行业板块）"""
+    import akshare as ak
+    mapping = {}
+    for board in ak.stock_board_industry_name_em()['板块名称']:
+        try:
+            members = ak.stock_board_industry_cons_em(symbol=board)
+        except Exception:
+            continue
+        for code in members['代码'].astype(str):
+            mapping.setdefault(code.zfill(6), board)
+    return mapping
+
+
+_panel = None
+_panel_mtime = None
+_panel_lock = threading.Lock()
+
+
+def get_panel(path=None):
+    """进程内共享的面板；文件更新后下次调用时重新加载"""
+    global _panel, _panel_mtime
+    path = path or DEFAULT_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    with _panel_lock:
+        if _panel is None or mtime != _panel_mtime:
+            started = time.perf_counter()
+            if mtime is None:
+                from symbol_index import get_index
+                print(f"⚠️  未找到选股面板文件 {path}，使用离线示例数据（结果中 source 为 sample）")
+                print("   生成面板: python stock_screener.py build --akshare")
+                _panel = sample_panel(get_index().entries)
+            else:
+                _panel = MarketPanel.load(path)
+            _panel_mtime = mtime
+            print(f"🧮 选股面板已加载: {_panel.size} 只（{_panel.source}, {_panel.date}）, "
+                  f"用时 {time.perf_counter() - started:.2f}s")
+        return _panel
+
+
+# ==================== 条件编译 ====================
+
+class _Compiler:
+    """把表达式语法树编译成 (函数, 类型)；函数接收字段字典、返回数组或标量，类型为 num / bool / text"""
+
+    COMPARE = {ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+               ast.Eq: np.equal, ast.NotEq: np.not_equal}
+    ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.true_divide,
+                  ast.Mod: np.mod, ast.Pow: np.power}
+
+    def __init__(self):
+        self.fields = []
+        self.nodes = 0
+
+    def field(self, name):
+        key = ALIASES.get(name, name.lower())
+        if key not in NUMERIC_FIELDS and key not in TEXT_FIELDS:
+            raise ValueError(f"未知字段: {name}（可用字段见 python stock_screener.py fields）")
+        if key not in self.fields:
+            self.fields.append(key)
+        return key
+
+    def compile(self, node):
+        self.nodes += 1
+        if self.nodes > MAX_NODES:
+            raise ValueError("筛选条件过于复杂")
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method is None:
+            raise ValueError(f"不支持的语法: {type(node).__name__}")
+        return method(node)
+
+    def expect(self, node, kind, message):
+        func, actual = self.compile(node)
+        if actual != kind:
+            raise ValueError(message)
+        return func
+
+    def visit_Constant(self, node):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"不支持的常量: {value!r}")
+        if isinstance(value, str):
+            return (lambda cols: value), 'text'
+        # 数值常量统一为 float64：整数常量参与 np.power 等运算时不会按 int64 溢出
+        try:
+            value = np.float64(value)
+        except OverflowError:
+            raise ValueError("数值常量超出范围")
+        return (lambda cols: value), 'num'
+
+    def visit_Name(self, node):
+        key = self.field(node.id)
+        return (lambda cols: cols[key]), ('text' if key in TEXT_FIELDS else 'num')
+
+    def visit_BoolOp(self, node):
+        parts = [self.expect(v, 'bool', "and / or 两边必须是条件") for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def run(cols):
+            result = parts[0](cols)
+            for part in parts[1:]:
+                result = combine(result, part(cols))
+            return result
+        return run, 'bool'
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            operand = self.expect(node.operand, 'bool', "not 后面必须是条件")
+            return (lambda cols: np.logical_not(operand(cols))), 'bool'
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.expect(node.operand, 'num', "正负号只能用于数值")
+            if isinstance(node.op, ast.UAdd):
+                return operand, 'num'
+            return (lambda cols: np.negative(operand(cols))), 'num'
+        raise ValueError(f"不支持的运算: {type(node.op).__name__}")
+
+    def visit_BinOp(self, node):
+        op = self.ARITHMETIC.get(type(node.op))
+        if op is None:
+            raise ValueError(f"不支持的运算: {type(node.op).__name__}")
+        left = self.expect(node.left, 'num', "算术运算只能用于数值字段")
+        right = self.expect(node.right, 'num', "算术运算只能用于数值字段")
+        return (lambda cols: op(left(cols), right(cols))), 'num'
+
+    def visit_Compare(self, node):
+        # 链式比较 a > b > c 拆成 a > b and b > c
+        parts = []
+        left_node = node.left
+        for op, right_node in zip(node.ops, node.comparators):
+            parts.append(self.comparison(left_node, op, right_node))
+            left_node = right_node
+        if len(parts) == 1:
+            return parts[0], 'bool'
+
+        def run(cols):
+            result = parts[0](cols)
+            for part in parts[1:]:
+                result = np.logical_and(result, part(cols))
+            return result
+        return run, 'bool'
+
+    def comparison(self, left_node, op, right_node):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(right_node, (ast.Tuple, ast.List, ast.Set)):
+                raise ValueError("in 后面必须是列表，如 industry in ('银行', '保险')")
+            left, kind = self.compile(left_node)
+            values = []
+            for element in right_node.elts:
+                func, element_kind = self.compile(element)
+                if not isinstance(element, ast.Constant) or element_kind != kind:
+                    raise ValueError("in 列表中只能是与字段同类型的常量")
+                values.append(element.value)
+            invert = isinstance(op, ast.NotIn)
+            return lambda cols: np.isin(left(cols), values, invert=invert)
+        compare = self.COMPARE.get(type(op))
+        if compare is None:
+            raise ValueError(f"不支持的比较: {type(op).__name__}")
+        left, left_kind = self.compile(left_node)
+        right, right_kind = self.compile(right_node)
+        if left_kind != right_kind or left_kind == 'bool':
+            raise ValueError("比较的两边类型不一致（文本只能与文本比较）")
+        if left_kind == 'text' and compare not in (np.equal, np.not_equal):
+            raise ValueError("文本字段只能用 == / != / in 比较")
+        return lambda cols: compare(left(cols), right(cols))
+
+    def visit_Call(self, node):
+        name = node.func.id.lower() if isinstance(node.func, ast.Name) else None
+        if node.keywords or name not in ('abs', 'min', 'max', 'log', 'contains'):
+            raise ValueError("只支持函数 abs / min / max / log / contains")
+        if name == 'contains':
+            if len(node.args) != 2 or not isinstance(node.args[1], ast.Constant):
+                raise ValueError("contains 的用法: contains(name, '银行')")
+            text = self.expect(node.args[0], 'text', "contains 的第一个参数必须是文本字段")
+            needle = self.expect(node.args[1], 'text', "contains 的第二个参数必须是文本")
+            return (lambda cols: np.char.find(text(cols), needle(cols)) >= 0), 'bool'
+        args = [self.expect(arg, 'num', f"{name} 的参数必须是数值") for arg in node.args]
+        if name in ('abs', 'log'):
+            if len(args) != 1:
+                raise ValueError(f"{name} 只接受一个参数")
+            func = np.abs if name == 'abs' else np.log
+            return (lambda cols: func(args[0](cols))), 'num'
+        if len(args) < 2:
+            raise ValueError(f"{name} 至少需要两个参数")
+        reduce = np.minimum if name == 'min' else np.maximum
+
+        def run(cols):
+            result = args[0](cols)
+            for arg in args[1:]:
+                result = reduce(result, arg(cols))
+            return result
+        return run, 'num'
+
+
+def normalize_expression(text):
+    """兼容常见写法: AND / OR / NOT（大写）、& / | / && / ||（按 and / or 的优先级）、单个 = 表示等于"""
+    text = re.sub(r'\b(AND|OR|NOT)\b', lambda m: m.group(1).lower(), text, flags=re.IGNORECASE)
+    text = re.sub(r'&&?', ' and ', text)
+    text = re.sub(r'\|\|?', ' or ', text)
+    return re.sub(r'(?<![<>=!])=(?!=)', '==', text)
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text, kind='bool'):
+    """编译筛选条件（kind='bool'）或排序表达式（kind='num'），返回 (函数, 引用的字段)；语法错误抛出 ValueError"""
+    text = (text or '').strip()
+    if not text:
+        raise ValueError("请输入筛选条件")
+    if len(text) > MAX_EXPRESSION:
+        raise ValueError(f"筛选条件过长（最多 {MAX_EXPRESSION} 个字符）")
+    try:
+        tree = ast.parse(normalize_expression(text), mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"筛选条件语法错误: {e.msg}")
+    compiler = _Compiler()
+    func, actual = compiler.compile(tree.body)
+    if actual != kind:
+        raise ValueError("筛选条件的结果必须是真/假，如 rsi < 30" if kind == 'bool'
+                         else "排序表达式必须是数值，如 change 或 close / ma20")
+    return func, tuple(compiler.fields)
+
+
+def parse_screen_limit(value):
+    """解析 limit 参数"""
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的 limit: {value}")
+    if not 1 <= limit <= MAX_RESULTS:
+        raise ValueError(f"limit 必须在 1 到 {MAX_RESULTS} 之间")
+    return limit
+
+
+def _cell(value):
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 4)
+    return str(value)
+
+
+def screen(expression, sort=None, descending=True, limit=DEFAULT_LIMIT, panel=None):
+    """全市场筛选，返回可直接输出的结果字典；条件或排序无效时抛出 ValueError"""
+    panel = panel or get_panel()
+    condition, fields = compile_expression(expression)
+    order, sort_fields = compile_expression(sort or 'market_cap', 'num')
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        mask = np.broadcast_to(condition(panel.columns), (panel.size,))
+        matched = np.flatnonzero(mask)
+        keys = np.broadcast_to(np.asarray(order(panel.columns), dtype=float), (panel.size,))[matched]
+    # 排序键为 NaN 的排在最后
+    keys = np.where(np.isnan(keys), -np.inf if descending else np.inf, keys)
+    ranking = np.argsort(-keys if descending else keys, kind='stable')[:limit]
+    selected = matched[ranking]
+    columns = BASE_COLUMNS + [f for f in fields + sort_fields if f not in BASE_COLUMNS]
+    columns = list(dict.fromkeys(columns))
+    results = [{name: _cell(panel.columns[name][i]) for name in columns} for i in selected]
+    return {
+        'expression': expression,
+        'sort': sort or 'market_cap',
+        'order': 'desc' if descending else 'asc',
+        'total': panel.size,
+        'matched': int(len(matched)),
+        'count': len(results),
+        'columns': columns,
+        'results': results,
+        'panel_date': panel.date,
+        'source': panel.source,
+    }
+
+
+def screen_request(params):
+    """解析接口参数（查询字符串或 JSON 正文）并筛选；参数无效时抛出 ValueError"""
+    if not isinstance(params, Mapping):
+        raise ValueError("请求体必须是 JSON 对象")
+    expression = params.get('q') or params.get('expression') or ''
+    order = (params.get('order') or 'desc').lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError("order 只能是 asc 或 desc")
+    return screen(expression, params.get('sort') or None, order == 'desc', parse_screen_limit(params.get('limit')))
+
+
+# ==================== 命令行 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description='全市场选股')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='生成面板文件')
+    build.add_argument('--akshare', action='store_true', help='沪深京 A 股（需要 akshare）')
+    build.add_argument('--sample', action='store_true', help='离线示例数据')
+    build.add_argument('--universe', type=int, default=0, help='示例面板额外生成的股票数')
+    build.add_argument('--limit', type=int, help='只取前 N 只（测试用）')
+    build.add_argument('--workers', type=int, default=8, help='获取日线的线程数')
+    build.add_argument('-o', '--output', default=DEFAULT_PATH)
+
+    run = sub.add_parser('run', help='执行筛选')
+    run.add_argument('expression')
+    run.add_argument('--sort', help='排序字段或表达式，默认 market_cap')
+    run.add_argument('--asc', action='store_true', help='升序')
+    run.add_argument('-n', '--limit', type=int, default=DEFAULT_LIMIT)
+    run.add_argument('-p', '--panel', default=DEFAULT_PATH)
+
+    sub.add_parser('fields', help='列出可用字段')
+    args = parser.parse_args()
+
+    if args.command == 'fields':
+        for name, text in list(TEXT_FIELDS.items()) + list(NUMERIC_FIELDS.items()):
+            print(f"{name:<12} {text}")
+        aliases = ', '.join(f"{alias}={name}" for alias, name in ALIASES.items())
+        print(f"\n中文别名: {aliases}")
+        print("函数: abs(x) / min(a, b, ...) / max(a, b, ...) / log(x) / contains(name, '文本')")
+        return
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        if args.akshare:
+            panel = akshare_panel(args.workers, args.limit)
+        else:
+            from symbol_index import get_index
+            panel = sample_panel(get_index().entries, args.universe)
+        panel.save(args.output)
+        print(f"✅ 已生成面板: {args.output}（{panel.size} 只, {panel.source}, "
+              f"{os.path.getsize(args.output) / 1024:.0f} KB, 用时 {time.perf_counter() - started:.1f}s）")
+        return
+
+    panel = get_panel(args.panel)
+    started = time.perf_counter()
+    try:
+        result = screen(args.expression, args.sort, not args.asc, args.limit, panel)
+    except ValueError as e:
+        parser.error(str(e))
+    elapsed = (time.perf_counter() - started) * 1000
+    columns = result['columns']
+    print('  '.join(f"{c:>12}" for c in columns))
+    for row in result['results']:
+        print('  '.join(f"{'-' if row[c] is None else row[c]!s:>12}" for c in columns))
+    print(f"\n🔍 {result['matched']} / {result['total']} 只符合条件（面板 {result['panel_date']}, "
+          f"{result['source']}）, 用时 {elapsed:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,34 @@
 基于Flask的Web界面，提供股票分析功能
 """
 
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
-import yfinance as yf
 from datetime import datetime, timedelta
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from timeframe_resampler import TimeframeResampler, parse_timeframes
+from compact_storage import compact_frame
+from chart_payload import CHART_MIME, wants_binary, encode_chart_payload
+from chart_downsample import downsample_frame, parse_max_points
+from chart_delta import delta_start, parse_since, parse_version, update_info
+from quote_stream import StreamHub, parse_symbols
+from chart_render import chart_png, parse_size
+from fake_provider import PROVIDER, ticker_class
+from quote_socket import init_websocket
+from trending_snapshot import TrendingRefresher
+from market_breadth import get_breadth
+from stock_compare import compare_frames, fetch_error, parse_benchmark, parse_compare_symbols
+from admission import Overloaded, admission, client_key, is_cached
+from symbol_index import get_index, parse_limit
+from stock_screener import screen_request
+from fast_json import dumps, init_json
+from metrics import cache_lookup, init_metrics, record_upstream, stage, timed_stage
+from http_cache import (PrecompressedPage, frame_digest, init_compression, is_fresh,
+                        json_response, make_etag, not_modified, with_etag)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -19,51 +39,96 @@ app = Flask(__name__,
             static_folder='static',
             template_folder='templates')
 CORS(app)
+init_json(app)
+init_metrics(app)
+init_compression(app)
 
 class StockAnalyzer:
     """股票分析器核心类"""
     
-    def __init__(self):
+    def __init__(self, compact=None):
         self.cache = {}
+        self.resampler = TimeframeResampler()
+        # 紧凑存储模式：缓存中的行情降为 float32/int32，可用环境变量 STOCK_COMPACT_CACHE=1 开启
+        if compact is None:
+            compact = os.environ.get('STOCK_COMPACT_CACHE') == '1'
+        self.compact = compact
         
-    def get_stock_data(self, symbol, period="1mo", use_cache=True):
-        """获取股票数据"""
+    def get_stock_data(self, symbol, period="1mo", use_cache=True, fallback=True):
+        """获取股票数据
+
+        fallback: 数据源失败时是否改用示例数据；为 False 时直接抛出异常（后台刷新用，避免把示例数据当作行情）
+        """
         # 清理股票代码，移除特殊字符
         symbol = symbol.strip().upper()
         cache_key = f"{symbol}_{period}"
         
-        if use_cache and cache_key in self.cache:
-            print(f"📦 使用缓存数据: {symbol}")
-            return self.cache[cache_key]
+        if use_cache:
+            hit = cache_key in self.cache
+            cache_lookup(hit)
+            if hit:
+                print(f"📦 使用缓存数据: {symbol}")
+                return self.cache[cache_key]
+            # 共享缓存（app_factory）: 其他进程正在获取同一数据时等待其结果，不重复请求上游
+            if hasattr(self.cache, 'claim'):
+                df = self.cache.claim(cache_key)
+                if df is not None:
+                    return df
         
+        try:
+            return self.fetch_stock_data(symbol, period, cache_key, fallback)
+        except Exception:
+            # 获取失败时不会写入缓存，归还加载权，其他请求不必等到租约过期
+            if hasattr(self.cache, 'release'):
+                self.cache.release(cache_key)
+            raise
+    
+    @timed_stage('fetch')
+    def fetch_stock_data(self, symbol, period, cache_key, fallback=True):
+        """从数据源获取并写入缓存，失败时使用示例数据（fallback=False 时抛出异常）"""
         print(f"📈 获取 {symbol} 股票数据 ({period})...")
         try:
-            import time
-            time.sleep(0.5)  # 避免频率限制
+            if PROVIDER != 'fake':
+                time.sleep(0.5)  # 避免频率限制
             
             # 验证股票代码格式（简单验证）
             if not symbol or len(symbol) > 10:
                 raise ValueError(f"无效的股票代码: {symbol}")
             
-            stock = yf.Ticker(symbol)
-            df = stock.history(period=period)
+            started = time.perf_counter()
+            try:
+                stock = ticker_class()(symbol)
+                df = stock.history(period=period)
+            except Exception:
+                record_upstream(PROVIDER, 'error', time.perf_counter() - started)
+                raise
+            record_upstream(PROVIDER, 'empty' if df.empty else 'ok', time.perf_counter() - started)
             
             if df.empty:
+                if not fallback:
+                    raise ValueError(f"未找到 {symbol} 的行情数据")
                 print(f"⚠️  未找到实时数据，使用示例数据")
                 df = self.get_sample_data(symbol)
             else:
                 print(f"✅ 获取成功: {len(df)} 条记录")
             
             # 缓存数据
-            self.cache[cache_key] = df
-            return df
+            return self.store(cache_key, df)
             
         except Exception as e:
             print(f"⚠️  获取实时数据失败: {e}")
+            if not fallback:
+                raise
             print("   使用示例数据...")
             df = self.get_sample_data(symbol)
-            self.cache[cache_key] = df
-            return df
+            return self.store(cache_key, df)
+    
+    def store(self, cache_key, df):
+        """写入缓存（紧凑模式下先降精度）"""
+        if self.compact:
+            df = compact_frame(df)
+        self.cache[cache_key] = df
+        return df
     
     def get_sample_data(self, symbol):
         """生成示例数据"""
@@ -94,6 +159,7 @@ class StockAnalyzer:
         
         return df
     
+    @timed_stage('indicators')
     def calculate_indicators(self, df):
         """计算技术指标"""
         # 移动平均线
@@ -119,13 +185,66 @@ class StockAnalyzer:
         df['MACD'] = exp1 - exp2
         df['MACD_signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
         
+        if self.compact:
+            compact_frame(df, inplace=True)
+        
         return df
     
-    def analyze_stock(self, symbol, period="1mo"):
-        """分析股票"""
+    @timed_stage('analyze_stock')
+    def analyze_stock(self, symbol, period="1mo", timeframes=None, max_points=None,
+                      version=None, since=None):
+        """分析股票
+
+        timeframes: 额外分析的周期，如 ['weekly', 'monthly']，
+        由缓存的日线重采样得到，不会再次请求数据源
+        max_points: 每个图表序列的最大点数，超出时用 LTTB 降采样
+        version/since: 客户端已有数据的版本令牌或最后日期，匹配时只返回新增/变化的K线
+        """
         df = self.get_stock_data(symbol, period)
-        df = self.calculate_indicators(df)
+        return self.analyze_frame(symbol, df, period, timeframes, max_points, version, since)
+    
+    @timed_stage('analyze_frame')
+    def analyze_frame(self, symbol, df, period="1mo", timeframes=None, max_points=None,
+                      version=None, since=None):
+        """对已获取的行情数据计算指标并生成分析结果
+
+        纯计算、不访问数据源（异步模式下在线程池中执行）；
+        指标写在副本上，缓存中的原始数据保持不变
+        """
+        df = self.calculate_indicators(df.copy())
         
+        start = None
+        if version or since:
+            # 降采样后的点与原始K线不一一对应，只在全分辨率图表上做增量
+            if not max_points or len(df) <= max_points:
+                start = delta_start(df, version, since)
+        
+        result = self.summarize(symbol, df, max_points, start)
+        result['update'] = update_info(df, start)
+        
+        if timeframes:
+            cache_key = f"{symbol.strip().upper()}_{period}"
+            result['timeframes'] = {}
+            for timeframe in timeframes:
+                if timeframe == 'daily':
+                    continue
+                tf_df = self.resampler.resample(df, timeframe, key=cache_key)
+                if len(tf_df) < 2:
+                    result['timeframes'][timeframe] = {'error': '数据不足'}
+                    continue
+                tf_df = self.calculate_indicators(tf_df.copy())
+                tf_result = self.summarize(symbol, tf_df, max_points)
+                tf_result.pop('raw_data', None)
+                result['timeframes'][timeframe] = tf_result
+        
+        return result
+    
+    @timed_stage('summarize')
+    def summarize(self, symbol, df, max_points=None, start=None):
+        """根据已计算指标的数据生成分析结论和图表数据
+
+        start: 增量起点，只输出该下标之后的图表数据
+        """
         latest = df.iloc[-1]
         prev = df.iloc[-2] if len(df) > 1 else latest
         
@@ -143,18 +262,22 @@ class StockAnalyzer:
             'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         }
         
-        # 准备图表数据
-        chart_data = {
-            'dates': df.index.strftime('%Y-%m-%d').tolist(),
-            'prices': df['Close'].tolist(),
-            'sma_10': df['SMA_10'].tolist(),
-            'sma_30': df['SMA_30'].tolist(),
-            'rsi': df['RSI'].tolist(),
-            'bb_upper': df['BB_upper'].tolist(),
-            'bb_lower': df['BB_lower'].tolist(),
-            'macd': df['MACD'].tolist(),
-            'macd_signal': df['MACD_signal'].tolist()
+        # 准备图表数据（长序列按 max_points 降采样，各序列共用同一组采样点）
+        chart_df = downsample_frame(df, max_points) if start is None else df.iloc[start:]
+        chart_columns = {
+            'prices': 'Close',
+            'sma_10': 'SMA_10',
+            'sma_30': 'SMA_30',
+            'rsi': 'RSI',
+            'bb_upper': 'BB_upper',
+            'bb_lower': 'BB_lower',
+            'macd': 'MACD',
+            'macd_signal': 'MACD_signal',
+            'volumes': 'Volume'
         }
+        # 直接使用底层数组（JSON 与二进制编码共用），NaN 由序列化器输出为 null
+        chart_data = {'dates': chart_df.index}
+        chart_data.update({name: chart_df[col].to_numpy() for name, col in chart_columns.items()})
         
         return {
             'analysis': analysis,
@@ -179,10 +302,20 @@ POPULAR_STOCKS = [
     {'symbol': 'BTC-USD', 'name': '比特币'}
 ]
 
+# 首页渲染结果按内容缓存（调试模式下模板可能变化，每次重新渲染）
+_index_page = None
+
+def index_page():
+    """渲染并预压缩首页（需要应用上下文）"""
+    global _index_page
+    if _index_page is None or app.debug:
+        _index_page = PrecompressedPage(render_template('index.html', stocks=POPULAR_STOCKS))
+    return _index_page
+
 @app.route('/')
 def index():
     """首页"""
-    return render_template('index.html', stocks=POPULAR_STOCKS)
+    return index_page().respond(request)
 
 @app.route('/api/analyze', methods=['POST'])
 def api_analyze():
@@ -202,9 +335,42 @@ def api_analyze():
         if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
             return jsonify({'error': f'无效的股票代码格式: {symbol}'}), 400
         
-        result = analyzer.analyze_stock(symbol, period)
-        return jsonify(result)
+        try:
+            timeframes = parse_timeframes(data.get('timeframes'))
+            max_points = parse_max_points(data.get('max_points'))
+            version = data.get('version')
+            if version:
+                parse_version(version)
+            since = parse_since(data.get('since'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # 准入控制：缓存未命中的请求走有界的冷队列，满了立即返回 503
+        with admission.admit('analyze', client_key(request), cold=not is_cached(analyzer, symbol, period)):
+            # ETag 由数据状态和响应形态（含增量基准 version/since）共同决定，命中时跳过指标计算
+            binary = wants_binary(request.accept_mimetypes)
+            df = analyzer.get_stock_data(symbol, period)
+            etag = make_etag(frame_digest(df), period, timeframes, max_points, binary,
+                             version, since)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+            
+            # 直接分析上面已获取的数据，不再重复查询缓存
+            result = analyzer.analyze_frame(
+                symbol, df, period, timeframes, max_points=max_points,
+                version=version, since=since
+            )
+            # Accept 协商：二进制格式直接打包数组，否则由 JSON 序列化器直接写出数组
+            with stage('serialize'):
+                if binary:
+                    response = Response(encode_chart_payload(result), mimetype=CHART_MIME)
+                else:
+                    response = jsonify(result)
+        response.headers['Vary'] = 'Accept'
+        return with_etag(response, etag)
         
+    except Overloaded as e:
+        return e.response()
     except Exception as e:
         error_msg = str(e)
         # 提供更友好的错误信息
@@ -212,51 +378,282 @@ def api_analyze():
             error_msg = f'股票代码格式错误: {symbol}，请使用如 AAPL、MSFT 等格式'
         return jsonify({'error': error_msg}), 500
 
+# 服务端图表：模板复用 + 按数据版本和尺寸缓存的 PNG
+@app.route('/api/chart/<symbol>.png')
+def api_chart(symbol):
+    """分析图表图片，如 /api/chart/AAPL.png?period=3mo&width=800&height=500"""
+    symbol = symbol.strip().upper()
+    period = request.args.get('period', '1mo')
+    if len(symbol) > 20 or not any(c.isalnum() for c in symbol):
+        return jsonify({'error': f'无效的股票代码格式: {symbol}'}), 400
+    try:
+        size = parse_size(request.args.get('width'), request.args.get('height'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        with admission.admit('chart', client_key(request), cold=not is_cached(analyzer, symbol, period)):
+            df = analyzer.get_stock_data(symbol, period)
+            version = frame_digest(df)
+            etag = make_etag('png', version, period, size)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+            with stage('render'):
+                png = chart_png(analyzer, symbol, period, size, df, version)
+        return with_etag(Response(png, mimetype='image/png'), etag)
+    except Overloaded as e:
+        return e.response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 实时推送：每只股票一个后台轮询线程，所有连接共享其结果
+stream_hub = StreamHub(analyzer)
+
+@app.route('/api/stream')
+def api_stream():
+    """实时行情推送（Server-Sent Events），如 /api/stream?symbols=AAPL,MSFT"""
+    try:
+        symbols = parse_symbols(request.args.get('symbols'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # 浏览器重连时自动带 Last-Event-ID；也允许用查询参数指定
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(stream_hub.stream(symbols, last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# WebSocket：一个连接多路订阅，二进制消息按周期合并，与 SSE 共用轮询线程
+init_websocket(app, stream_hub)
+
 @app.route('/api/stocks')
 def api_stocks():
     """获取股票列表API"""
-    return jsonify({'stocks': POPULAR_STOCKS})
+    return json_response(request, {'stocks': POPULAR_STOCKS})
+
+# 股票代码联想索引（启动时加载，每次按键只需沿前缀树走几步）
+symbol_index = get_index()
+
+@app.route('/api/symbols/suggest')
+def api_symbols_suggest():
+    """股票代码联想（代码 / 中文名称 / 拼音首字母），如 /api/symbols/suggest?q=hczb"""
+    try:
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    query = request.args.get('q', '')
+    return json_response(request, {'query': query, 'suggestions': symbol_index.suggest(query, limit)})
+
+@app.route('/api/screen', methods=['GET', 'POST'])
+def api_screen():
+    """全市场选股，如 /api/screen?q=ma5>ma20>ma60 and rsi<30 and pe<20&sort=change&limit=50"""
+    params = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    try:
+        with stage('screen'):
+            result = screen_request(params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(request, result)
+
+# 批量分析：共享的有界线程池与单次请求的股票数上限（可用环境变量调整）
+BATCH_CONCURRENCY = int(os.environ.get('STOCK_BATCH_CONCURRENCY', 64))
+BATCH_SYMBOL_LIMIT = int(os.environ.get('STOCK_BATCH_LIMIT', 100))
+NDJSON_MIME = 'application/x-ndjson'
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch')
+
+def analyze_batch_item(symbol, version=None, since=None):
+    """批量分析中的单只股票，出错时返回带 error 的条目"""
+    symbol = symbol.strip().upper()
+    try:
+        result = analyzer.analyze_stock(symbol, version=version, since=since)
+    except Exception as e:
+        return {'symbol': symbol, 'error': str(e)}
+    item = dict(result['analysis'], version=result['update']['version'])
+    if version or since:
+        item['update'] = result['update']
+        item['chart_data'] = result['chart_data']
+    return item
+
+def stream_batch(futures, requested, ticket):
+    """按完成顺序逐行输出结果（NDJSON），最后一行为汇总；输出结束后释放准入名额"""
+    start = time.time()
+    errors = 0
+    try:
+        for future in as_completed(futures):
+            item = dict(future.result(), index=futures[future])
+            errors += 'error' in item
+            yield dumps(item) + b'\n'
+        yield dumps({
+            'done': True,
+            'count': len(futures),
+            'errors': errors,
+            'requested': requested,
+            'limit': BATCH_SYMBOL_LIMIT,
+            'elapsed': round(time.time() - start, 3)
+        }) + b'\n'
+    finally:
+        # 客户端中途断开时取消尚未开始的任务
+        for future in futures:
+            future.cancel()
+        ticket.release()
+
+def parse_batch_request(data):
+    """校验批量分析请求体，返回 (symbols, versions, since)；格式错误时抛出 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    symbols = data.get('symbols') or ['AAPL', 'MSFT', 'GOOGL']
+    if not isinstance(symbols, list) or not all(isinstance(symbol, str) and symbol.strip() for symbol in symbols):
+        raise ValueError("symbols 必须是股票代码字符串列表")
+    # 客户端已有图表的版本令牌 {symbol: version} 或统一的最后日期
+    versions = data.get('versions') or {}
+    if not isinstance(versions, dict):
+        raise ValueError("versions 必须是 {股票代码: 版本令牌} 对象")
+    since = parse_since(data.get('since'))
+    symbols = [symbol.strip().upper() for symbol in symbols]
+    versions = {str(symbol).strip().upper(): version for symbol, version in versions.items()}
+    return symbols, versions, since
 
 @app.route('/api/batch_analyze', methods=['POST'])
 def api_batch_analyze():
-    """批量分析API"""
+    """批量分析API
+
+    各股票在线程池中并发分析；Accept: application/x-ndjson（或 "stream": true）时
+    每完成一只就输出一行 JSON，否则按请求顺序一次性返回
+    """
     try:
-        data = request.json
-        symbols = data.get('symbols', [])
-        
-        if not symbols:
-            symbols = ['AAPL', 'MSFT', 'GOOGL']
-        
-        results = []
-        for symbol in symbols[:5]:  # 最多分析5个
-            try:
-                result = analyzer.analyze_stock(symbol.strip().upper())
-                results.append(result['analysis'])
-            except Exception as e:
-                results.append({
-                    'symbol': symbol,
-                    'error': str(e)
-                })
+        data = request.get_json(silent=True)
+        symbols, versions, since = parse_batch_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        requested = len(symbols)
+        symbols = symbols[:BATCH_SYMBOL_LIMIT]
+        # 整个批次占一个名额，含未缓存股票时走冷队列
+        cold = not all(is_cached(analyzer, symbol) for symbol in symbols)
+        ticket = admission.admit('batch', client_key(request), cold=cold)
+    except Overloaded as e:
+        return e.response()
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    # 流式响应接管名额之前，任何异常都要先归还名额
+    try:
+        futures = {}
+        for index, symbol in enumerate(symbols):
+            version = versions.get(symbol)
+            futures[batch_executor.submit(analyze_batch_item, symbol, version, since)] = index
         
+        streaming = data.get('stream') or request.accept_mimetypes.best_match(
+            ['application/json', NDJSON_MIME]) == NDJSON_MIME
+        if streaming:
+            response = Response(stream_batch(futures, requested, ticket), mimetype=NDJSON_MIME)
+            response.headers['X-Accel-Buffering'] = 'no'
+            # 客户端在开始读取前断开时生成器不会运行，由响应关闭时释放
+            response.call_on_close(ticket.release)
+            return response
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        ticket.release()
+        return jsonify({'error': str(e)}), 500
+    
+    try:
+        with ticket:
+            results = [None] * len(futures)
+            for future, index in futures.items():
+                results[index] = future.result()
         return jsonify({'results': results})
-        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/compare', methods=['GET', 'POST'])
+def api_compare():
+    """多股票对比（归一化走势、相对强弱、相关系数），如 /api/compare?symbols=AAPL,MSFT,NVDA&period=6mo"""
+    params = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    period = params.get('period', '1mo')
+    try:
+        symbols = parse_compare_symbols(params.get('symbols'))
+        benchmark = parse_benchmark(params.get('benchmark'), symbols)
+        max_points = parse_max_points(params.get('max_points'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        cold = not all(is_cached(analyzer, symbol, period) for symbol in symbols)
+        with admission.admit('compare', client_key(request), cold=cold):
+            # 各股票并发获取（已缓存的直接返回）；不用示例数据充当行情，任何一只失败都返回错误
+            futures = [batch_executor.submit(analyzer.get_stock_data, symbol, period, True, False)
+                       for symbol in symbols]
+            frames = {}
+            for symbol, future in zip(symbols, futures):
+                try:
+                    frames[symbol] = future.result()
+                except Exception as e:
+                    payload, status = fetch_error(symbol, e)
+                    return jsonify(payload), status
+            etag = make_etag(*(frame_digest(df) for df in frames.values()), symbols, period, benchmark, max_points)
+            if is_fresh(request, etag):
+                return not_modified(etag)
+            with stage('compare'):
+                result = compare_frames(frames, benchmark, max_points)
+        result['period'] = period
+        return with_etag(jsonify(result), etag)
+    except Overloaded as e:
+        return e.response()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# 热门股票由后台线程定期刷新，接口只返回当前快照
+trending = TrendingRefresher(analyzer)
+# 首个快照尚未生成时最多等待的秒数
+TRENDING_FIRST_WAIT = 10
+
 @app.route('/api/trending')
 def api_trending():
-    """热门股票分析"""
-    symbols = ['AAPL', 'MSFT', 'TSLA', 'NVDA']
-    results = []
-    
-    for symbol in symbols:
-        try:
-            result = analyzer.analyze_stock(symbol)
-            results.append(result['analysis'])
-        except:
-            pass
-    
-    return jsonify({'trending': results})
+    """热门股票分析（后台快照，Age 头为快照年龄）"""
+    snapshot = trending.wait_ready(TRENDING_FIRST_WAIT)
+    if snapshot is None:
+        response = jsonify({'error': '热门股票数据生成中，请稍后重试'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    return snapshot.respond(request)
+
+# 市场宽度与行业热力图：一次下载全市场快照，同一快照只计算一次
+market_breadth = get_breadth()
+
+def current_breadth():
+    """当前市场宽度快照，获取失败时返回 (None, 503 响应)"""
+    try:
+        return market_breadth.current(), None
+    except Exception as e:
+        response = jsonify({'error': f'市场行情快照获取失败: {e}'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return None, response
+
+@app.route('/api/market/breadth')
+def api_market_breadth():
+    """市场宽度（涨跌家数、涨跌停、新高新低、涨跌幅分布）；?symbol=300809 时返回该股票的市场与行业背景"""
+    snapshot, error = current_breadth()
+    if error is not None:
+        return error
+    symbol = request.args.get('symbol', '').strip().upper()
+    if symbol:
+        return json_response(request, snapshot.context(symbol))
+    return snapshot.respond('breadth', request)
+
+@app.route('/api/market/heatmap')
+def api_market_heatmap():
+    """行业热力图（各行业涨跌家数、平均 / 市值加权涨跌幅、领涨股）"""
+    snapshot, error = current_breadth()
+    if error is not None:
+        return error
+    return snapshot.respond('heatmap', request)
 
 # 创建必要的目录
 os.makedirs('static', exist_ok=True)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+支撑阻力位识别模块
+用滚动极值寻找摆动高低点，再把相近的高低点聚类成带权重的价位
+"""
+
+import pandas as pd
+import numpy as np
+from timeframe_resampler import detect_columns
+
+
+class SupportResistanceEngine:
+    """向量化支撑阻力识别器
+
+    window: 摆动点左右各需比较的K线数
+    tolerance: 聚类时相邻高低点的最大相对间距
+    half_life: 权重半衰期（K线数），越近的高低点权重越大
+    """
+
+    def __init__(self, window=5, tolerance=0.015, half_life=120, max_levels=8):
+        self.window = window
+        self.tolerance = tolerance
+        self.half_life = half_life
+        self.max_levels = max_levels
+
+    def find_pivots(self, highs, lows):
+        """识别摆动高点/低点
+
+        highs/lows 为 DataFrame（行=日期，列=股票），整个面板只做一次
+        居中滚动极值，复杂度 O(n)。返回同形状的布尔矩阵。
+        """
+        span = 2 * self.window + 1
+        rolling_max = highs.rolling(span, center=True, min_periods=span).max()
+        rolling_min = lows.rolling(span, center=True, min_periods=span).min()
+        pivot_high = highs.eq(rolling_max) & highs.notna()
+        pivot_low = lows.eq(rolling_min) & lows.notna()
+        return pivot_high, pivot_low
+
+    def cluster_levels(self, prices, ages, dates=None):
+        """把高低点价格聚类为价位
+
+        prices: 高低点价格；ages: 距最新K线的K线数
+        """
+        if len(prices) == 0:
+            return []
+
+        order = np.argsort(prices)
+        prices = prices[order]
+        ages = ages[order]
+        weights = 0.5 ** (ages / self.half_life)
+
+        # 相邻价格间距超过容差即开启新的簇
+        gaps = prices[1:] / prices[:-1] - 1
+        cluster_ids = np.concatenate(([0], np.cumsum(gaps > self.tolerance)))
+        n_clusters = cluster_ids[-1] + 1
+
+        strength = np.bincount(cluster_ids, weights=weights, minlength=n_clusters)
+        weighted_sum = np.bincount(cluster_ids, weights=weights * prices, minlength=n_clusters)
+        touches = np.bincount(cluster_ids, minlength=n_clusters)
+        min_age = np.full(n_clusters, np.inf)
+        np.minimum.at(min_age, cluster_ids, ages)
+
+        levels = []
+        for i in range(n_clusters):
+            level = {
+                'price': float(weighted_sum[i] / strength[i]),
+                'touches': int(touches[i]),
+                'strength': round(float(strength[i]), 4),
+                'bars_since_touch': int(min_age[i]),
+            }
+            if dates is not None:
+                level['last_touch'] = dates[len(dates) - 1 - int(min_age[i])].strftime('%Y-%m-%d')
+            levels.append(level)
+        return levels
+
+    def _summarize(self, levels, current_price):
+        """区分支撑与阻力，并给出最近的两档价位"""
+        supports = sorted(
+            [lv for lv in levels if lv['price'] <= current_price],
+            key=lambda lv: lv['price'], reverse=True
+        )
+        resistances = sorted(
+            [lv for lv in levels if lv['price'] > current_price],
+            key=lambda lv: lv['price']
+        )
+        for lv in supports:
+            lv['type'] = 'support'
+        for lv in resistances:
+            lv['type'] = 'resistance'
+
+        # 只保留强度最高的若干价位，再按距离排序
+        strongest = sorted(supports + resistances, key=lambda lv: lv['strength'], reverse=True)
+        keep = {id(lv) for lv in strongest[:self.max_levels]}
+        supports = [lv for lv in supports if id(lv) in keep]
+        resistances = [lv for lv in resistances if id(lv) in keep]
+
+        return {
+            'current_price': float(current_price),
+            'support': supports[0]['price'] if supports else None,
+            'support_2': supports[1]['price'] if len(supports) > 1 else None,
+            'resistance': resistances[0]['price'] if resistances else None,
+            'resistance_2': resistances[1]['price'] if len(resistances) > 1 else None,
+            'supports': supports,
+            'resistances': resistances,
+        }
+
+    def analyze_panel(self, highs, lows, closes):
+        """对整个价格面板识别支撑阻力
+
+        highs/lows/closes: DataFrame，行为日期、列为股票代码
+        返回 {symbol: 结果}
+        """
+        pivot_high, pivot_low = self.find_pivots(highs, lows)
+        high_values = highs.to_numpy(dtype=float)
+        low_values = lows.to_numpy(dtype=float)
+        ph = pivot_high.to_numpy()
+        pl = pivot_low.to_numpy()
+        dates = highs.index if isinstance(highs.index, pd.DatetimeIndex) else None
+
+        results = {}
+        for j, symbol in enumerate(highs.columns):
+            close_col = closes.iloc[:, j]
+            valid = np.flatnonzero(close_col.notna().to_numpy())
+            if len(valid) == 0:
+                # 字段与正常结果一致（价位为 None、列表为空），调用方可直接按键读取
+                results[symbol] = dict(self._summarize([], np.nan), current_price=None, error='数据不足')
+                continue
+            last = valid[-1]
+
+            rows_h = np.flatnonzero(ph[:, j])
+            rows_l = np.flatnonzero(pl[:, j])
+            prices = np.concatenate((high_values[rows_h, j], low_values[rows_l, j]))
+            ages = (last - np.concatenate((rows_h, rows_l))).astype(float)
+
+            symbol_dates = dates[:last + 1] if dates is not None else None
+            levels = self.cluster_levels(prices, ages, symbol_dates)
+            results[symbol] = self._summarize(levels, close_col.iloc[last])
+        return results
+
+    def analyze(self, df):
+        """单只股票的支撑阻力（兼容中英文列名）"""
+        cols = detect_columns(df)
+        close = df[cols['close']]
+        high = df[cols['high']] if cols['high'] in df.columns else close
+        low = df[cols['low']] if cols['low'] in df.columns else close
+        return self.analyze_panel(high.to_frame('s'), low.to_frame('s'), close.to_frame('s'))['s']
+
+    def analyze_prices(self, prices):
+        """只有收盘价序列时的支撑阻力"""
+        close = pd.DataFrame({'s': np.asarray(prices, dtype=float)})
+        return self.analyze_panel(close, close, close)['s']
+
+    def analyze_batch(self, frames):
+        """批量识别多只股票
+
+        frames: {symbol: DataFrame}，各股票日期可以不一致，
+        先对齐成面板再一次性计算（缺失K线附近不识别摆动点）。
+        """
+        if not frames:
+            return {}
+        highs, lows, closes = {}, {}, {}
+        for symbol, df in frames.items():
+            cols = detect_columns(df)
+            close = df[cols['close']]
+            closes[symbol] = close
+            highs[symbol] = df[cols['high']] if cols['high'] in df.columns else close
+            lows[symbol] = df[cols['low']] if cols['low'] in df.columns else close
+        return self.analyze_panel(
+            pd.DataFrame(highs), pd.DataFrame(lows), pd.DataFrame(closes)
+        )
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+股票代码联想索引
+内存前缀树，支持按代码、中文名称、拼音首字母、英文名联想，如 "hczb" -> 华辰装备 300809.SZ
+
+- 每个节点预先保存该前缀下排名最高的若干结果，查询只需沿输入逐字走到节点（每次按键微秒级）
+- 索引文件为 gzip 压缩的 JSON 条目列表，启动时只加载条目；前缀树按首字符分支在第一次查询到时才建，
+  启动快、内存只用于实际查询过的分支，代价是每个首字符的第一次查询多花几十到几百毫秒
+  （完整建树约 16k 只需要数秒和近百 MB）；文件不存在时使用内置的常用股票
+- A 股的交易所取自 akshare 各交易所的代码表并存入条目（不再按代码首位推断，北交所新代码为 920 开头），
+  沪深补 Yahoo 后缀 .SS / .SZ，可直接用于分析接口；北交所为 .BJ，Yahoo 没有北交所行情，只用于联想
+
+生成完整索引（沪深京 A 股 + 美股）:
+    python symbol_index.py build --akshare --nasdaq nasdaqlisted.txt --nasdaq otherlisted.txt
+    python symbol_index.py build --csv my_symbols.csv -o symbols_index.json.gz
+    python symbol_index.py query hczb
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import re
+import threading
+import time
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+DEFAULT_PATH = os.environ.get(
+    'STOCK_SYMBOL_INDEX', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'symbols_index.json.gz'))
+# 每个节点保留的结果数（也是单次查询的上限）
+MAX_SUGGESTIONS = 20
+DEFAULT_LIMIT = 10
+
+# 内置常用股票: (代码, 名称, 市场, 拼音首字母, 英文名)
+SEED_SYMBOLS = [
+    ('AAPL', '苹果', 'US', 'PG', 'APPLE'),
+    ('MSFT', '微软', 'US', 'WR', 'MICROSOFT'),
+    ('GOOGL', '谷歌', 'US', 'GG', 'ALPHABET'),
+    ('TSLA', '特斯拉', 'US', 'TSL', 'TESLA'),
+    ('NVDA', '英伟达', 'US', 'YWD', 'NVIDIA'),
+    ('AMZN', '亚马逊', 'US', 'YMX', 'AMAZON'),
+    ('META', '脸书', 'US', 'LS', 'META PLATFORMS'),
+    ('BABA', '阿里巴巴', 'US', 'ALBB', 'ALIBABA'),
+    ('JD', '京东', 'US', 'JD', 'JD.COM'),
+    ('PDD', '拼多多', 'US', 'PDD', 'PDD HOLDINGS'),
+    ('BIDU', '百度', 'US', 'BD', 'BAIDU'),
+    ('^GSPC', '标普500', 'INDEX', 'BP500', 'S&P 500'),
+    ('^IXIC', '纳斯达克综合指数', 'INDEX', 'NSDKZHZS', 'NASDAQ COMPOSITE'),
+    ('BTC-USD', '比特币', 'CRYPTO', 'BTB', 'BITCOIN'),
+    ('300809.SZ', '华辰装备', 'SZ', 'HCZB', ''),
+    ('000001.SZ', '平安银行', 'SZ', 'PAYH', ''),
+    ('000002.SZ', '万科A', 'SZ', 'WKA', ''),
+    ('600519.SS', '贵州茅台', 'SS', 'GZMT', ''),
+    ('601318.SS', '中国平安', 'SS', 'ZGPA', ''),
+    ('000858.SZ', '五粮液', 'SZ', 'WLY', ''),
+    ('002415.SZ', '海康威视', 'SZ', 'HKWS', ''),
+    ('300750.SZ', '宁德时代', 'SZ', 'NDSD', ''),
+    ('600036.SS', '招商银行', 'SS', 'ZSYH', ''),
+    ('000333.SZ', '美的集团', 'SZ', 'MDJT', ''),
+]
+
+_A_SHARE_CODE = re.compile(r'^\d{6}$')
+A_SHARE_MARKETS = ('SS', 'SZ', 'BJ')
+# akshare 各交易所的代码表: (函数, 参数, 代码列, 名称列, 市场)
+AKSHARE_LISTINGS = [
+    ('stock_info_sh_name_code', {'symbol': '主板A股'}, '证券代码', '证券简称', 'SS'),
+    ('stock_info_sh_name_code', {'symbol': '科创板'}, '证券代码', '证券简称', 'SS'),
+    ('stock_info_sz_name_code', {'symbol': 'A股列表'}, 'A股代码', 'A股简称', 'SZ'),
+    ('stock_info_bj_name_code', {}, '证券代码', '证券简称', 'BJ'),
+]
+
+
+def guess_market(code):
+    """按代码段推断交易所，只用于没有交易所信息的来源（如不带 market 列的 CSV）
+
+    北交所 4 / 8 / 920 开头，沪市 6 / 9 开头，其余深市
+    """
+    if code.startswith(('4', '8', '92')):
+        return 'BJ'
+    if code[0] in '69':
+        return 'SS'
+    return 'SZ'
+
+
+def a_share_symbol(code, market=None):
+    """6 位 A 股代码 -> (代码, 市场)；market 为来源给出的交易所，未给出时按代码段推断"""
+    code = code.strip()
+    if not _A_SHARE_CODE.match(code):
+        raise ValueError(f"无效的A股代码: {code}")
+    market = market or guess_market(code)
+    if market not in A_SHARE_MARKETS:
+        raise ValueError(f"未知的交易所: {market}")
+    return f"{code}.{market}", market
+
+
+def pinyin_initials(name):
+    """中文名称 -> 拼音首字母（需要 pypinyin，否则返回空串）"""
+    if lazy_pinyin is None or not name:
+        return ''
+    letters = lazy_pinyin(name, style=Style.FIRST_LETTER, errors='default')
+    return ''.join(letters).upper()
+
+
+def normalize(text):
+    """查询与索引键统一为大写、去空白"""
+    return re.sub(r'\s+', '', str(text or '')).upper()
+
+
+class SymbolIndex:
+    """前缀树索引
+
+    entries: [(代码, 名称, 市场, 拼音首字母, 英文名), ...]，顺序即排名（靠前的优先）
+    """
+
+    def __init__(self, entries):
+        self.entries = [tuple(entry) for entry in entries]
+        self._items = [{'symbol': e[0], 'name': e[1], 'market': e[2]} for e in self.entries]
+        # 首字符 -> [(键, 排名)]：该分支第一次被查询时才建树
+        self._pending = {}
+        for rank, entry in enumerate(self.entries):
+            for key in self.keys_of(entry):
+                self._pending.setdefault(key[0], []).append((key, rank))
+        self.root = [{}, ()]
+        self._lock = threading.Lock()
+        self._markets = None
+
+    def keys_of(self, entry):
+        """一个条目的全部索引键"""
+        symbol, name, market, initials, alias = entry
+        keys = {normalize(symbol), normalize(name), normalize(initials), normalize(alias)}
+        if '.' in symbol and market in A_SHARE_MARKETS:
+            keys.add(symbol.split('.')[0])
+        keys.discard('')
+        return keys
+
+    def _build(self, keys):
+        """建一个首字符分支：节点为 [子节点字典, 候选列表]，候选按 (键长, 排名) 排序后只保留前 MAX_SUGGESTIONS 个"""
+        root = [{}, []]
+        for key, rank in keys:
+            node = root
+            node[1].append((len(key), rank))
+            for char in key[1:]:
+                child = node[0].get(char)
+                if child is None:
+                    child = node[0][char] = [{}, []]
+                node = child
+                node[1].append((len(key), rank))
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            seen, top = set(), []
+            for _, rank in sorted(node[1]):
+                if rank not in seen:
+                    seen.add(rank)
+                    top.append(rank)
+                    if len(top) >= MAX_SUGGESTIONS:
+                        break
+            node[1] = tuple(top)
+            stack.extend(node[0].values())
+        return root
+
+    def _branch(self, char):
+        """首字符对应的分支，尚未建树时现建"""
+        node = self.root[0].get(char)
+        if node is None:
+            with self._lock:
+                node = self.root[0].get(char)
+                if node is None:
+                    keys = self._pending.pop(char, None)
+                    if keys is None:
+                        return None
+                    node = self.root[0][char] = self._build(keys)
+        return node
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """前缀联想，返回 [{'symbol', 'name', 'market'}, ...]（完全匹配排在最前）"""
+        query = normalize(query)
+        if not query:
+            return []
+        node = self._branch(query[0])
+        for char in query[1:]:
+            if node is None:
+                return []
+            node = node[0].get(char)
+        if node is None:
+            return []
+        return [self._items[rank] for rank in node[1][:limit]]
+
+    def a_share_market(self, code):
+        """A 股代码所在的交易所（取自索引条目），索引中没有时返回 None"""
+        markets = self._markets
+        if markets is None:
+            markets = self._markets = {e[0].split('.')[0]: e[2] for e in self.entries if e[2] in A_SHARE_MARKETS}
+        return markets.get(code)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self, path=DEFAULT_PATH):
+        """写入索引文件"""
+        data = json.dumps({'version': 1, 'entries': self.entries}, ensure_ascii=False, separators=(',', ':'))
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=9) as f:
+            f.write(data)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """读取索引文件；文件不存在时使用内置常用股票"""
+        if not os.path.exists(path):
+            print(f"⚠️  未找到股票联想索引文件 {path}，只能联想 {len(SEED_SYMBOLS)} 只内置常用股票")
+            print("   生成完整索引: python symbol_index.py build --akshare --nasdaq nasdaqlisted.txt")
+            return cls(SEED_SYMBOLS)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['entries'])
+
+
+_index = None
+
+
+def get_index():
+    """进程内共享的索引（首次调用时加载）"""
+    global _index
+    if _index is None:
+        started = time.perf_counter()
+        _index = SymbolIndex.load()
+        print(f"🔎 股票联想索引已加载: {len(_index)} 只, 用时 {time.perf_counter() - started:.2f}s")
+    return _index
+
+
+def parse_limit(value):
+    """解析 limit 查询参数"""
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的 limit: {value}")
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        raise ValueError(f"limit 必须在 1 到 {MAX_SUGGESTIONS} 之间")
+    return limit
+
+
+# ==================== 生成索引 ====================
+
+def read_csv(path):
+    """读取 CSV（列: symbol 或 code, name, 可选 market / initials / alias）"""
+    entries = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            symbol = (row.get('symbol') or row.get('code') or '').strip().upper()
+            name = (row.get('name') or '').strip()
+            if not symbol:
+                continue
+            market = (row.get('market') or '').strip().upper()
+            if _A_SHARE_CODE.match(symbol):
+                # CSV 没有给出交易所时才按代码段推断
+                symbol, market = a_share_symbol(symbol, market or None)
+            entries.append((symbol, name, market or 'US', (row.get('initials') or '').strip().upper(),
+                            (row.get('alias') or '').strip().upper()))
+    return entries
+
+
+def read_akshare():
+    """沪深京 A 股代码与名称（需要 akshare），交易所取自各交易所的代码表"""
+    import akshare as ak
+    entries = []
+    for func, kwargs, code_column, name_column, market in AKSHARE_LISTINGS:
+        df = getattr(ak, func)(**kwargs)
+        for code, name in zip(df[code_column].astype(str), df[name_column].astype(str)):
+            try:
+                symbol, market = a_share_symbol(code.zfill(6), market)
+            except ValueError:
+                continue
+            entries.append((symbol, name.replace(' ', ''), market, '', ''))
+    return entries
+
+
+def read_nasdaq(path):
+    """纳斯达克代码目录文件（nasdaqlisted.txt / otherlisted.txt，竖线分隔）"""
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f, delimiter='|'):
+            symbol = (row.get('Symbol') or row.get('ACT Symbol') or '').strip()
+            if not symbol or symbol.startswith('File Creation Time') or row.get('Test Issue') == 'Y':
+                continue
+            name = (row.get('Security Name') or '').split(' - ')[0].strip()
+            entries.append((symbol.replace('.', '-'), name, 'US', '', name.upper()))
+    return entries
+
+
+def build_entries(sources):
+    """合并多个来源（内置常用股票排在最前），按代码去重并补全拼音首字母"""
+    merged = {}
+    for entries in [SEED_SYMBOLS] + sources:
+        for symbol, name, market, initials, alias in entries:
+            if symbol in merged:
+                continue
+            if not initials and re.search(r'[一-鿿]', name):
+                initials = pinyin_initials(name)
+            merged[symbol] = (symbol, name, market, initials, alias)
+    return list(merged.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票代码联想索引')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='生成索引文件')
+    build.add_argument('--csv', action='append', default=[], help='CSV 文件（可多次指定）')
+    build.add_argument('--akshare', action='store_true', help='从 akshare 获取沪深京 A 股列表')
+    build.add_argument('--nasdaq', action='append', default=[], help='纳斯达克代码目录文件（可多次指定）')
+    build.add_argument('-o', '--output', default=DEFAULT_PATH)
+
+    query = sub.add_parser('query', help='测试联想')
+    query.add_argument('text')
+    query.add_argument('-i', '--index', default=DEFAULT_PATH)
+    query.add_argument('-n', '--limit', type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        sources = [read_csv(path) for path in args.csv]
+        if args.akshare:
+            sources.append(read_akshare())
+        sources.extend(read_nasdaq(path) for path in args.nasdaq)
+        entries = build_entries(sources)
+        if lazy_pinyin is None and any(not e[3] and re.search(r'[一-鿿]', e[1]) for e in entries):
+            print("⚠️  未安装 pypinyin，新增中文名称不支持拼音首字母联想（pip install pypinyin）")
+        SymbolIndex(entries).save(args.output)
+        print(f"✅ 已生成索引: {args.output}（{len(entries)} 只, {os.path.getsize(args.output) / 1024:.0f} KB）")
+        return
+
+    index = SymbolIndex.load(args.index)
+    started = time.perf_counter()
+    results = index.suggest(args.text, args.limit)
+    elapsed = (time.perf_counter() - started) * 1e6
+    for item in results:
+        print(f"{item['symbol']:<12} {item['name']:<16} {item['market']}")
+    print(f"⏱️  {len(results)} 条结果, {elapsed:.1f}µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@
 简单测试应用 - 排除复杂JavaScript问题
 """
 
+import os
 from flask import Flask, render_template_string, request, jsonify
+from fast_json import init_json
 import pandas as pd
 import numpy as np
 from datetime import datetime
@@ -11,9 +13,10 @@ import warnings
 warnings.filterwarnings('ignore')
 
 app = Flask(__name__)
+init_json(app)
 
-# 读取简单测试HTML
-with open('simple_test.html', 'r', encoding='utf-8') as f:
+# 读取简单测试HTML（相对本文件定位，从其他目录启动或被 app_factory 导入时同样可用）
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'simple_test.html'), 'r', encoding='utf-8') as f:
     SIMPLE_HTML = f.read()
 
 @app.route('/test')
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+选股表达式测试脚本
+检查不支持的语法都被拒绝（ValueError，接口返回 400），离线即可运行
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from stock_screener import compile_expression, screen_request
+
+# 应被拒绝的表达式 -> 说明
+REJECTED = {
+    "close.real > 1": '属性访问',
+    "__import__('os') > 1": '调用其他函数',
+    "eval('1') > 0": '调用其他函数',
+    "close // 2 > 1": '整除运算',
+    "name > 5": '文本与数值比较',
+    "industry == 5": '文本与数值比较',
+    "name + 1 > 2": '文本参与算术运算',
+}
+
+
+def test_rejected_expressions():
+    """不支持的语法抛出 ValueError"""
+    for expression, reason in REJECTED.items():
+        try:
+            compile_expression(expression)
+        except ValueError as e:
+            print(f"   ✅ {reason}: {expression} -> {e}")
+        else:
+            raise AssertionError(f"{reason}未被拒绝: {expression}")
+
+
+def test_accepted_expressions():
+    """正常的条件可以编译"""
+    for expression in ["rsi < 30", "ma5 > ma20 > ma60 and pe < 20", "abs(change) > 2 and industry in ('银行',)"]:
+        compile_expression(expression)
+        print(f"   ✅ {expression}")
+
+
+def test_request_body_must_be_object():
+    """JSON 正文不是对象时抛出 ValueError"""
+    for body in ([1, 2], 5, "rsi < 30"):
+        try:
+            screen_request(body)
+        except ValueError as e:
+            print(f"   ✅ {body!r} -> {e}")
+        else:
+            raise AssertionError(f"非对象请求体未被拒绝: {body!r}")
+
+
+if __name__ == "__main__":
+    print("🧪 开始测试选股表达式...")
+    test_rejected_expressions()
+    test_accepted_expressions()
+    test_request_body_must_be_object()
+    print("🎉 全部通过")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+多周期K线重采样模块
+从已缓存的日线数据派生周线/月线/季线，无需再次请求数据源
+"""
+
+import hashlib
+import pandas as pd
+import numpy as np
+
+# 周期名称 -> pandas Period 频率
+TIMEFRAMES = {
+    'daily': None,
+    'weekly': 'W-FRI',
+    'monthly': 'M',
+    'quarterly': 'Q',
+}
+
+# 列名映射: yfinance 英文列 / akshare 中文列
+OHLCV_COLUMNS = {
+    'en': {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'},
+    'cn': {'open': '开盘', 'high': '最高', 'low': '最低', 'close': '收盘', 'volume': '成交量', 'amount': '成交额'},
+}
+
+
+def detect_columns(df):
+    """识别数据列命名风格"""
+    if '收盘' in df.columns:
+        return OHLCV_COLUMNS['cn']
+    return OHLCV_COLUMNS['en']
+
+
+def group_bounds(index, freq):
+    """计算每个周期在有序索引中的起止位置"""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    codes = index.to_period(freq).asi8
+    if len(codes) == 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty
+    change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change - 1, [len(codes) - 1]))
+    return starts, ends
+
+
+def resample_ohlcv(df, timeframe):
+    """将日线数据重采样为指定周期
+
+    每个周期以该周期最后一个交易日作为时间标签，
+    开盘取首日、收盘取末日、最高/最低取极值、成交量求和。
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"不支持的周期: {timeframe}，可选: {', '.join(TIMEFRAMES)}")
+
+    freq = TIMEFRAMES[timeframe]
+    if freq is None or df.empty:
+        return df
+
+    cols = detect_columns(df)
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+
+    starts, ends = group_bounds(df.index, freq)
+
+    result = {}
+    if cols['open'] in df.columns:
+        result[cols['open']] = df[cols['open']].to_numpy()[starts]
+    if cols['high'] in df.columns:
+        result[cols['high']] = np.fmax.reduceat(df[cols['high']].to_numpy(dtype=float), starts)
+    if cols['low'] in df.columns:
+        result[cols['low']] = np.fmin.reduceat(df[cols['low']].to_numpy(dtype=float), starts)
+    result[cols['close']] = df[cols['close']].to_numpy()[ends]
+    for key in ('volume', 'amount'):
+        name = cols.get(key)
+        if name in df.columns:
+            values = np.nan_to_num(df[name].to_numpy(dtype=float))
+            result[name] = np.add.reduceat(values, starts)
+
+    resampled = pd.DataFrame(result, index=df.index[ends])
+    if cols['volume'] in resampled.columns:
+        resampled[cols['volume']] = resampled[cols['volume']].astype(np.int64)
+    return resampled
+
+
+class TimeframeResampler:
+    """带缓存的多周期重采样器"""
+
+    def __init__(self):
+        self.cache = {}
+
+    def _signature(self, df):
+        """日线数据签名（含所有行的内容），新增K线或已有K线被修正（如盘中最后一根）后缓存自动失效"""
+        if df.empty:
+            return (0, None)
+        hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+        return (len(df), hashlib.sha1(hashes.tobytes()).digest())
+
+    def resample(self, df, timeframe, key=None):
+        """获取指定周期数据，命中缓存时直接返回"""
+        if TIMEFRAMES.get(timeframe, 'invalid') is None:
+            return df
+        if key is None:
+            return resample_ohlcv(df, timeframe)
+
+        cache_key = (key, timeframe)
+        signature = self._signature(df)
+        cached = self.cache.get(cache_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        resampled = resample_ohlcv(df, timeframe)
+        self.cache[cache_key] = (signature, resampled)
+        return resampled
+
+    def resample_many(self, df, timeframes, key=None):
+        """一次获取多个周期的数据"""
+        return {tf: self.resample(df, tf, key) for tf in timeframes}
+
+    def invalidate(self, key):
+        """清除某个数据源的全部周期缓存"""
+        for cache_key in [k for k in self.cache if k[0] == key]:
+            del self.cache[cache_key]
+
+
+def parse_timeframes(value):
+    """解析请求中的周期参数，支持列表或逗号分隔字符串"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    timeframes = []
+    for tf in value:
+        tf = str(tf).strip().lower()
+        if tf not in TIMEFRAMES:
+            raise ValueError(f"不支持的周期: {tf}，可选: {', '.join(TIMEFRAMES)}")
+        if tf not in timeframes:
+            timeframes.append(tf)
+    return timeframes
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+热门股票快照
+后台线程按固定间隔重新分析热门列表，结果序列化、压缩后作为不可变快照整体替换；
+/api/trending 只返回当前快照（O(1)），请求延迟与列表长度无关
+
+- 列表可用环境变量 STOCK_TRENDING_SYMBOLS（逗号分隔）配置，可扩展到数百只
+- 刷新间隔: STOCK_TRENDING_INTERVAL（秒）
+- 单只股票分析失败不再被忽略，记录在快照的 errors 中
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from fast_json import dumps
+from http_cache import PrecompressedPage
+
+DEFAULT_SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'NVDA']
+REFRESH_INTERVAL = float(os.environ.get('STOCK_TRENDING_INTERVAL', 300))
+
+
+def configured_symbols(value=None):
+    """热门列表：参数 > 环境变量 > 默认列表"""
+    value = value if value is not None else os.environ.get('STOCK_TRENDING_SYMBOLS')
+    if not value:
+        return list(DEFAULT_SYMBOLS)
+    if isinstance(value, str):
+        value = value.split(',')
+    symbols = []
+    for symbol in value:
+        symbol = symbol.strip().upper()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    return symbols
+
+
+class TrendingSnapshot:
+    """一次刷新的结果（生成后不再修改）"""
+
+    def __init__(self, results, errors, generated_at, duration):
+        self.generated_at = generated_at
+        self.count = len(results)
+        self.errors = errors
+        body = dumps({
+            'trending': results,
+            'errors': errors,
+            'generated_at': datetime.fromtimestamp(generated_at).strftime('%Y-%m-%d %H:%M:%S'),
+            'refresh_seconds': round(duration, 3),
+        })
+        # 正文、ETag 与压缩版本只生成一次
+        self.page = PrecompressedPage(body, mimetype='application/json')
+
+    def age(self):
+        """快照年龄（秒）"""
+        return time.time() - self.generated_at
+
+    def respond(self, request, response_class=None):
+        """返回快照（或 304），Age 头为快照年龄"""
+        if response_class is None:
+            response = self.page.respond(request)
+        else:
+            response = self.page.respond(request, response_class)
+        response.headers['Age'] = str(int(self.age()))
+        return response
+
+
+class TrendingRefresher:
+    """后台刷新热门股票快照"""
+
+    def __init__(self, analyzer, symbols=None, interval=REFRESH_INTERVAL, executor=None, period="1mo"):
+        self.analyzer = analyzer
+        self.symbols = configured_symbols(symbols)
+        self.interval = interval
+        self.period = period
+        self.executor = executor or ThreadPoolExecutor(max_workers=8, thread_name_prefix='trending')
+        self.snapshot = None
+        self.ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._waiters = []      # 异步等待者的唤醒回调
+
+    def analyze_one(self, symbol):
+        """分析单只股票（重新获取数据，同时刷新分析器缓存）
+
+        数据源失败时不使用示例数据，该股票记入快照的 errors
+        """
+        df = self.analyzer.get_stock_data(symbol, self.period, use_cache=False, fallback=False)
+        return self.analyzer.analyze_frame(symbol, df, self.period)['analysis']
+
+    def refresh(self):
+        """重新分析整个列表并替换快照"""
+        start = time.time()
+        futures = [(symbol, self.executor.submit(self.analyze_one, symbol)) for symbol in self.symbols]
+        results, errors = [], []
+        for symbol, future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append({'symbol': symbol, 'error': str(e)})
+        self.snapshot = TrendingSnapshot(results, errors, time.time(), time.time() - start)
+        self.ready.set()
+        with self._lock:
+            waiters = list(self._waiters)
+        for wakeup in waiters:
+            wakeup()
+        print(f"🔥 热门快照已刷新: {len(results)} 只成功, {len(errors)} 只失败, 用时 {time.time() - start:.1f}s")
+        return self.snapshot
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️  热门快照刷新失败: {e}")
+            self._stopped.wait(self.interval)
+
+    def ensure_started(self):
+        """首次使用时启动后台线程"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='trending-refresher', daemon=True)
+                self._thread.start()
+
+    def wait_ready(self, timeout):
+        """等待首个快照，超时返回 None"""
+        self.ensure_started()
+        self.ready.wait(timeout)
+        return self.snapshot
+
+    async def wait_ready_async(self, timeout):
+        """异步版 wait_ready：在事件循环中等待，不占用线程池"""
+        self.ensure_started()
+        if not self.ready.is_set():
+            loop = asyncio.get_running_loop()
+            event = asyncio.Event()
+            wakeup = lambda: loop.call_soon_threadsafe(event.set)
+            with self._lock:
+                self._waiters.append(wakeup)
+            try:
+                # 登记后再检查一次，避免错过登记前刚完成的刷新
+                if not self.ready.is_set():
+                    await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    self._waiters.remove(wakeup)
+        return self.snapshot
+
+    def stop(self):
+        self._stopped.set()